@@ -1,9 +1,5 @@
-import numpy as np
-import matplotlib.pyplot as plt
-import calc_footprint_FFP_climatology as myfootprint_clim
-import calc_footprint_FFP as myfootprint
-import pandas as pd
-import csv
+# Modules are imported inside each function, so importing FFPoutput (e.g. in worker processes) does not
+# load matplotlib, pandas or the FFP model until they are needed.
 
 def FFPplot(xr, yr, datePrefix, dateList, meanFCH4List):
     print('REQUIRED INPUTS: xr, yr, datePrefix, dateList, meanFCH4List \n \
@@ -21,6 +17,8 @@ def FFPplot(xr, yr, datePrefix, dateList, meanFCH4List):
     2. a subplot of FFP contour
 
     """
+    import numpy as np
+    import matplotlib.pyplot as plt
 
     outfile = []
     Ndates = len(dateList)
@@ -108,18 +106,23 @@ def FFPplot(xr, yr, datePrefix, dateList, meanFCH4List):
 # =======================================================================================
 
 
-def FFPloop(csv_file, datePrefix, dateList):
+def FFPloop(csv_file, datePrefix, dateList, site="BB1"):
     """
     Input:
     1. csv_file = eddypro csv data file
     2. datePrefix = year and month of observations (e.g. '2017-12-')
     3. dateList = list of days (e.g. ['23','24','25','26'])
+    4. site = site name in the site registry (sites.csv). Sets z_m, z0 and boundary layer height. Default is BB1.
 
     Returns:
     1. FFP model xr and yr contour outputs (see FFP readme)
     2. List of daily averaged CH4 flux
     """
 
+    import numpy as np
+    import pandas as pd
+    import calc_footprint_FFP_climatology as myfootprint_clim
+
     # CHECK IF DATA ARE ALL -9999 --> filter out.
 
     alldata = pd.read_csv(csv_file,header = 0)
@@ -211,14 +214,13 @@ def FFPloop(csv_file, datePrefix, dateList):
         meanFCH4List[1][i] = np.nanmedian(data[datePrefix+dateList[i]]['FCH4'])
     meanFCH4List
 
-    z_measure = 1.599
-    z_zero = 0.045
+    z_measure, z_zero, boundary_height = site_parameters(site)
     xr = []
     yr = []
 
     for currentDate in dateList:
         dateidx = datePrefix+currentDate
-        height = [4000]*len(data[dateidx]['ws'])
+        height = [boundary_height]*len(data[dateidx]['ws'])
         FFP = myfootprint_clim.FFP_climatology(zm=z_measure,z0=z_zero,umean=data[dateidx]['ws'],
                                             h=height,ol=data[dateidx]['L'],sigmav=data[dateidx]['sigmav'],
                                             ustar=data[dateidx]['ustar'],wind_dir=data[dateidx]['wd'],rs=np.arange(10,100,10).tolist());
@@ -250,14 +252,16 @@ def FFP_clim(csv_file, dateStart, dateEnd, site):
     1. csv_file = eddypro csv data file
     2. dateStart = year and month and date of start date (e.g. '2017-03-09')
     3. dateEnd =  year and month and date of start date (e.g. '2017-12-09')
-    4) site = "BB1" or "BB2". Adjusts z_m and z0 parameters. BB1: zm=1.599, z0=0.045; BB2: zm=2.5, z0=0.125
+    4) site = site name in the site registry (sites.csv, e.g. "BB1" or "BB2"). Adjusts z_m, z0 and boundary
+       layer height parameters. BB1: zm=1.599, z0=0.045; BB2: zm=2.5, z0=0.125
 
     Returns:
     1. FFP model xr and yr contour outputs (see FFP readme)
     2. List of daily averaged CH4 flux
     """
-
-    
+    import numpy as np
+    import pandas as pd
+    import calc_footprint_FFP_climatology as myfootprint_clim
 
     alldata = pd.read_csv(csv_file,header = 0)
 
@@ -367,19 +371,31 @@ def FFP_clim(csv_file, dateStart, dateEnd, site):
     # wd_idx = p.where(WD != -9999.0)[0]
 
     print('length of dataset:',len(listws))
-    if site == "BB1":
-        z_measure = 1.599
-        z_zero = 0.045
-    elif site == "BB2":
-        z_measure = 2.5 # BB2
-        z_zero = 0.125 # BB2
-    else:
-        print("ERROR: Enter Site as 'BB1' or 'BB2'")
+    z_measure, z_zero, boundary_height = site_parameters(site)
     print(f'site info: z_m = {z_measure}, z0 = {z_zero}')
 
-    height = [4000]*len(listws)
+    height = [boundary_height]*len(listws)
     FFP = myfootprint_clim.FFP_climatology(zm=z_measure,z0=z_zero,umean=listws,
                                             h=height,ol=listL,sigmav=listsigmav,
                                             ustar=listustar,wind_dir=listwd,rs=np.arange(10,100,10).tolist());
 
     return FFP['xr'], FFP['yr']
+
+# =======================================================================================
+
+def site_parameters(site):
+    """
+    FFP parameters of a site from the site registry (sites.csv)
+    Returns:
+    1. z_measure = measurement height z_m [m]
+    2. z_zero = roughness length z0 [m]
+    3. boundary_height = default boundary layer height h [m]
+    """
+    from site_registry import get_site
+
+    this_site = get_site(site)
+    if this_site.zm is None or this_site.z0 is None:
+        raise ValueError(f"Site '{this_site.name}' has no zm/z0 in the site registry (sites.csv)")
+    boundary_height = this_site.h if this_site.h is not None else 4000
+
+    return this_site.zm, this_site.z0, boundary_height
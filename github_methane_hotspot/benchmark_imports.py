@@ -0,0 +1,63 @@
+"""
+Startup benchmark: time of `python -c "import <module>"` for the package modules, and which heavy libraries
+(numpy, scipy, pandas, matplotlib, pyarrow) each import pulls in. Worker processes pay this cost once per task.
+The heavy libraries themselves are timed too, as the reference for what a lazy import saves.
+
+Run from any folder:
+    python benchmark_imports.py                 (all package modules, 5 repeats)
+    python benchmark_imports.py FFPoutput -r 10 (chosen modules)
+"""
+import os
+import subprocess
+import sys
+import time
+
+
+MODULES = ('sector_analysis', 'sector_plot', 'FFPoutput', 'calc_footprint_FFP_climatology', 'calc_footprint_FFP',
+           'landsat_footprint', 'regression_stats', 'significance', 'clustering', 'results_store')
+HEAVY = ('numpy', 'scipy', 'pandas', 'matplotlib', 'pyarrow')
+REFERENCE = ('numpy', 'scipy.special', 'pandas', 'matplotlib.pyplot')
+
+
+def import_time(statement, repeats=5, cwd=None):
+    """
+    Median wall time [s] of running `python -c statement` in a fresh interpreter.
+    """
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], cwd=cwd, check=True, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times)//2]
+
+
+def loaded_libraries(module, cwd=None):
+    """
+    Heavy libraries present in sys.modules after importing module.
+    """
+    check = f'import sys, {module}; print(",".join(m for m in {HEAVY!r} if m in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', check], cwd=cwd, check=True, capture_output=True, text=True)
+    return output.stdout.strip()
+
+
+def benchmark(modules=MODULES, repeats=5, reference=REFERENCE):
+    """
+    Prints the import time (minus bare interpreter start-up) and loaded heavy libraries of every module.
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    baseline = import_time('pass', repeats, cwd)
+    print(f'python start-up: {baseline*1000:.0f} ms')
+    print(f'{"module":35s} {"import [ms]":>12s}  heavy libraries loaded')
+    for module in list(modules) + list(reference):
+        elapsed = import_time(f'import {module}', repeats, cwd) - baseline
+        print(f'{module:35s} {elapsed*1000:12.0f}  {loaded_libraries(module, cwd) or "-"}')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import time of the package modules')
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('-r', '--repeats', type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.modules, args.repeats)
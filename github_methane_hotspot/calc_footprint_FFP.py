@@ -335,11 +335,23 @@ def get_contour_levels(f, dx, dy, rs=None):
 
 #===============================================================================
 def get_contour_vertices(x, y, f, lev):
-    import matplotlib.pyplot as plt
-
-    cs = plt.contour(x,y, f, [lev])
-    plt.close()
-    segs = cs.allsegs[0][0]
+    # contourpy is the contouring engine behind plt.contour (matplotlib >= 3.6). Calling it directly gives
+    # the same vertices without importing pyplot or creating a figure.
+    import numpy as np
+    try:
+        import contourpy
+    except ImportError:
+        contourpy = None
+
+    if contourpy is not None:
+        generator = contourpy.contour_generator(x, y, np.ma.masked_invalid(f), name='mpl2014', corner_mask=True,
+                                                line_type=contourpy.LineType.SeparateCode)
+        segs = generator.lines(lev)[0][0] # first line of the level, as in cs.allsegs[0][0]
+    else:
+        import matplotlib.pyplot as plt
+        cs = plt.contour(x,y, f, [lev])
+        plt.close()
+        segs = cs.allsegs[0][0]
     xr = [vert[0] for vert in segs]
     yr = [vert[1] for vert in segs]
     #Set contour to None if it's found to reach the physical domain
@@ -2,7 +2,8 @@ from __future__ import print_function
 def FFP_climatology(zm=None, z0=None, umean=None, h=None, ol=None, sigmav=None, ustar=None,
                     wind_dir=None, domain=None, dx=None, dy=None, nx=None, ny=None, 
                     rs=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8], rslayer=0,
-                    smooth_data=1, crop=False, pulse=None, verbosity=2, fig=False, **kwargs):
+                    smooth_data=1, crop=False, pulse=None, verbosity=2, fig=False, approx=None, approx_sample=20,
+                    footprint_tol=None, keep_footprints=False, **kwargs):
     """
     Derive a flux footprint estimate based on the simple parameterisation FFP
     See Kljun, N., P. Calanca, M.W. Rotach, H.P. Schmid, 2015:
@@ -59,6 +60,19 @@ def FFP_climatology(zm=None, z0=None, umean=None, h=None, ol=None, sigmav=None,
                        2 = all notifications
         fig          = Plot an example figure of the resulting footprint (on the screen): set fig = 1. 
                        Default is 0 (i.e. no figure). 
+        approx       = Approximate climatology: time steps are grouped into classes of (wind_dir, zm/ol, zm/h,
+                       sigmav/ustar, umean/ustar) and one footprint is calculated per class, weighted by its number of
+                       time steps. Set approx = True for the class widths in DEFAULT_CLASS_WIDTHS, or to a dict
+                       of widths to change some of them (e.g. {'wind_dir': 10}). Default is None (exact).
+        approx_sample = Number of randomly sampled time steps on which the approximation error is estimated
+                       (exact vs class footprints). Default is 20.
+        footprint_tol = Calculate each footprint only within the bounding box of its downwind wedge, where the
+                       crosswind distribution is above footprint_tol times its centreline value (e.g. 1e-6).
+                       Default is None (whole domain).
+        keep_footprints = Keep the individual footprints (per time step, or per class with approx):
+                       'bbox' for arrays cropped to their non-zero bounding box, 'sparse' for scipy.sparse CSR
+                       matrices on the domain grid. Values below footprint_tol times the footprint maximum are
+                       dropped from the kept footprints. Default is False.
 
     FFP output
         FFP      = Structure array with footprint climatology data for measurement at [0 0 zm] m
@@ -72,6 +86,11 @@ def FFP_climatology(zm=None, z0=None, umean=None, h=None, ol=None, sigmav=None,
         n        = Number of footprints calculated and included in footprint climatology
         flag_err = 0 if no error, 1 in case of error, 2 if not all contour plots (rs%) within specified domain,
                    3 if single data points had to be removed (outside validity)
+        approx   = Only with approx: n_classes (footprints calculated), n_sample and error (L1 difference
+                   between exact and approximate footprints of the sample, relative to the exact sum), and
+                   labels (class of every valid time step)
+        footprints = Only with keep_footprints: list of the individual footprints, None where a footprint
+                   could not be calculated. 'bbox' entries are dicts of rows, cols (index ranges in x_2d) and f.
 
     Created: 19 May 2016 natascha kljun
     Converted from matlab to python, together with Gerardo Fratini, LI-COR Biosciences Inc.
@@ -83,7 +102,6 @@ def FFP_climatology(zm=None, z0=None, umean=None, h=None, ol=None, sigmav=None,
     import numpy as np
     import sys
     import numbers
-    import matplotlib
     from scipy import signal as sg
 
 
@@ -226,19 +244,6 @@ def FFP_climatology(zm=None, z0=None, umean=None, h=None, ol=None, sigmav=None,
     # Define fig if not passed
     if fig == None: fig == 0
 
-    #===========================================================================
-    # Model parameters
-    a = 1.4524
-    b = -1.9914
-    c = 1.4622
-    d = 0.1359
-    ac = 2.17
-    bc = 1.66
-    cc = 20.0
-        
-    oln = 5000 #limit to L for neutral scaling
-    k = 0.4 #von Karman
-
     #===========================================================================
     # Define physical domain in cartesian and polar coordinates
     # Cartesian coordinates
@@ -246,13 +251,25 @@ def FFP_climatology(zm=None, z0=None, umean=None, h=None, ol=None, sigmav=None,
     y = np.linspace(ymin, ymax, ny + 1)
     x_2d, y_2d = np.meshgrid(x, y)
 
-    # Polar coordinates
-    # Set theta such that North is pointing upwards and angles increase clockwise
-    rho = np.sqrt(x_2d**2 + y_2d**2)
-    theta = np.arctan2(x_2d, y_2d)
+    # Wind-aligned coordinates are taken directly from x_2d, y_2d for each time step (see below): with theta
+    # the polar angle (North pointing upwards, angles increasing clockwise) and rho the distance,
+    # rho*cos(theta - wind_dir) = x*sin(wind_dir) + y*cos(wind_dir) (along-wind) and
+    # rho*sin(theta - wind_dir) = x*cos(wind_dir) - y*sin(wind_dir) (crosswind), so no trigonometric
+    # function is evaluated over the grid.
 
     # initialize raster for footprint climatology
     fclim_2d = np.zeros(x_2d.shape)
+    footprints = []
+
+    def calc_footprint(inputs):
+        # Footprint of one time step within its window (the whole domain if footprint_tol is None):
+        # (rows, cols, f) or None if it can not be calculated
+        rows, cols = footprint_window(x, y, *inputs, tol=footprint_tol)
+        f_2d = footprint_2d(x_2d[rows, cols], y_2d[rows, cols], *inputs)
+        if keep_footprints:
+            footprints.append(None if f_2d is None else
+                              stored_footprint(rows, cols, f_2d, x_2d.shape, keep_footprints, footprint_tol))
+        return None if f_2d is None else (rows, cols, f_2d)
 
     #===========================================================================
     # Loop on time series
@@ -263,81 +280,83 @@ def FFP_climatology(zm=None, z0=None, umean=None, h=None, ol=None, sigmav=None,
               for vals in zip(ustars, sigmavs, hs, ols, wind_dirs, zms)]
 
     if verbosity > 1: print ('')
-    for ix, (ustar, sigmav, h, ol, wind_dir, zm, z0, umean) \
-            in enumerate(zip(ustars, sigmavs, hs, ols, wind_dirs, zms, z0s, umeans)):
+    if not approx:
+        for ix, (ustar, sigmav, h, ol, wind_dir, zm, z0, umean) \
+                in enumerate(zip(ustars, sigmavs, hs, ols, wind_dirs, zms, z0s, umeans)):
 
-        # Counter
-        if verbosity > 1 and ix % pulse == 0:
-            print ('Calculating footprint ', ix+1, ' of ', ts_len)
+            # Counter
+            if verbosity > 1 and ix % pulse == 0:
+                print ('Calculating footprint ', ix+1, ' of ', ts_len)
 
-        valids[ix] = check_ffp_inputs(ustar, sigmav, h, ol, wind_dir, zm, z0, umean, rslayer, verbosity)
+            valids[ix] = check_ffp_inputs(ustar, sigmav, h, ol, wind_dir, zm, z0, umean, rslayer, verbosity)
 
-        # If inputs are not valid, skip current footprint
-        if not valids[ix]:
-            raise_ffp_exception(16, verbosity)
-        else:
-            #===========================================================================
-            # Rotate coordinates into wind direction
-            if wind_dir is not None:
-                rotated_theta = theta - wind_dir * np.pi / 180.
-
-            #===========================================================================
-            # Create real scale crosswind integrated footprint and dummy for
-            # rotated scaled footprint
-            fstar_ci_dummy = np.zeros(x_2d.shape)
-            f_ci_dummy = np.zeros(x_2d.shape)
-            xstar_ci_dummy = np.zeros(x_2d.shape)
-            px = np.ones(x_2d.shape)
-            if z0 is not None:
-                # Use z0
-                if ol <= 0 or ol >= oln:
-                    xx = (1 - 19.0 * zm/ol)**0.25
-                    psi_f = (np.log((1 + xx**2) / 2.) + 2. * np.log((1 + xx) / 2.) - 2. * np.arctan(xx) + np.pi/2)
-                elif ol > 0 and ol < oln:
-                    psi_f = -5.3 * zm / ol
-                if (np.log(zm / z0)-psi_f)>0:
-                    xstar_ci_dummy = (rho * np.cos(rotated_theta) / zm * (1. - (zm / h)) / (np.log(zm / z0) - psi_f))
-                    px = np.where(xstar_ci_dummy > d)
-                    fstar_ci_dummy[px] = a * (xstar_ci_dummy[px] - d)**b * np.exp(-c / (xstar_ci_dummy[px] - d))
-                    f_ci_dummy[px] = (fstar_ci_dummy[px] / zm * (1. - (zm / h)) / (np.log(zm / z0) - psi_f))
-                else:
+            # If inputs are not valid, skip current footprint (kept as None, so footprints match the time steps)
+            if not valids[ix]:
+                raise_ffp_exception(16, verbosity)
+                if keep_footprints:
+                    footprints.append(None)
+            else:
+                footprint = calc_footprint((ustar, sigmav, h, ol, wind_dir, zm, z0, umean))
+                if footprint is None:
                     flag_err = 3
                     valids[ix] = 0
+                else:
+                    #===========================================================================
+                    # Add to footprint climatology raster
+                    rows, cols, f_2d = footprint
+                    fclim_2d[rows, cols] += f_2d
+    else:
+        #===========================================================================
+        # Approximate climatology: time steps with near-identical inputs are grouped into meteorological
+        # classes, and one footprint per class is added, weighted by the number of time steps in the class
+        timesteps = list(zip(ustars, sigmavs, hs, ols, wind_dirs, zms, z0s, umeans))
+        for ix, (ustar, sigmav, h, ol, wind_dir, zm, z0, umean) in enumerate(timesteps):
+            valids[ix] = check_ffp_inputs(ustar, sigmav, h, ol, wind_dir, zm, z0, umean, rslayer, verbosity)
+            if not valids[ix]:
+                raise_ffp_exception(16, verbosity)
+        valid_ix = [ix for ix in range(ts_len) if valids[ix]]
+
+        widths = dict(DEFAULT_CLASS_WIDTHS)
+        if isinstance(approx, dict):
+            widths.update(approx)
+        classes, labels = meteo_classes([timesteps[ix] for ix in valid_ix], widths)
+        counts = np.bincount(labels, minlength=len(classes))
+
+        if verbosity > 1:
+            print ('Approximating ', len(valid_ix), ' footprints by ', len(classes), ' classes')
+        for ic, inputs in enumerate(classes):
+            if verbosity > 1 and ic % pulse == 0:
+                print ('Calculating class footprint ', ic+1, ' of ', len(classes))
+            footprint = calc_footprint(inputs)
+            if footprint is None:
+                flag_err = 3
+                for member in np.flatnonzero(labels == ic):
+                    valids[valid_ix[member]] = 0
             else:
-                # Use umean if z0 not available
-                xstar_ci_dummy = (rho * np.cos(rotated_theta) / zm * (1. - (zm / h)) / (umean / ustar * k))
-                px = np.where(xstar_ci_dummy > d)
-                fstar_ci_dummy[px] = a * (xstar_ci_dummy[px] - d)**b * np.exp(-c / (xstar_ci_dummy[px] - d))
-                f_ci_dummy[px] = (fstar_ci_dummy[px] / zm * (1. - (zm / h)) / (umean / ustar * k))
-
-            #===========================================================================
-            # Calculate dummy for scaled sig_y* and real scale sig_y
-            sigystar_dummy = np.zeros(x_2d.shape)
-            sigystar_dummy[px] = (ac * np.sqrt(bc * np.abs(xstar_ci_dummy[px])**2 / (1 +
-                                  cc * np.abs(xstar_ci_dummy[px]))))
-
-            if abs(ol) > oln:
-                ol = -1E6
-            if ol <= 0:   #convective
-                scale_const = 1E-5 * abs(zm / ol)**(-1) + 0.80
-            elif ol > 0:  #stable
-                scale_const = 1E-5 * abs(zm / ol)**(-1) + 0.55
-            if scale_const > 1:
-                scale_const = 1.0
-
-            sigy_dummy = np.zeros(x_2d.shape)
-            sigy_dummy[px] = (sigystar_dummy[px] / scale_const * zm * sigmav / ustar)
-            sigy_dummy[sigy_dummy < 0] = np.nan
-
-            #===========================================================================
-            # Calculate real scale f(x,y)
-            f_2d = np.zeros(x_2d.shape)
-            f_2d[px] = (f_ci_dummy[px] / (np.sqrt(2 * np.pi) * sigy_dummy[px]) *
-                        np.exp(-(rho[px] * np.sin(rotated_theta[px]))**2 / ( 2. * sigy_dummy[px]**2)))
-
-            #===========================================================================
-            # Add to footprint climatology raster
-            fclim_2d = fclim_2d + f_2d;
+                rows, cols, f_2d = footprint
+                fclim_2d[rows, cols] += counts[ic] * f_2d
+        stored = footprints[:]
+
+        #===========================================================================
+        # Error of the approximation: exact vs class footprints of a random sample of time steps,
+        # as the L1 difference relative to the exact sum (0 = identical, 2 = no overlap)
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(valid_ix), min(approx_sample, len(valid_ix)), replace=False)
+        f_exact = np.zeros(x_2d.shape)
+        f_approx = np.zeros(x_2d.shape)
+        for member in sample:
+            footprint = calc_footprint(timesteps[valid_ix[member]])
+            footprint_class = calc_footprint(classes[labels[member]])
+            if footprint is not None and footprint_class is not None:
+                rows, cols, f_2d = footprint
+                f_exact[rows, cols] += f_2d
+                rows, cols, f_2d = footprint_class
+                f_approx[rows, cols] += f_2d
+        footprints[:] = stored # only the class footprints are kept
+        approx_error = np.sum(np.abs(f_exact - f_approx)) / np.sum(f_exact) if np.sum(f_exact) > 0 else np.nan
+        approx_info = {'n_classes': len(classes), 'n_sample': len(sample), 'error': approx_error, 'labels': labels}
+        if verbosity > 1:
+            print ('Approximation error on ', len(sample), ' sampled footprints: ', approx_error)
 
     #===========================================================================
     # Continue if at least one valid footprint was calculated
@@ -427,11 +446,250 @@ def FFP_climatology(zm=None, z0=None, umean=None, h=None, ol=None, sigmav=None,
     #===========================================================================
     # Fill output structure
     if rs is not None:
-        return {'x_2d': x_2d, 'y_2d': y_2d, 'fclim_2d': fclim_2d,
-                'rs': rs, 'fr': frs, 'xr': xrs, 'yr': yrs, 'n':n, 'flag_err':flag_err}
+        output = {'x_2d': x_2d, 'y_2d': y_2d, 'fclim_2d': fclim_2d,
+                  'rs': rs, 'fr': frs, 'xr': xrs, 'yr': yrs, 'n':n, 'flag_err':flag_err}
+    else:
+        output = {'x_2d': x_2d, 'y_2d': y_2d, 'fclim_2d': fclim_2d,
+                  'n':n, 'flag_err':flag_err}
+    if approx:
+        output['approx'] = approx_info
+    if keep_footprints:
+        output['footprints'] = footprints
+    return output
+
+#===============================================================================
+#===============================================================================
+def footprint_2d(x_2d, y_2d, ustar, sigmav, h, ol, wind_dir, zm, z0, umean):
+    """
+    Footprint of one time step on the grid x_2d, y_2d, rotated into the wind direction (see FFP_climatology
+    for the inputs, which must have passed check_ffp_inputs). Returns None if the footprint can not be
+    calculated with z0 (log(zm/z0) - psi_f <= 0).
+    """
+    import numpy as np
+
+    #===========================================================================
+    # Model parameters
+    a = 1.4524
+    b = -1.9914
+    c = 1.4622
+    d = 0.1359
+    ac = 2.17
+    bc = 1.66
+    cc = 20.0
+        
+    oln = 5000 #limit to L for neutral scaling
+    k = 0.4 #von Karman
+
+    #===========================================================================
+    # Rotate coordinates into wind direction: along-wind distance over the whole grid
+    # (the crosswind distance is only needed inside the footprint, below)
+    sin_wd = np.sin(wind_dir * np.pi / 180.)
+    cos_wd = np.cos(wind_dir * np.pi / 180.)
+    along_wind = x_2d * sin_wd + y_2d * cos_wd
+
+    #===========================================================================
+    # Create real scale crosswind integrated footprint and dummy for
+    # rotated scaled footprint
+    fstar_ci_dummy = np.zeros(x_2d.shape)
+    f_ci_dummy = np.zeros(x_2d.shape)
+    xstar_ci_dummy = np.zeros(x_2d.shape)
+    px = np.ones(x_2d.shape)
+    if z0 is not None:
+        # Use z0
+        if ol <= 0 or ol >= oln:
+            xx = (1 - 19.0 * zm/ol)**0.25
+            psi_f = (np.log((1 + xx**2) / 2.) + 2. * np.log((1 + xx) / 2.) - 2. * np.arctan(xx) + np.pi/2)
+        elif ol > 0 and ol < oln:
+            psi_f = -5.3 * zm / ol
+        if (np.log(zm / z0)-psi_f)>0:
+            xstar_ci_dummy = (along_wind / zm * (1. - (zm / h)) / (np.log(zm / z0) - psi_f))
+            px = np.where(xstar_ci_dummy > d)
+            fstar_ci_dummy[px] = a * (xstar_ci_dummy[px] - d)**b * np.exp(-c / (xstar_ci_dummy[px] - d))
+            f_ci_dummy[px] = (fstar_ci_dummy[px] / zm * (1. - (zm / h)) / (np.log(zm / z0) - psi_f))
+        else:
+            return None
     else:
-        return {'x_2d': x_2d, 'y_2d': y_2d, 'fclim_2d': fclim_2d,
-                'n':n, 'flag_err':flag_err}
+        # Use umean if z0 not available
+        xstar_ci_dummy = (along_wind / zm * (1. - (zm / h)) / (umean / ustar * k))
+        px = np.where(xstar_ci_dummy > d)
+        fstar_ci_dummy[px] = a * (xstar_ci_dummy[px] - d)**b * np.exp(-c / (xstar_ci_dummy[px] - d))
+        f_ci_dummy[px] = (fstar_ci_dummy[px] / zm * (1. - (zm / h)) / (umean / ustar * k))
+
+    #===========================================================================
+    # Calculate dummy for scaled sig_y* and real scale sig_y
+    sigystar_dummy = np.zeros(x_2d.shape)
+    sigystar_dummy[px] = (ac * np.sqrt(bc * np.abs(xstar_ci_dummy[px])**2 / (1 +
+                          cc * np.abs(xstar_ci_dummy[px]))))
+
+    if abs(ol) > oln:
+        ol = -1E6
+    if ol <= 0:   #convective
+        scale_const = 1E-5 * abs(zm / ol)**(-1) + 0.80
+    elif ol > 0:  #stable
+        scale_const = 1E-5 * abs(zm / ol)**(-1) + 0.55
+    if scale_const > 1:
+        scale_const = 1.0
+
+    sigy_dummy = np.zeros(x_2d.shape)
+    sigy_dummy[px] = (sigystar_dummy[px] / scale_const * zm * sigmav / ustar)
+    sigy_dummy[sigy_dummy < 0] = np.nan
+
+    #===========================================================================
+    # Calculate real scale f(x,y)
+    f_2d = np.zeros(x_2d.shape)
+    cross_wind = x_2d[px] * cos_wd - y_2d[px] * sin_wd
+    f_2d[px] = (f_ci_dummy[px] / (np.sqrt(2 * np.pi) * sigy_dummy[px]) *
+                np.exp(-cross_wind**2 / ( 2. * sigy_dummy[px]**2)))
+
+    return f_2d
+
+#===============================================================================
+def footprint_window(x, y, ustar, sigmav, h, ol, wind_dir, zm, z0, umean, tol=None):
+    """
+    Rows and columns of the grid (slices of y and x) holding the footprint of one time step: the bounding box of
+    the wedge downwind of the start of the footprint, where the crosswind distribution is above tol times its
+    centreline value. The whole grid if tol is None.
+    """
+    import numpy as np
+
+    if tol is None:
+        return slice(None), slice(None)
+
+    # Model parameters (see footprint_2d)
+    d = 0.1359
+    ac = 2.17
+    bc = 1.66
+    cc = 20.0
+    oln = 5000
+    k = 0.4
+
+    # Scaled along-wind distance xstar per metre
+    if z0 is not None:
+        if ol <= 0 or ol >= oln:
+            xx = (1 - 19.0 * zm/ol)**0.25
+            psi_f = (np.log((1 + xx**2) / 2.) + 2. * np.log((1 + xx) / 2.) - 2. * np.arctan(xx) + np.pi/2)
+        else:
+            psi_f = -5.3 * zm / ol
+        if np.log(zm / z0) - psi_f <= 0:
+            return slice(None), slice(None)
+        xstar_per_m = (1. - (zm / h)) / zm / (np.log(zm / z0) - psi_f)
+    else:
+        xstar_per_m = (1. - (zm / h)) / zm / (umean / ustar * k)
+
+    if abs(ol) > oln:
+        ol = -1E6
+    scale_const = 1E-5 * abs(zm / ol)**(-1) + (0.80 if ol <= 0 else 0.55)
+    scale_const = min(scale_const, 1.0)
+
+    # Along-wind extent: from the start of the footprint (xstar = d) to the farthest corner of the grid
+    sin_wd = np.sin(wind_dir * np.pi / 180.)
+    cos_wd = np.cos(wind_dir * np.pi / 180.)
+    along_start = d / xstar_per_m
+    along_end = max(xc * sin_wd + yc * cos_wd for xc in (x[0], x[-1]) for yc in (y[0], y[-1]))
+    if along_start >= along_end:
+        return slice(0, 0), slice(0, 0)
+
+    # Crosswind half width of the wedge, sampled along-wind; the wedge is convex, so the bounding box of its
+    # outline (plus two grid cells) holds it
+    along = np.linspace(along_start, along_end, 257)
+    xstar = along * xstar_per_m
+    sigy = ac * np.sqrt(bc * xstar**2 / (1 + cc * xstar)) / scale_const * zm * sigmav / ustar
+    half_width = sigy * np.sqrt(2. * np.log(1. / tol))
+    outline_x = np.concatenate([along * sin_wd + half_width * cos_wd, along * sin_wd - half_width * cos_wd])
+    outline_y = np.concatenate([along * cos_wd - half_width * sin_wd, along * cos_wd + half_width * sin_wd])
+
+    pad = 2 * max(abs(x[1] - x[0]), abs(y[1] - y[0]))
+    cols = slice(max(np.searchsorted(x, outline_x.min() - pad) - 1, 0), np.searchsorted(x, outline_x.max() + pad) + 1)
+    rows = slice(max(np.searchsorted(y, outline_y.min() - pad) - 1, 0), np.searchsorted(y, outline_y.max() + pad) + 1)
+    return rows, cols
+
+#===============================================================================
+def stored_footprint(rows, cols, f, shape, form='bbox', tol=None):
+    """
+    Compact copy of one footprint f calculated on the window rows, cols of a grid of the given shape:
+    'bbox' = dict of rows, cols (index ranges) and f cropped to its non-zero bounding box,
+    'sparse' = scipy.sparse CSR matrix of the grid (values below tol times the maximum dropped).
+    """
+    import numpy as np
+
+    row0, _, _ = rows.indices(shape[0])
+    col0, _, _ = cols.indices(shape[1])
+    if tol is not None and f.size:
+        f = np.where(f >= tol * f.max(), f, 0.)
+
+    if form == 'sparse':
+        from scipy import sparse
+        r, c = np.nonzero(f)
+        return sparse.csr_matrix((f[r, c], (r + row0, c + col0)), shape=shape)
+
+    nonzero_rows = np.flatnonzero(f.any(axis=1))
+    nonzero_cols = np.flatnonzero(f.any(axis=0))
+    if len(nonzero_rows) == 0:
+        return {'rows': (row0, row0), 'cols': (col0, col0), 'f': np.zeros((0, 0))}
+    r0, r1 = nonzero_rows[0], nonzero_rows[-1] + 1
+    c0, c1 = nonzero_cols[0], nonzero_cols[-1] + 1
+    return {'rows': (row0 + r0, row0 + r1), 'cols': (col0 + c0, col0 + c1), 'f': f[r0:r1, c0:c1].copy()}
+
+#===============================================================================
+# Class widths of the approximate climatology. Besides the wind direction [deg], the footprint only depends on
+# the inputs through zeta = zm/ol, zm/h, sigmav/ustar and umean/ustar (for a given zm and z0), so time steps
+# are grouped on these. zm and z0 are only grouped when equal.
+DEFAULT_CLASS_WIDTHS = {'wind_dir': 5., 'zeta': 0.05, 'zm_h': 0.005, 'sigmav_ustar': 0.2, 'umean_ustar': 0.5}
+
+
+def meteo_classes(timesteps, widths=DEFAULT_CLASS_WIDTHS):
+    """
+    Groups time steps into meteorological classes for the approximate footprint climatology.
+        Input:
+            1) timesteps = list of (ustar, sigmav, h, ol, wind_dir, zm, z0, umean) of valid time steps
+            2) widths = class width of every grouping variable (see DEFAULT_CLASS_WIDTHS)
+        Output:
+            1) classes = list of representative (ustar, sigmav, h, ol, wind_dir, zm, z0, umean) per class,
+               from the class means of the grouping variables (circular mean for wind direction)
+            2) labels = class of every time step
+    """
+    import numpy as np
+
+    if len(timesteps) == 0:
+        return [], np.zeros(0, dtype=int)
+    ustar, sigmav, h, ol, wind_dir, zm, z0, umean = \
+        [np.array([np.nan if value is None else value for value in column], dtype=float) for column in zip(*timesteps)]
+    use_umean = np.all(np.isnan(z0))
+    zeta = zm / ol
+    zm_h = zm / h
+    sigmav_ustar = sigmav / ustar
+    umean_ustar = umean / ustar
+    wd = np.radians(wind_dir)
+
+    codes = [np.round(wind_dir / widths['wind_dir']) % round(360. / widths['wind_dir']),
+             np.round(zeta / widths['zeta']), np.round(zm_h / widths['zm_h']),
+             np.round(sigmav_ustar / widths['sigmav_ustar']), zm]
+    if use_umean:
+        codes.append(np.round(umean_ustar / widths['umean_ustar']))
+    else:
+        codes.append(z0)
+    _, labels = np.unique(np.column_stack(codes), axis=0, return_inverse=True)
+    labels = labels.ravel()
+    counts = np.bincount(labels)
+
+    def class_mean(values):
+        return np.bincount(labels, weights=values) / counts
+
+    zm_mean = class_mean(zm)
+    ustar_mean = class_mean(ustar)
+    zeta_mean = class_mean(zeta)
+    ol_mean = np.full(len(counts), -1E6) # neutral, as used by the model for abs(ol) > 5000
+    np.divide(zm_mean, zeta_mean, out=ol_mean, where=zeta_mean != 0)
+    wind_mean = np.degrees(np.arctan2(class_mean(np.sin(wd)), class_mean(np.cos(wd)))) % 360.
+
+    columns = [ustar_mean, class_mean(sigmav_ustar) * ustar_mean, zm_mean / class_mean(zm_h), ol_mean, wind_mean,
+               zm_mean]
+    if use_umean:
+        columns += [[None]*len(counts), class_mean(umean_ustar) * ustar_mean]
+    else:
+        columns += [class_mean(z0), [None]*len(counts)]
+    classes = [tuple(value if value is None else float(value) for value in inputs) for inputs in zip(*columns)]
+    return classes, labels
 
 #===============================================================================
 #===============================================================================
@@ -504,12 +762,23 @@ def get_contour_levels(f, dx, dy, rs=None):
 
 #===============================================================================
 def get_contour_vertices(x, y, f, lev):
-    # import matplotlib._contour as cntr
-    import matplotlib.pyplot as plt
-
-    cs = plt.contour(x,y, f, [lev])
-    plt.close()
-    segs = cs.allsegs[0][0]
+    # contourpy is the contouring engine behind plt.contour (matplotlib >= 3.6). Calling it directly gives
+    # the same vertices without importing pyplot or creating a figure.
+    import numpy as np
+    try:
+        import contourpy
+    except ImportError:
+        contourpy = None
+
+    if contourpy is not None:
+        generator = contourpy.contour_generator(x, y, np.ma.masked_invalid(f), name='mpl2014', corner_mask=True,
+                                                line_type=contourpy.LineType.SeparateCode)
+        segs = generator.lines(lev)[0][0] # first line of the level, as in cs.allsegs[0][0]
+    else:
+        import matplotlib.pyplot as plt
+        cs = plt.contour(x,y, f, [lev])
+        plt.close()
+        segs = cs.allsegs[0][0]
     xr = [vert[0] for vert in segs]
     yr = [vert[1] for vert in segs]
     #Set contour to None if it's found to reach the physical domain
@@ -0,0 +1,187 @@
+"""
+Clustering of matched FARF/Landsat pixels (the clustering stage of the Manitoba clustering notebook).
+
+The notebook clustered matched_ffp[GHG_var] with scipy linkage('ward') / sklearn AgglomerativeClustering,
+which need O(n^2) memory for the linkage, and then looped over clusters to build per-cluster means.
+
+Here a single variable (e.g. the ch4 flux) is clustered with an exact 1-D Ward / k-means: after sorting, the
+partition into k contiguous groups with minimum within-cluster sum of squares is found by dynamic programming
+(O(k n log n) with the monotone split points, O(n) memory). The result minimizes the Ward criterion itself,
+where agglomerative Ward only approximates it greedily, so labels can differ from sklearn's on a few
+borderline pixels. Multi-variable clustering still uses scipy's ward linkage.
+
+Per-cluster means of every gas and index are grouped reductions (np.bincount) over the labels.
+"""
+import numpy as np
+
+
+GASES = ('co2', 'ch4', 'h')
+INDICES = ('MNDWI2','MNDWI','NDWI','NDVI','temp')
+
+
+def ward_1d(values, n_clusters):
+    """
+    Optimal 1-D Ward (k-means) clustering.
+        Input:
+            1) values = 1D array (NaN values are left unclustered)
+            2) n_clusters = number of clusters
+        Output:
+            1) labels = cluster of every value, numbered by increasing cluster mean. -1 for NaN values.
+            2) sse = total within-cluster sum of squares
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    n = valid.sum()
+    if n < n_clusters:
+        raise ValueError(f'{n} valid values can not be split into {n_clusters} clusters')
+
+    order = np.argsort(values[valid], kind='stable')
+    x = values[valid][order]
+    x = x - x.mean() # centring keeps the prefix sums accurate
+
+    S = np.concatenate([[0.], np.cumsum(x)])
+    S2 = np.concatenate([[0.], np.cumsum(x**2)])
+
+    def cost(i, j):
+        # Sum of squares of x[i..j] (inclusive)
+        return S2[j+1] - S2[i] - (S[j+1] - S[i])**2/(j - i + 1)
+
+    # D[j] = lowest cost of x[0..j] in k clusters, start[k][j] = first value of the k-th cluster
+    D = cost(np.zeros(n, dtype=int), np.arange(n))
+    starts = []
+    for k in range(1, n_clusters):
+        D, start = _dp_layer(D, cost, n, k)
+        starts.append(start)
+
+    # Backtracking the cluster boundaries
+    bounds = [n]
+    j = n - 1
+    for start in reversed(starts):
+        i = start[j]
+        bounds.append(i)
+        j = i - 1
+    bounds.append(0)
+    bounds = np.array(bounds[::-1])
+
+    sorted_labels = np.repeat(np.arange(n_clusters), np.diff(bounds))
+    labels = np.full(len(values), -1)
+    labels[np.flatnonzero(valid)[order]] = sorted_labels
+    return labels, float(max(D[n-1], 0.))
+
+
+def _dp_layer(D_prev, cost, n, k):
+    """
+    One dynamic programming layer: D[j] = min over i of D_prev[i-1] + cost(i, j), for k+1 clusters.
+    The best i is non-decreasing in j, so the layer is solved by divide and conquer, with all segments of one
+    recursion depth evaluated in a single vectorized step.
+    """
+    D = np.full(n, np.inf)
+    start = np.zeros(n, dtype=int)
+
+    # Segments of j still to solve, and the range their best i is known to lie in
+    j_lo, j_hi = np.array([k]), np.array([n-1])
+    i_lo, i_hi = np.array([k]), np.array([n-1])
+    while len(j_lo):
+        mid = (j_lo + j_hi)//2
+        last = np.minimum(mid, i_hi)
+        length = last - i_lo + 1
+
+        # All candidate i for every segment midpoint, flattened
+        owner = np.repeat(np.arange(len(mid)), length)
+        offset = np.arange(length.sum()) - np.repeat(np.cumsum(length) - length, length)
+        i = i_lo[owner] + offset
+        j = mid[owner]
+        total = D_prev[i-1] + cost(i, j)
+
+        # Segmented argmin (first minimum of each segment)
+        first = np.cumsum(length) - length
+        best = np.minimum.reduceat(total, first)
+        is_best = total == best[owner]
+        hits = np.flatnonzero(is_best)
+        _, first_hit = np.unique(owner[hits], return_index=True)
+        best_pos = hits[first_hit]
+        opt = i[best_pos]
+
+        D[mid] = best
+        start[mid] = opt
+
+        # Left halves search i in [i_lo, opt], right halves in [opt, i_hi]
+        left = mid > j_lo
+        right = mid < j_hi
+        j_lo, j_hi, i_lo, i_hi = (np.concatenate([j_lo[left], mid[right]+1]),
+                                  np.concatenate([mid[left]-1, j_hi[right]]),
+                                  np.concatenate([i_lo[left], opt[right]]),
+                                  np.concatenate([opt[left], i_hi[right]]))
+    return D, start
+
+
+def ward_linkage(features, n_clusters):
+    """
+    Multi-variable Ward clustering with scipy (O(n^2) memory), numbered by increasing mean of the first feature.
+        Input:
+            1) features = (pixels, variables) array without NaN
+            2) n_clusters = number of clusters
+        Output:
+            labels = cluster of every pixel
+    """
+    from scipy.cluster.hierarchy import linkage, fcluster
+
+    labels = fcluster(linkage(features, 'ward'), n_clusters, criterion='maxclust') - 1
+    return _relabel_by_mean(labels, features[:,0], labels.max()+1)
+
+
+def _relabel_by_mean(labels, values, n_clusters):
+    means = grouped_mean(labels, values, n_clusters)
+    rank = np.empty(n_clusters, dtype=int)
+    rank[np.argsort(means, kind='stable')] = np.arange(n_clusters)
+    return np.where(labels >= 0, rank[labels], -1)
+
+
+def grouped_mean(labels, values, n_clusters):
+    """
+    NaN-aware mean of values within each cluster (np.bincount grouped reduction). Pixels labelled -1 are skipped.
+        Output:
+            (n_clusters,) array, NaN for clusters without valid values
+    """
+    values = np.asarray(values, dtype=float)
+    use = (labels >= 0) & ~np.isnan(values)
+    sums = np.bincount(labels[use], weights=values[use], minlength=n_clusters)
+    counts = np.bincount(labels[use], minlength=n_clusters)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums/counts, np.nan)
+
+
+def cluster_pixels(landsat, matched_ffp, n_clusters=5, variables=('ch4',), gases=GASES, indices=INDICES):
+    """
+    Clusters the matched pixels of one sector_plot run and summarizes every cluster.
+        Input:
+            1) landsat, matched_ffp = dicts from sector_plot (Alldata['landsat'], Alldata['matched_ffp'])
+            2) n_clusters = number of clusters
+            3) variables = matched_ffp or landsat keys to cluster on. One variable (e.g. 'ch4', or 'MNDWI2' to
+               cluster on Landsat first) uses the exact 1-D Ward; several use scipy's ward linkage.
+            4) gases, indices = keys to summarize per cluster
+        Output:
+            dict:
+                labels = cluster of every pixel (0 = lowest mean of variables[0], -1 = not clustered)
+                counts = pixels per cluster
+                ffp = {gas: per-cluster mean}, landsat = {index: per-cluster mean}
+                xr, yr = per-cluster mean pixel position
+                sse = within-cluster sum of squares (1-D clustering only)
+    """
+    columns = [matched_ffp[key] if key in matched_ffp else landsat[key] for key in variables]
+    features = np.column_stack(columns).astype(float)
+
+    sse = np.nan
+    if features.shape[1] == 1:
+        labels, sse = ward_1d(features[:,0], n_clusters)
+    else:
+        valid = ~np.isnan(features).any(axis=1)
+        labels = np.full(len(features), -1)
+        labels[valid] = ward_linkage(features[valid], n_clusters)
+
+    result = {'labels': labels, 'counts': np.bincount(labels[labels >= 0], minlength=n_clusters), 'sse': sse,
+              'ffp': {gas: grouped_mean(labels, matched_ffp[gas], n_clusters) for gas in gases},
+              'landsat': {index: grouped_mean(labels, landsat[index], n_clusters) for index in indices}}
+    for key in ('xr', 'yr'):
+        result[key] = grouped_mean(labels, matched_ffp[key], n_clusters)
+    return result
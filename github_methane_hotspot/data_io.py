@@ -0,0 +1,93 @@
+"""
+Input layer for Landsat exports and FARF model outputs.
+
+All paths are resolved from explicit roots instead of changing the working directory (os.chdir), so reads are
+safe from several threads or sites at once and an exception can not leave the process in another folder.
+
+Roots (DataRoots):
+    landsat = folder of the Google Earth Engine exports. Default: $METHANE_LANDSAT_ROOT, else the shared
+              Google Drive folder '/Volumes/GoogleDrive/My Drive/Micromet_GEE' that sector_plot used.
+    farf    = folder of the FARF csv files. Default: $METHANE_FARF_ROOT, else the "data" sub-folder of the
+              current working directory (made absolute when the roots are created).
+Absolute filenames are used as they are.
+"""
+import os
+
+
+DEFAULT_LANDSAT_ROOT = '/Volumes/GoogleDrive/My Drive/Micromet_GEE'
+DEFAULT_FARF_ROOT = 'data'
+
+
+class DataRoots:
+    """
+    Folders holding the Landsat exports and FARF files.
+        roots = DataRoots(landsat='/data/gee', farf='/data/farf')
+    """
+    __slots__ = ('landsat', 'farf')
+
+    def __init__(self, landsat=None, farf=None):
+        if landsat is None:
+            landsat = os.environ.get('METHANE_LANDSAT_ROOT', DEFAULT_LANDSAT_ROOT)
+        if farf is None:
+            farf = os.environ.get('METHANE_FARF_ROOT', DEFAULT_FARF_ROOT)
+        self.landsat = os.path.abspath(os.path.expanduser(landsat))
+        self.farf = os.path.abspath(os.path.expanduser(farf))
+
+    def landsat_path(self, filename):
+        return os.path.join(self.landsat, filename)
+
+    def farf_path(self, site_prefix, ffp_filename, file_key):
+        return os.path.join(self.farf, site_prefix+'_fluxMap_'+file_key+'_'+ffp_filename)
+
+    def __repr__(self):
+        return f'DataRoots(landsat={self.landsat!r}, farf={self.farf!r})'
+
+
+def resolve_roots(roots=None):
+    """
+    Accepts a DataRoots, a dict {'landsat':..., 'farf':...}, or None (environment / defaults).
+    """
+    if isinstance(roots, DataRoots):
+        return roots
+    if roots is None:
+        return DataRoots()
+    return DataRoots(**roots)
+
+
+def read_landsat_export(landsat_filename, roots=None):
+    """
+    Reads a Google Earth Engine export (first row is skipped, as exported by v1_Landsat_Spatial.js).
+        Input:
+            1) landsat_filename {string} = export filename, relative to the Landsat root
+            2) roots = DataRoots, dict or None
+        Output:
+            pandas DataFrame
+    """
+    import pandas as pd
+
+    return pd.read_csv(resolve_roots(roots).landsat_path(landsat_filename), delimiter = ',', header = 1)
+
+
+def read_farf_files(site_prefix, ffp_filename, roots=None, max_workers=5):
+    """
+    Reads the five FARF csv files of a site/period concurrently.
+        Input:
+            1) site_prefix {string} = FARF filename prefix (e.g. 'BB1')
+            2) ffp_filename {string} = FARF filename suffix (e.g. 'june_aug2017.csv')
+            3) roots = DataRoots, dict or None
+            4) max_workers = threads reading files (1 reads them one after the other)
+        Output:
+            FARFGrid (see farf_grid.py)
+    """
+    from farf_grid import read_farf
+
+    return read_farf(site_prefix, ffp_filename, resolve_roots(roots).farf, max_workers)
+
+
+def read_farf_cube_files(site_prefix, ffp_filenames, roots=None, max_workers=5):
+    """
+    Reads the FARF files of several periods of a site into a FARFCube (see farf_grid.py).
+    """
+    from farf_grid import read_farf_cube
+
+    return read_farf_cube(site_prefix, ffp_filenames, resolve_roots(roots).farf, max_workers)
@@ -0,0 +1,128 @@
+"""
+Small content-addressed on-disk cache with least-recently-used eviction.
+
+Entries are pickled to one file per key inside the cache directory. Keys are built with array_key from the
+contents of the arrays the cached result depends on, so identical inputs map to the same entry across runs
+and processes. Reading an entry refreshes its modification time; when the cache grows beyond max_entries
+(or max_bytes) the least recently used files are removed.
+"""
+import os
+import pickle
+from uuid import uuid4
+
+
+def array_key(*parts):
+    """
+    Hash (hex string) of a mix of NumPy arrays and plain values (strings, numbers, tuples).
+    Arrays are hashed by dtype, shape and raw bytes, so equal arrays give equal keys.
+    """
+    import hashlib
+    import numpy as np
+
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            digest.update(f'{part.dtype.str}{part.shape}'.encode())
+            digest.update(part.tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    On-disk cache of picklable objects.
+        Input:
+            1) directory = folder holding the cache files (created if it does not exist)
+            2) max_entries = maximum number of entries kept. Default is 256.
+            3) max_bytes = optional maximum total size of the cache files [bytes]
+    """
+    suffix = '.pkl'
+
+    def __init__(self, directory, max_entries=256, max_bytes=None):
+        self.directory = os.path.abspath(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key+self.suffix)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        try:
+            os.utime(path) # Marks entry as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        # Write to a temporary file first (unique per writer, also between threads of one process), so other
+        # readers never see a half written entry
+        tmp_path = f'{path}.{os.getpid()}-{uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value of key, calling compute() and storing its result on a miss.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def entries(self):
+        """
+        List of (modification time, size, path) of the cache files, least recently used first.
+        """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.suffix):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or
+                           (self.max_bytes is not None and total_bytes > self.max_bytes)):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def __repr__(self):
+        return f'DiskCache({self.directory}, hits={self.hits}, misses={self.misses})'
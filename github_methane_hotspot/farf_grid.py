@@ -0,0 +1,160 @@
+import numpy as np
+
+
+class FARFGrid:
+    """
+    Container for one Footprint Aggregated Relative Flux (FARF) model output.
+
+    Holds the x/y coordinate grids and the co2, ch4 and h flux maps as contiguous 2D float arrays
+    of identical shape (rows x cols), so consumers can index them directly instead of going through
+    pandas column lookups.
+
+    Row i / column j of every array refer to the same FARF cell, i.e. xr[i][j], yr[i][j] are the
+    coordinates (m from tower) of the fluxes co2[i][j], ch4[i][j], h[i][j].
+
+    Dict-style access (ffp['ch4'], ffp.keys()) is kept so older notebooks that treated ffp as a dict
+    still work.
+    """
+    __slots__ = ('xr', 'yr', 'co2', 'ch4', 'h', 'shape')
+
+    fields = ('xr', 'yr', 'co2', 'ch4', 'h')
+    gases = ('co2', 'ch4', 'h')
+
+    def __init__(self, xr, yr, co2, ch4, h):
+        self.xr = np.ascontiguousarray(xr, dtype=float)
+        self.yr = np.ascontiguousarray(yr, dtype=float)
+        self.co2 = np.ascontiguousarray(co2, dtype=float)
+        self.ch4 = np.ascontiguousarray(ch4, dtype=float)
+        self.h = np.ascontiguousarray(h, dtype=float)
+        self.shape = self.xr.shape
+
+        for key in self.fields:
+            if getattr(self, key).shape != self.shape:
+                raise ValueError(f'FARF array "{key}" has shape {getattr(self, key).shape}, expected {self.shape}')
+
+    def axes(self):
+        """
+        Returns the 1D x-axis (one value per column) and y-axis (one value per row) of the FARF grid.
+        The FARF model writes meshgrid style coordinates, so every row of xr and every column of yr
+        should be identical.
+        """
+        x = self.xr[0,:]
+        y = self.yr[:,0]
+        if not (np.allclose(self.xr, x[None,:], equal_nan=True) and np.allclose(self.yr, y[:,None], equal_nan=True)):
+            raise ValueError('FARF xr/yr are not a rectilinear (meshgrid) grid')
+        return x, y
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def keys(self):
+        return self.fields
+
+    def __repr__(self):
+        return f'FARFGrid(shape={self.shape})'
+
+
+def read_farf(site_prefix, ffp_filename, data_dir='data', max_workers=5):
+    """
+    Reads the five csv outputs of Camilo Rey-Sanchez's hotspot model into a FARFGrid.
+        Input:
+            1) site_prefix {string} = Site prefix of the FARF files (e.g. 'BB1', 'Hogg')
+            2) ffp_filename {string} = Suffix of the FARF files (e.g. 'june_aug2017.csv')
+            3) data_dir {string} = Folder holding the FARF files. Default is the "data" sub-folder.
+            4) max_workers {int} = Number of files read at the same time (threads). 1 reads them in turn.
+        Output:
+            FARFGrid holding xr, yr, co2, ch4 and h arrays
+    """
+    import os
+    import pandas as pd
+
+    file_keys = {'xr': 'x', 'yr': 'y', 'co2': 'co2', 'ch4': 'ch4', 'h': 'h'}
+
+    def read(file_key):
+        path = os.path.join(data_dir, site_prefix+'_fluxMap_'+file_key+'_'+ffp_filename)
+        return pd.read_csv(path, header=None).to_numpy(dtype=float)
+
+    if max_workers > 1:
+        # pandas' csv parser releases the GIL, so the files are parsed in parallel
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(file_keys))) as pool:
+            arrays = dict(zip(file_keys, pool.map(read, file_keys.values())))
+    else:
+        arrays = {key: read(file_key) for key, file_key in file_keys.items()}
+
+    return FARFGrid(**arrays)
+
+
+class FARFCube:
+    """
+    FARF outputs of several periods of one site on a shared grid.
+        periods = list of period names (e.g. the ffp_filename suffixes)
+        gases = ('co2', 'ch4', 'h')
+        data = (periods, gases, rows, cols) flux array
+        outside = (periods, rows, cols) boolean array, True where the period's xr or yr is NaN
+        x, y = 1D axes of the grid (columns, rows), shared by every period
+    cube.grid(period) gives the FARFGrid of one period, so single-period code still works.
+    """
+    __slots__ = ('periods', 'gases', 'data', 'outside', 'x', 'y', 'shape')
+
+    def __init__(self, periods, data, outside, x, y, gases=FARFGrid.gases):
+        self.periods = list(periods)
+        self.gases = tuple(gases)
+        self.data = np.asarray(data, dtype=float)
+        self.outside = np.asarray(outside, dtype=bool)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.shape = (len(self.y), len(self.x))
+
+        if self.data.shape != (len(self.periods), len(self.gases)) + self.shape:
+            raise ValueError(f'FARF cube data has shape {self.data.shape}, expected '
+                             f'{(len(self.periods), len(self.gases)) + self.shape}')
+
+    @classmethod
+    def from_grids(cls, grids):
+        """
+        Stacks FARFGrids ({period: FARFGrid}) that share the same x/y axes.
+        """
+        periods = list(grids)
+        x, y = grids[periods[0]].axes()
+        for period in periods[1:]:
+            other_x, other_y = grids[period].axes()
+            if other_x.shape != x.shape or other_y.shape != y.shape or \
+                    not (np.allclose(other_x, x) and np.allclose(other_y, y)):
+                raise ValueError(f'FARF period "{period}" is on a different grid than "{periods[0]}"')
+
+        data = np.stack([[getattr(grids[period], gas) for gas in FARFGrid.gases] for period in periods])
+        outside = np.stack([np.isnan(grids[period].xr) | np.isnan(grids[period].yr) for period in periods])
+        return cls(periods, data, outside, x, y)
+
+    def grid(self, period):
+        """
+        FARFGrid of one period (name or position).
+        """
+        ii = self.periods.index(period) if not isinstance(period, (int, np.integer)) else period
+        xr, yr = np.meshgrid(self.x, self.y)
+        xr[self.outside[ii]] = np.nan
+        yr[self.outside[ii]] = np.nan
+        fluxes = {gas: self.data[ii, jj] for jj, gas in enumerate(self.gases)}
+        return FARFGrid(xr, yr, **fluxes)
+
+    def __len__(self):
+        return len(self.periods)
+
+    def __repr__(self):
+        return f'FARFCube(periods={self.periods}, shape={self.shape})'
+
+
+def read_farf_cube(site_prefix, ffp_filenames, data_dir='data', max_workers=5):
+    """
+    Reads the FARF files of several periods into a FARFCube.
+        Input:
+            1) site_prefix {string} = Site prefix of the FARF files (e.g. 'Hogg')
+            2) ffp_filenames = list of FARF filename suffixes (e.g. FARF_list = ['may2021.csv', 'june2021.csv'])
+            3) data_dir, max_workers = see read_farf
+        Output:
+            FARFCube with periods = ffp_filenames
+    """
+    return FARFCube.from_grids({name: read_farf(site_prefix, name, data_dir, max_workers) for name in ffp_filenames})
@@ -0,0 +1,160 @@
+"""
+Memoized single footprints (calc_footprint_FFP.FFP).
+
+FFP rebuilds its parameter arrays, 2-D field and contours on every call, also when the same conditions are asked
+for again while sizing domains or exploring stability sensitivity. FootprintMemo keeps the most recently used
+footprints in memory, keyed by the inputs rounded to a relative tolerance, and optionally persists them in a
+DiskCache (disk_cache.py) so other sessions and processes reuse them.
+
+    memo = FootprintMemo(maxsize=64, tolerance=1e-3, disk_cache='ffp_cache')
+    footprint = memo(zm=3., z0=0.1, h=1000., ol=-50., sigmav=0.6, ustar=0.3, wind_dir=220.)
+    memo.info()   # {'hits': ..., 'disk_hits': ..., 'misses': ..., 'size': ..., 'maxsize': ...}
+
+The footprint is always calculated from the rounded inputs, so a cached footprint does not depend on which of
+several nearly equal input sets was asked for first.
+"""
+import threading
+from collections import OrderedDict
+
+
+# Inputs of FFP that are rounded to the tolerance
+ROUNDED_INPUTS = ('zm', 'z0', 'umean', 'h', 'ol', 'sigmav', 'ustar', 'wind_dir')
+
+
+def quantize(value, tolerance):
+    """
+    Rounds value to a step of at most tolerance*|value| (a power of ten), so values within the relative
+    tolerance mostly share one key. None, 0 and non-finite values are returned as they are.
+    """
+    import math
+
+    if value is None or tolerance is None or tolerance <= 0:
+        return value
+    value = float(value)
+    if value == 0 or not math.isfinite(value):
+        return value
+    step = 10.**math.floor(math.log10(abs(value)*tolerance))
+    return float(round(round(value/step)*step, 12))
+
+
+class FootprintMemo:
+    """
+    LRU-bounded cache around calc_footprint_FFP.FFP.
+        Input:
+            1) maxsize = footprints kept in memory (a 1000x1000 footprint takes about 24 MB). Default is 32.
+            2) tolerance = relative rounding of the inputs (zm, z0, umean, h, ol, sigmav, ustar, wind_dir)
+               used for the key and the calculation. None or 0 caches exact inputs only. Default is 1e-3.
+            3) disk_cache = optional DiskCache or cache folder path, checked after the memory cache
+            4) copy = return copies of the cached footprints, so callers can modify them. Default is True.
+        Calling the memo takes the same arguments as FFP. Calls with fig are never cached.
+    """
+    def __init__(self, maxsize=32, tolerance=1e-3, disk_cache=None, copy=True):
+        if isinstance(disk_cache, str):
+            from disk_cache import DiskCache
+            disk_cache = DiskCache(disk_cache)
+        self.maxsize = maxsize
+        self.tolerance = tolerance
+        self.disk_cache = disk_cache
+        self.copy = copy
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, **kwargs):
+        """
+        Key of an FFP call: rounded inputs plus every other argument (rs, nx, rslayer, crop, ...).
+        """
+        import numpy as np
+
+        rounded = tuple(quantize(kwargs.pop(name, None), self.tolerance) for name in ROUNDED_INPUTS)
+        rs = kwargs.pop('rs', [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8])
+        # Lists, tuples, arrays and scalars of the same levels share a key
+        rs = None if rs is None else tuple(round(r, 12) for r in np.atleast_1d(rs).astype(float).tolist())
+        return (rounded, rs) + tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+
+    def __call__(self, **kwargs):
+        from calc_footprint_FFP import FFP
+
+        if kwargs.get('fig'):
+            return FFP(**kwargs)
+
+        key = self.key(**kwargs)
+        with self._lock:
+            footprint = self._entries.get(key)
+            if footprint is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._output(footprint)
+
+        disk_key = None
+        if self.disk_cache is not None:
+            from disk_cache import array_key
+            disk_key = array_key('FFP', key)
+            footprint = self.disk_cache.get(disk_key)
+
+        if footprint is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            # Calculated from the rounded inputs, so the entry is the same whichever call filled it
+            inputs = dict(kwargs)
+            inputs.update({name: value for name, value in zip(ROUNDED_INPUTS, key[0]) if name in kwargs})
+            footprint = FFP(**inputs)
+            with self._lock:
+                self.misses += 1
+            if disk_key is not None:
+                self.disk_cache.put(disk_key, footprint)
+
+        with self._lock:
+            self._entries[key] = footprint
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return self._output(footprint)
+
+    def _output(self, footprint):
+        if not self.copy:
+            return footprint
+        import copy
+        return copy.deepcopy(footprint)
+
+    def info(self):
+        """
+        Cache counters: memory hits, disk hits, misses (footprints calculated), size and maxsize.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def clear(self):
+        """
+        Empties the memory cache and resets the counters (the disk cache is kept).
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def __repr__(self):
+        info = self.info()
+        return (f'FootprintMemo(hits={info["hits"]}, disk_hits={info["disk_hits"]}, misses={info["misses"]}, '
+                f'size={info["size"]}/{info["maxsize"]}, tolerance={self.tolerance})')
+
+
+# Shared memo for interactive sessions
+_default_memo = None
+
+
+def memo_FFP(**kwargs):
+    """
+    calc_footprint_FFP.FFP through a shared FootprintMemo (default settings). Counters: memo_FFP_info().
+    """
+    global _default_memo
+    if _default_memo is None:
+        _default_memo = FootprintMemo()
+    return _default_memo(**kwargs)
+
+
+def memo_FFP_info():
+    return _default_memo.info() if _default_memo is not None else None
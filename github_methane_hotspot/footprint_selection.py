@@ -0,0 +1,111 @@
+"""
+Landsat pixels within the r% source area of a footprint climatology (FFP_climatology output), for every r at
+once, instead of the fixed mask given by where the FARF output is non-NaN (landsat_footprint.py).
+
+    clim = FFP_climatology(..., rs=[10, 20, 30, 40, 50, 60, 70, 80, 90])
+    selection = select_cube_pixels(cube, clim, 'BB1')
+    selection['masks'][rs.index(0.8)]     # (rows, cols) pixels of the 80% source area
+
+Two methods:
+    'threshold' = a pixel is in the r% source area if the climatology at its centre is at least fr, the
+                  footprint value of the r% contour. All levels come from one interpolation and one comparison.
+    'contour'   = a pixel is in the r% source area if its centre is inside the xr/yr contour of r (vectorized
+                  even-odd point in polygon test). Levels whose contour left the domain are all False.
+The r% source areas are nested, so 'level' (smallest r containing the pixel) holds all masks in one array.
+"""
+import numpy as np
+
+
+def climatology_at(x_2d, y_2d, fclim_2d, east, north):
+    """
+    Bilinear interpolation of the climatology at points east/north [m from tower]. 0 outside the domain.
+    """
+    x = x_2d[0, :]
+    y = y_2d[:, 0]
+    east = np.asarray(east, dtype=float)
+    north = np.asarray(north, dtype=float)
+
+    fx = (east - x[0])/(x[1] - x[0])
+    fy = (north - y[0])/(y[1] - y[0])
+    inside = (fx >= 0) & (fx <= len(x) - 1) & (fy >= 0) & (fy <= len(y) - 1)
+    col = np.clip(np.floor(fx).astype(int), 0, len(x) - 2)
+    row = np.clip(np.floor(fy).astype(int), 0, len(y) - 2)
+    tx = np.clip(fx - col, 0, 1)
+    ty = np.clip(fy - row, 0, 1)
+
+    f = np.nan_to_num(fclim_2d)
+    value = ((1 - ty)*((1 - tx)*f[row, col] + tx*f[row, col + 1]) +
+             ty*((1 - tx)*f[row + 1, col] + tx*f[row + 1, col + 1]))
+    return np.where(inside, value, 0.)
+
+
+def points_in_polygon(px, py, vx, vy, chunk_size=4096):
+    """
+    Even-odd test of points (px, py) against a closed polygon with vertices (vx, vy), vectorized over points
+    and edges (chunks of points bound the memory to chunk_size x edges).
+    """
+    px = np.asarray(px, dtype=float).ravel()
+    py = np.asarray(py, dtype=float).ravel()
+    vx = np.asarray(vx, dtype=float)
+    vy = np.asarray(vy, dtype=float)
+    x1, y1 = vx, vy
+    x2, y2 = np.roll(vx, -1), np.roll(vy, -1)
+    horizontal = y1 == y2
+    slope = np.where(horizontal, 0, (x2 - x1)/np.where(horizontal, 1, y2 - y1))
+
+    inside = np.zeros(len(px), dtype=bool)
+    for start in range(0, len(px), chunk_size):
+        x = px[start:start + chunk_size, None]
+        y = py[start:start + chunk_size, None]
+        # Edges crossing the horizontal line through the point, right of the point
+        crosses = ((y1 > y) != (y2 > y)) & (x < x1 + (y - y1)*slope)
+        inside[start:start + chunk_size] = np.count_nonzero(crosses, axis=1) % 2 == 1
+    return inside
+
+
+def select_pixels(east, north, clim, method='threshold'):
+    """
+    Pixels within every r% source area of a footprint climatology.
+        Input:
+            1) east, north = pixel centres [m from tower], any shape
+            2) clim = FFP_climatology output with rs (x_2d, y_2d, fclim_2d, rs, fr, xr, yr)
+            3) method = 'threshold' or 'contour' (see module description)
+        Output:
+            dict:
+                rs = source area fractions, ascending
+                masks = (len(rs), *east.shape) boolean array, masks[i] = pixels within rs[i]
+                level = smallest r whose source area holds the pixel (NaN if none)
+    """
+    east = np.asarray(east, dtype=float)
+    north = np.asarray(north, dtype=float)
+    rs = list(clim['rs'])
+    masks = np.zeros((len(rs),) + east.shape, dtype=bool)
+
+    if method == 'threshold':
+        value = climatology_at(clim['x_2d'], clim['y_2d'], clim['fclim_2d'], east, north)
+        fr = np.array([np.nan if level is None else level for level in clim['fr']], dtype=float)
+        with np.errstate(invalid='ignore'):
+            masks[:] = value[None] >= fr.reshape((-1,) + (1,)*east.ndim)
+    elif method == 'contour':
+        for ii, (xr, yr) in enumerate(zip(clim['xr'], clim['yr'])):
+            if xr is None:
+                continue
+            vertices = np.array([[vx, vy] for vx, vy in zip(xr, yr) if vx is not None and vy is not None])
+            if len(vertices) >= 3:
+                masks[ii] = points_in_polygon(east, north, vertices[:, 0], vertices[:, 1]).reshape(east.shape)
+    else:
+        raise ValueError(f'Unknown method "{method}", expected "threshold" or "contour"')
+
+    # Smallest r holding each pixel
+    rs_array = np.array(rs, dtype=float)
+    holds = masks.any(axis=0)
+    level = np.where(holds, rs_array[np.argmax(masks, axis=0)], np.nan)
+    return {'rs': rs, 'masks': masks, 'level': level}
+
+
+def select_cube_pixels(cube, clim, coordinates, method='threshold'):
+    """
+    select_pixels for the raster of a LandsatCube (landsat_raster.py): masks are (len(rs), rows, cols).
+    """
+    east, north = cube.pixel_m(coordinates)
+    return select_pixels(east, north, clim, method)
@@ -0,0 +1,239 @@
+"""
+Time-resolved, footprint-weighted Landsat index series: for every EddyPro half-hour, the mean of each Landsat
+index over that half-hour's flux footprint, taken from the nearest Landsat scene of a LandsatCube
+(landsat_raster.py). Flux can then be regressed against the indices in time, not only in space as in sector_plot.
+
+    cube = LandsatCube.load('BB1_landsat.npz')
+    series = site_footprint_series(cube, 'BB1_eddypro.csv', 'BB1', '2017-06-01', '2017-08-31')
+    series['weighted']['NDVI']      # one value per half-hour
+
+Each half-hour's footprint is calculated with the FFP_climatology kernel (footprint_window / footprint_2d of
+calc_footprint_FFP_climatology.py) and rasterized onto the Landsat pixels as one row of a sparse (half-hours x
+pixels) weight matrix. The weighted means are that matrix times the scene cube, restricted to each half-hour's
+scene, normalized by the weight on pixels with data (NaN-aware). Half-hours are processed in chunks, so only one
+chunk of weights is held in memory.
+"""
+import numpy as np
+
+
+# EddyPro full output columns and the footprint inputs they hold
+EDDYPRO_COLUMNS = {'umean': 'wind_speed', 'ol': 'L', 'ustar': 'u*', 'sigmav': 'v_stddev', 'wind_dir': 'wind_dir'}
+
+
+def read_eddypro(csv_file, start=None, end=None, skiprows=None):
+    """
+    Half-hourly footprint inputs from an EddyPro csv file.
+        Input:
+            1) csv_file = EddyPro csv file with date, time, wind_speed, L, u*, v_stddev and wind_dir columns
+            2) start, end = optional first and last date (e.g. '2017-06-01'), inclusive
+            3) skiprows = lines to skip around the header row. None detects the layout: EddyPro full_output
+               files (a file_info line above the header and a units row below it) skip [0, 2], files with a
+               single header row (as read by FFPoutput) skip nothing.
+        Output:
+            dict of arrays: time (datetime64), umean, ol, ustar, sigmav, wind_dir. Missing values
+            (-9999, '#NUM!', 'NA') are NaN. Rows whose date/time can not be parsed are dropped.
+    """
+    import pandas as pd
+
+    if skiprows is None:
+        with open(csv_file) as f:
+            skiprows = [0, 2] if f.readline().startswith('file_info') else None
+    data = pd.read_csv(csv_file, header=0, skiprows=skiprows)
+    stamp = data['date'].astype(str)
+    if 'time' in data:
+        stamp = stamp + ' ' + data['time'].astype(str)
+    time = pd.to_datetime(stamp, errors='coerce').to_numpy()
+
+    keep = ~np.isnat(time)
+    if start is not None:
+        keep &= time >= np.datetime64(pd.Timestamp(start))
+    if end is not None:
+        keep &= time < np.datetime64(pd.Timestamp(end)) + np.timedelta64(1, 'D')
+
+    met = {'time': time[keep]}
+    for key, column in EDDYPRO_COLUMNS.items():
+        values = pd.to_numeric(data[column], errors='coerce').to_numpy(dtype=float)[keep]
+        values[values == -9999] = np.nan
+        met[key] = values
+    return met
+
+
+def nearest_scene(cube, time, max_days=8):
+    """
+    Position of the nearest scene of the cube for every time, or -1 if no scene is within max_days.
+    """
+    scene_days = np.array([np.datetime64(f'{date[:4]}-{date[4:6]}-{date[6:]}') for date in cube.dates])
+    days = np.asarray(time).astype('datetime64[D]')
+    order = np.argsort(scene_days)
+    scene_days = scene_days[order]
+
+    after = np.clip(np.searchsorted(scene_days, days), 0, len(scene_days) - 1)
+    before = np.clip(after - 1, 0, len(scene_days) - 1)
+    gap_after = np.abs((scene_days[after] - days).astype(int))
+    gap_before = np.abs((scene_days[before] - days).astype(int))
+    nearest = np.where(gap_before <= gap_after, before, after)
+    gap = np.minimum(gap_before, gap_after)
+    return np.where(gap <= max_days, order[nearest], -1)
+
+
+def cell_pixels(cube, x, y, coordinates):
+    """
+    Flat Landsat raster index of every cell of a footprint grid (x, y axes in m from the tower), -1 outside
+    the raster. lon only depends on x and lat on y, so the axes are converted once.
+    """
+    from projection import m_to_lonlat
+    from site_registry import tower_coordinates
+
+    lon0, dlon, lat0, dlat = cube.transform
+    lon, _ = m_to_lonlat(x, np.zeros(len(x)), tower_coordinates(coordinates))
+    _, lat = m_to_lonlat(np.zeros(len(y)), y, tower_coordinates(coordinates))
+    col = np.rint((lon - lon0)/dlon).astype(int)
+    row = np.rint((lat0 - lat)/dlat).astype(int)
+    col[(col < 0) | (col >= cube.shape[1])] = -1
+    row[(row < 0) | (row >= cube.shape[0])] = -1
+
+    pixels = row[:, None]*cube.shape[1] + col[None, :]
+    pixels[(row[:, None] < 0) | (col[None, :] < 0)] = -1
+    return pixels
+
+
+def footprint_weights(inputs, x, y, x_2d, y_2d, pixels, footprint_tol=1e-6):
+    """
+    Footprint of one half-hour summed per Landsat pixel.
+        Input:
+            1) inputs = (ustar, sigmav, h, ol, wind_dir, zm, z0, umean), as in FFP_climatology
+            2) x, y, x_2d, y_2d = footprint grid axes and grid [m]
+            3) pixels = output of cell_pixels
+            4) footprint_tol = see FFP_climatology
+        Output:
+            (pixel indices, weights) with weights = footprint fraction on every pixel, or None if the
+            footprint can not be calculated
+    """
+    from calc_footprint_FFP_climatology import footprint_window, footprint_2d
+
+    rows, cols = footprint_window(x, y, *inputs, tol=footprint_tol)
+    f_2d = footprint_2d(x_2d[rows, cols], y_2d[rows, cols], *inputs)
+    if f_2d is None:
+        return None
+
+    cell_area = abs(x[1] - x[0])*abs(y[1] - y[0])
+    cells = pixels[rows, cols].ravel()
+    weight = f_2d.ravel()*cell_area
+    on_raster = (cells >= 0) & (weight > 0)
+    pixel_index, position = np.unique(cells[on_raster], return_inverse=True)
+    return pixel_index, np.bincount(position.ravel(), weights=weight[on_raster])
+
+
+def footprint_weighted_series(cube, met, coordinates, zm, z0=None, h=1000., indices=None, max_days=8,
+                              domain=(-1000., 1000., -1000., 1000.), dx=5., footprint_tol=1e-6, chunk_size=500,
+                              verbosity=0):
+    """
+    Footprint-weighted mean of Landsat indices for every half-hour.
+        Input:
+            1) cube = LandsatCube
+            2) met = dict (or DataFrame) of time, ustar, sigmav, ol, wind_dir and optionally umean and h arrays,
+               e.g. from read_eddypro
+            3) coordinates = flux tower [lon,lat] or site name
+            4) zm, z0 = measurement height and roughness length [m]. If z0 is None, met['umean'] is used.
+            5) h = boundary layer height [m], used where met has no h
+            6) indices = index names (default: all indices of the cube)
+            7) max_days = largest allowed time [days] between a half-hour and its Landsat scene
+            8) domain, dx = footprint grid [xmin, xmax, ymin, ymax] and cell size [m]
+            9) footprint_tol = see FFP_climatology
+            10) chunk_size = half-hours whose weights are held in memory at once
+        Output:
+            dict:
+                time = half-hour times
+                scene = date of the scene used ('' if none within max_days)
+                weighted = {index: array} footprint-weighted means (NaN if no footprint or no data)
+                footprint_on_raster = fraction of the footprint on raster pixels
+                footprint_with_data = fraction of the footprint on pixels with data in the scene (per index)
+    """
+    from scipy import sparse
+    from calc_footprint_FFP_climatology import check_ffp_inputs
+
+    if indices is None:
+        indices = list(cube.keys())
+    time = np.asarray(met['time'])
+    n = len(time)
+
+    def column(key, default):
+        if key in met:
+            return np.asarray(met[key], dtype=float)
+        return np.full(n, np.nan if default is None else default, dtype=float)
+
+    ustar, sigmav, ol, wind_dir = [column(key, None) for key in ('ustar', 'sigmav', 'ol', 'wind_dir')]
+    umean = column('umean', None)
+    hs = column('h', h)
+
+    # Footprint grid and its Landsat pixels, shared by every half-hour
+    x = np.arange(domain[0], domain[1] + dx/2, dx)
+    y = np.arange(domain[2], domain[3] + dx/2, dx)
+    x_2d, y_2d = np.meshgrid(x, y)
+    pixels = cell_pixels(cube, x, y, coordinates)
+
+    scene = nearest_scene(cube, time, max_days)
+    flat = {index: cube[index].reshape(len(cube.dates), -1) for index in indices}
+
+    weighted = {index: np.full(n, np.nan) for index in indices}
+    with_data = {index: np.zeros(n) for index in indices}
+    on_raster = np.zeros(n)
+
+    # Half-hours with a scene and plausible inputs (NaN inputs would pass check_ffp_inputs)
+    required = [ustar, sigmav, ol, wind_dir, hs] + ([umean] if z0 is None else [])
+    todo = np.flatnonzero((scene >= 0) & np.all(np.isfinite(np.column_stack(required)), axis=1))
+
+    for start in range(0, len(todo), chunk_size):
+        chunk = todo[start:start + chunk_size]
+        if verbosity > 0:
+            print(f'Footprints {start + 1}-{start + len(chunk)} of {len(todo)}')
+
+        # Sparse (half-hours x pixels) footprint weights of this chunk
+        row_pixels = []
+        row_weights = []
+        for t in chunk:
+            inputs = (ustar[t], sigmav[t], hs[t], ol[t], wind_dir[t], zm, z0, None if z0 is not None else umean[t])
+            weights = None
+            if check_ffp_inputs(*inputs, 0, 0):
+                weights = footprint_weights(inputs, x, y, x_2d, y_2d, pixels, footprint_tol)
+            if weights is None:
+                weights = (np.zeros(0, dtype=int), np.zeros(0))
+            row_pixels.append(weights[0])
+            row_weights.append(weights[1])
+        counts = [len(p) for p in row_pixels]
+        W = sparse.csr_matrix((np.concatenate(row_weights), np.concatenate(row_pixels),
+                               np.concatenate([[0], np.cumsum(counts)])), shape=(len(chunk), flat[indices[0]].shape[1]))
+        on_raster[chunk] = np.asarray(W.sum(axis=1)).ravel()
+
+        # W times the scene cube, each half-hour against its own scene: gather the scene values of the
+        # non-zero weights and sum per row. NaN pixels are left out of the sum and of the normalization.
+        nonzero_row = np.repeat(np.arange(len(chunk)), counts)
+        nonzero_scene = scene[chunk][nonzero_row]
+        for index in indices:
+            values = flat[index][nonzero_scene, W.indices].astype(float)
+            valid = ~np.isnan(values)
+            total = np.bincount(nonzero_row, weights=np.where(valid, values, 0)*W.data, minlength=len(chunk))
+            weight = np.bincount(nonzero_row, weights=valid*W.data, minlength=len(chunk))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                weighted[index][chunk] = np.where(weight > 0, total/weight, np.nan)
+            with_data[index][chunk] = weight
+
+    scene_dates = np.where(scene >= 0, cube.dates[np.maximum(scene, 0)], '')
+    return {'time': time, 'scene': scene_dates, 'weighted': weighted, 'footprint_on_raster': on_raster,
+            'footprint_with_data': with_data}
+
+
+def site_footprint_series(cube, csv_file, site, start=None, end=None, **kwargs):
+    """
+    footprint_weighted_series for an EddyPro file of a site, with zm, z0 and h from the site registry.
+        Input:
+            1) cube = LandsatCube of the site
+            2) csv_file = EddyPro csv file
+            3) site = site name in sites.csv
+            4) start, end = optional first and last date
+            5) kwargs = other footprint_weighted_series arguments
+    """
+    from FFPoutput import site_parameters
+
+    zm, z0, h = site_parameters(site)
+    return footprint_weighted_series(cube, read_eddypro(csv_file, start, end), site, zm, z0, h, **kwargs)
@@ -0,0 +1,138 @@
+"""
+Single-pass extraction of many scenes from a large Google Earth Engine export csv into a LandsatStore
+(landsat_store.py).
+
+Reading a multi-year export with pd.read_csv for every scene parses the whole file each time and holds it all in
+memory. stream_export reads the file once in chunks, routes the rows of every requested scene date (or all dates)
+to per-date buffers, and writes a buffer to its scene partition when it is full. Buffered rows are bounded by
+max_buffered_rows: when the bound is passed the largest buffers are written first, so memory does not grow with
+the file size or the number of scenes.
+
+    store = LandsatStore('landsat_store')
+    stats = stream_export('Hogg_export.csv', store, 'Hogg', dates=['20210523', '20210608'])
+    stats['rows_per_s'], stats['peak_rss_mb']
+"""
+import time
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process [MB] (resource module, not available on Windows: None).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kB elsewhere
+    return peak/2**20 if sys.platform == 'darwin' else peak/2**10
+
+
+def stream_export(csv_file, store, site, dates=None, chunk_rows=200000, max_buffered_rows=1000000,
+                  flush_rows=250000, header=1, qa=True, qa_radius=250., coordinates=None, verbosity=0):
+    """
+    Writes the scenes of a GEE export csv to a LandsatStore in one pass.
+        Input:
+            1) csv_file = GEE export csv (id, longitude, latitude and index columns; header on line header)
+            2) store = LandsatStore, or its root folder
+            3) site = site name of the partitions
+            4) dates = scene dates (yyyymmdd) to extract. None extracts every scene.
+            5) chunk_rows = rows parsed per chunk
+            6) max_buffered_rows = bound on the rows held in the per-date buffers
+            7) flush_rows = rows at which one date's buffer is written as a part
+            8) header = header line of the csv (1 for GEE exports, which start with a line of column numbers)
+            9) qa = also compute the scene QA summaries (scene_qa.py) of the written scenes and store them with
+               the scenes (LandsatStore.write_qa)
+            10) qa_radius, coordinates = QA region radius [m] and tower coordinates (default: the site's
+                coordinates in the site registry)
+        Output:
+            dict:
+                dates = scene dates written, sorted
+                missing_dates = requested dates not found in the csv, sorted
+                rows_read, rows_written = rows parsed and rows stored
+                parts = part files written
+                seconds, rows_per_s = wall time and parse rate
+                peak_buffered_rows = largest number of rows held in the buffers
+                peak_rss_mb = peak resident memory of the process [MB]
+                qa = QA table of the written scenes (None if qa is False)
+        Scenes written are replaced, other scenes of the store are kept.
+    """
+    import numpy as np
+    import pandas as pd
+    from get_spatial import scene_dates
+
+    if isinstance(store, str):
+        from landsat_store import LandsatStore
+        store = LandsatStore(store)
+    wanted = None if dates is None else {str(int(date)) for date in dates}
+
+    buffers = {}        # date -> list of DataFrames
+    buffered = {}       # date -> rows in the buffer
+    written = set()
+    stats = {'rows_read': 0, 'rows_written': 0, 'parts': 0, 'peak_buffered_rows': 0}
+    scene_qa = None
+    if qa:
+        from scene_qa import SceneQA
+        scene_qa = SceneQA(site if coordinates is None else coordinates, qa_radius)
+
+    def flush(date):
+        frame = pd.concat(buffers.pop(date), ignore_index=True)
+        rows = buffered.pop(date)
+        # First write of a scene in this run replaces what the store held
+        if date not in written:
+            store.clear_scene(site, date)
+            written.add(date)
+        store.write_part(site, date, frame)
+        stats['rows_written'] += rows
+        stats['parts'] += 1
+
+    start = time.perf_counter()
+    for chunk in pd.read_csv(csv_file, header=header, chunksize=chunk_rows, dtype={'id': str}):
+        stats['rows_read'] += len(chunk)
+        # Scene dates as get_spatial / LandsatCube.from_export read them (Landsat and Sentinel ids)
+        chunk_dates = scene_dates(chunk['id'])
+        if wanted is not None:
+            selected = np.isin(chunk_dates, list(wanted))
+            chunk = chunk[selected]
+            chunk_dates = chunk_dates[selected]
+        if scene_qa is not None:
+            scene_qa.update(chunk, chunk_dates)
+
+        for date, rows in chunk.groupby(chunk_dates, sort=False):
+            buffers.setdefault(date, []).append(rows)
+            buffered[date] = buffered.get(date, 0) + len(rows)
+            if buffered[date] >= flush_rows:
+                flush(date)
+
+        total = sum(buffered.values())
+        stats['peak_buffered_rows'] = max(stats['peak_buffered_rows'], total)
+        while total > max_buffered_rows:
+            largest = max(buffered, key=buffered.get)
+            total -= buffered[largest]
+            flush(largest)
+
+        if verbosity > 0:
+            elapsed = time.perf_counter() - start
+            print(f'{stats["rows_read"]} rows read, {stats["rows_read"]/elapsed:.0f} rows/s')
+
+    for date in list(buffers):
+        flush(date)
+
+    qa_table = None
+    if scene_qa is not None:
+        qa_table = scene_qa.table()
+        if len(qa_table):
+            store.write_qa(site, qa_table)
+
+    seconds = time.perf_counter() - start
+    missing = sorted(wanted - written) if wanted is not None else []
+    stats.update({'dates': sorted(written), 'missing_dates': missing, 'seconds': seconds,
+                  'rows_per_s': stats['rows_read']/seconds if seconds > 0 else float('nan'),
+                  'peak_rss_mb': peak_rss_mb(), 'qa': qa_table})
+    if verbosity > 0:
+        if missing:
+            print(f'Dates not in {csv_file}: {missing}')
+        print(f'{stats["rows_written"]} rows of {len(written)} scenes written in {seconds:.1f} s '
+              f'({stats["rows_per_s"]:.0f} rows/s, peak memory {stats["peak_rss_mb"]} MB)')
+    return stats
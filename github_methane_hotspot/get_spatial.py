@@ -10,75 +10,65 @@ def get_spatial(date, spatial_index,dataStruct,interval,coordinates):
                     lat/lon
                     satellite id's
             4) interval {string}: "daily" or "monthly". Monthly will gather average values over the same month.
-            5) coordinates of flux tower given in [lon,lat] format. (e.g: [-100.534, 50.371])
+            5) coordinates of flux tower given in [lon,lat] format. (e.g: [-100.534, 50.371]), or a site name
+                    from the site registry (e.g. 'Hogg')
         Output:
             1) lonData: array of longitude converted into metres from flux tower
             2) latData: array of latitude converted into metres from flux tower
             3) spatialData: array of averaged spatial index data
     """
-    from lon_to_m import lon_to_m # Function to turn longitude degrees into metres
-    from lat_to_m import lat_to_m # Function to turn latitude degrees into metres
+    from projection import lonlat_to_m # Turns longitude/latitude degrees into metres from the tower
+    from site_registry import tower_coordinates
     import numpy as np
 
+    coordinates = tower_coordinates(coordinates)
+
     available_indices = ["NDVI", "NDWI","MNDWI_SW1","MNDWI_SW2"]
-    lonData, latData, spatialData = [], [], []
     
-    id = dataStruct['id']
-    lon = dataStruct['longitude']
-    lat = dataStruct['latitude']
-
-    full_month = {'lonData':[],'latData':[],'spatialData':[]}
+    lon = np.asarray(dataStruct['longitude'], dtype=float)
+    lat = np.asarray(dataStruct['latitude'], dtype=float)
+    values = np.asarray(dataStruct[spatial_index], dtype=float)
+    scene_date = scene_dates(dataStruct['id'])
 
     if interval == "daily":
-        for i in range(len(id)):
-            if id[0][:4]=='LC08': # Checking if satellite data is Landsat
-                if date == int(id[i][12:]):
-
-                    # Appending longitude and latitude data         
-                    lonData.append(lon_to_m(lon[i],coordinates))
-                    latData.append(lat_to_m(lat[i],coordinates))
+        this_scene = scene_date == str(date)
 
-                    # Finding appropriate index data to append
-                    spatialData.append(dataStruct[spatial_index][i])
-            else:
-                if date == int(id[i][:8]): # Sentinel ID format
+        # Converting longitude and latitude of all pixels of this scene at once
+        lonData, latData = lonlat_to_m(lon[this_scene], lat[this_scene], coordinates)
+        spatialData = values[this_scene]
 
-                    # Appending longitude and latitude data         
-                    lonData.append(lon_to_m(lon[i],coordinates))
-                    latData.append(lat_to_m(lat[i],coordinates))
-
-                    # Finding appropriate index data to append
-                    spatialData.append(dataStruct[spatial_index][i])
     elif interval == "monthly":
-        # Getting Spatial data
-        monthly_ids = []
-        
-        for each_id in id:
-            if str(date)[:6] == each_id[12:18]:
-                monthly_ids.append(each_id)
-
-        for this_month in monthly_ids:
-            holding_spatialData = []
-            for i in range(len(id)):
-                if this_month[12:] == id[i][12]:
-                    holding_spatialData.append(dataStruct[spatial_index][i])
-            full_month['spatialData'].append(holding_spatialData)
+        # All scenes within the same month
+        this_month = np.char.startswith(scene_date, str(date)[:6])
 
+        # Averaging each pixel over the scenes of this month
+        pixels, pixel_idx = np.unique(np.column_stack([lon[this_month], lat[this_month]]), axis=0, return_inverse=True)
+        pixel_idx = pixel_idx.ravel()
+        month_values = values[this_month]
+        valid = ~np.isnan(month_values)
+        total = np.bincount(pixel_idx[valid], weights=month_values[valid], minlength=len(pixels))
+        count = np.bincount(pixel_idx[valid], minlength=len(pixels))
+        spatialData = np.full(len(pixels), np.nan)
+        np.divide(total, count, out=spatialData, where=count > 0)
 
-        for j in range(len(full_month['spatialData'][0])): # Iterating through each point within each month (~1560)
-            averaging = []
-            for jj in range(len(full_month['spatialData'])): # iterating through each stored month (~4)
+        lonData, latData = lonlat_to_m(pixels[:,0], pixels[:,1], coordinates)
+    else:
+        raise ValueError(f'interval must be "daily" or "monthly", got {interval}')
             
-                averaging.append(full_month['spatialData'][jj][j])
-            spatialData.append(np.nanmean(averaging))
+    return np.array(lonData), np.array(latData), np.array(spatialData)
 
-        # Getting lat/lon
-        if date == int(id[i][12:]):
-                
-                # Appending longitude and latitude data         
-                lonData.append(lon_to_m(lon[i]))
-                latData.append(lat_to_m(lat[i]))
 
+def scene_dates(id):
+    """
+    Scene date (yyyymmdd string) of every row of a Google Earth Engine export, from its image id.
+        Landsat ids end with the date (e.g. LC08_047026_20170728). Sentinel ids start with it.
+    """
+    import numpy as np
 
-            
-    return np.array(lonData), np.array(latData), np.array(spatialData)
\ No newline at end of file
+    id = np.asarray(id).astype(str)
+    if len(id) == 0:
+        return id
+    if id[0][:4]=='LC08': # Checking if satellite data is Landsat
+        return np.array([each_id[12:] for each_id in id])
+    else: # Sentinel ID format
+        return np.array([each_id[:8] for each_id in id])
@@ -1,161 +1,198 @@
-def landsat_footprint(longitude,latitude,spatial, ffp):
-    import numpy as np
+def landsat_footprint(longitude,latitude,spatial, ffp, cache=None):
     """
     Filters landsat data arrays to only produce spatial index data that fall within flux tower footprint
         Input:
             1) longitude = Single-day satellite data for longitude (converted from degrees to m from origin)
             2, latitude = Single-day satellite data for latitude (converted from degrees to m from origin)
             3) spatial = Single-day satellite data for landsat spatial index
-            4) ffp = A dict holding flux footprint arrays for ffp x values, y values, and flux values
+            4) ffp = FARFGrid (see farf_grid.py) holding flux footprint arrays for ffp x values, y values, and flux values
+            5) cache = optional DiskCache (see disk_cache.py) to reuse the footprint mask across scenes
         Output:
             A dict holding the filtered spatial data for lon, lat, and spatial index
     """
-    xr = ffp['xr']
-    yr = ffp['yr']
-    fr = ffp['ch4']
-    
-    filteredData = {'lonData':[], 'latData':[],'spatialData':[]}
-    
-    N = len(fr)
-    M = len(fr[0])
-    holding_x = np.ones((N,M))*np.nan
-    holding_y = np.ones((N,M))*np.nan
-    
-    # Finding x and y values that define the flux footprint, keeping the coordinates, while rest are NaN.
-    for i in range(N):
-        inside_ffp = np.where(~np.isnan(fr[i]))[0] # Finding non-NaN indices in each row of fr
-        for valid in inside_ffp:
-            holding_x[i][valid] = xr[i][valid] # Storing xr coordinates associated with non-NaN fr values into holding_x
-            holding_y[i][valid] = yr[i][valid]
+    import numpy as np
+
+    longitude = np.asarray(longitude, dtype=float)
+    latitude = np.asarray(latitude, dtype=float)
+    spatial = np.asarray(spatial, dtype=float)
+
+    inside = footprint_pixels(longitude, latitude, ffp, cache)
+
+    return {'lonData': longitude[inside], 'latData': latitude[inside], 'spatialData': spatial[inside]}
+
+
+def footprint_pixels(longitude, latitude, ffp, cache=None):
     """
-    - Determining for each lat and lon, whether the satellite data falls within footprint.
-    - Will comb through each latitude (row) and find points within min and max longitudes (columns). 
-    - Will look for "breaks" at given latitude where the footprint "peninsulas" into our view and defines 
-      localized min/max
-    - Combs latitude from top to bottom.
-    
-    lat = satellite y-axis
-    horizontal = footprint y-axis
+    Finds the landsat pixels that fall within the flux footprint. Only depends on the pixel coordinates
+    and the FARF geometry, so it can be shared by every spatial index of the same scene.
+
+    - Each FARF row (footprint y) is split into "islands" of non-NaN flux data (e.g. [nan,nan,nan,8,2,1,nan,nan]).
+      Islands that run into the edge of the FARF grid are not closed off, and are ignored.
+    - A pixel is kept if any FARF row within its 30m/px height (centred on the pixel latitude) has an island
+      whose start and end x coordinates enclose the pixel longitude.
+    - Works for any FARF grid size: the row/column axes are taken from the FARF arrays.
+
+        Input:
+            1) longitude, latitude = pixel coordinates (m from tower)
+            2) ffp = FARFGrid
+            3) cache = optional DiskCache. The mask is stored under a hash of the FARF axes, the FARF
+               footprint (non-NaN cells) and the pixel coordinates, so every Landsat scene with the same
+               pixel grid reuses it.
+        Output:
+            Index array of pixels inside the footprint, ordered from high to low latitude
     """
-    # Reversing order of footprint x-axis to INDEX from neg -> pos
-    reversed_xr = ffp['yr'][0].iloc[::-1].reset_index(drop=True)
-    
-    # Looping through landsat's latitudes
-    for this_lat in np.unique(latitude)[::-1]: # [::-1] flips lat array to loop from high lat to low lat
-        
-        # defining pixel edges according to landsat's 30m/px resolution, centred on this_lat
-        upper_edge = this_lat + 15
-        lower_edge = this_lat - 15
-        
-        # Looping through ffp latitudes. Finding footprint horizontal slice that meets given latitude.
-        for j in range(101):
-            
-            footprint_y = ffp['yr'][0][j]
-            
-            if footprint_y < upper_edge and footprint_y > lower_edge:
-
-                Slice = []  # Isolating a horizontal slice of ffp flux data
-                breaks = [] # length of this keeps track of how many "islands" of data are in this row.
-                for ii in range(101):  
-                    Slice.append(ffp['ch4'][ii][j])
-                            
-                # Finding breaks in NaN's, or islands of footprint data (e.g. [nan,nan,nan,8,2,1,nan,nan])
-                for iii in range(100):
-                
-                    # If condition: Start of an island (e,g.[nan,nan,9,2,...]) or end of an island (e.g.[...2,1,nan,nan])
-                    if np.isnan(Slice[iii]) and ~np.isnan(Slice[iii+1]) or ~np.isnan(Slice[iii]) and np.isnan(Slice[iii+1]):
-                        breaks.append(reversed_xr[iii+1]) # Storing x coordinate index of start and end of island.
-                        
-                
-                if len(breaks) == 2: # 1 island of data in sea of NaN. This is a regular row of data.
-                    for jj in range(len(longitude)):
-                        # Finding index of: matching latitude, longitude within "island".
-                        if latitude[jj] == this_lat and longitude[jj] > breaks[0] and longitude[jj] < breaks[1]:
-                            
-                            filteredData['lonData'].append(longitude[jj])
-                            filteredData['latData'].append(this_lat)
-                            filteredData['spatialData'].append(spatial[jj])
-                            
-                elif len(breaks)== 4: # 2 islands of data in sea of NaN
-                    for jj in range(len(longitude)):
-                        if latitude[jj] == this_lat and longitude[jj] > breaks[0] and longitude[jj] < breaks[1] \
-                            or latitude[jj] == this_lat and longitude[jj] > breaks[2] and longitude[jj] < breaks[3]:
-                            
-                            filteredData['lonData'].append(longitude[jj])
-                            filteredData['latData'].append(this_lat)
-                            filteredData['spatialData'].append(spatial[jj])
-                
-                
-        
-        
-    print(f'returns {filteredData.keys()}')
-    return filteredData
+    import numpy as np
+
+    longitude = np.asarray(longitude, dtype=float)
+    latitude = np.asarray(latitude, dtype=float)
+
+    if cache is not None:
+        from disk_cache import array_key
+        x, y = ffp.axes()
+        key = array_key('footprint_pixels', x, y, np.packbits(np.isnan(ffp.ch4)), longitude, latitude)
+        return cache.get_or_compute(key, lambda: footprint_pixels(longitude, latitude, ffp))
+
+    x, y = ffp.axes()
+    col_order = np.argsort(x, kind='stable')
+    row_order = np.argsort(y, kind='stable')
+    x = x[col_order]
+    y = y[row_order]
+    valid = ~np.isnan(ffp.ch4[row_order][:,col_order])
+    nrows, ncols = valid.shape
+
+    # Closed islands only: drop runs of data touching the left or right edge of the grid
+    left_run = np.logical_and.accumulate(valid, axis=1)
+    right_run = np.logical_and.accumulate(valid[:,::-1], axis=1)[:,::-1]
+    island = valid & ~left_run & ~right_run
+
+    # Cumulative island counts over rows, so any band of rows can be queried in O(1) per pixel
+    island_rows = np.zeros((nrows+1, ncols), dtype=np.int64)
+    np.cumsum(island, axis=0, out=island_rows[1:])
+    pair = island[:,:-1] & island[:,1:]
+    pair_rows = np.zeros((nrows+1, ncols-1), dtype=np.int64)
+    np.cumsum(pair, axis=0, out=pair_rows[1:])
+
+    # FARF rows strictly within the pixel's 30m/px height
+    row_lo = np.searchsorted(y, latitude - 15, side='right')
+    row_hi = np.searchsorted(y, latitude + 15, side='left')
+
+    # FARF column k with x[k] < longitude <= x[k+1]. Inside an island (start, end) means start <= k < end.
+    k = np.searchsorted(x, longitude, side='left') - 1
+    usable = np.isfinite(longitude) & np.isfinite(latitude) & (k >= 0) & (k < ncols-1) & (row_hi > row_lo)
+    k = np.where(usable, k, 0)
+
+    n_island = island_rows[row_hi, k] - island_rows[row_lo, k]
+    # A pixel sitting exactly on x[k+1] also needs column k+1 to be part of the same island
+    on_edge = longitude == x[np.minimum(k+1, ncols-1)]
+    n_pair = pair_rows[row_hi, np.minimum(k, ncols-2)] - pair_rows[row_lo, np.minimum(k, ncols-2)]
+    inside = usable & np.where(on_edge, n_pair > 0, n_island > 0)
+
+    idx = np.where(inside)[0]
+    # Combing latitudes from top to bottom
+    return idx[np.argsort(-latitude[idx], kind='stable')]
 
 
 # ---------------------------------------------------------------------------------------------------------
 
-def ffp_matched_to_landsat(landsat,ffp):
+def ffp_matched_to_landsat(landsat,ffp, cache=None, method='centre'):
     """
     Averages flux hotspot values within a 30 square metre bin pertaining to each landsat pixel.
     
     Input: 
         1) Landsat dict with lat,lon, and spatial indices that are filtered through landsat_footprint function
-        2) Flux footprint output with xr, yr, co2, ch4, and h fluxes
+        2) Flux footprint output (FARFGrid) with xr, yr, co2, ch4, and h fluxes
+        3) cache = optional DiskCache to reuse the FARF cell -> landsat pixel assignment across scenes
+        4) method = 'centre': mean of the FARF cells whose centres fall strictly inside the pixel
+                    'area': mean of the FARF cells overlapping the pixel, weighted by the overlap area (regrid.py)
     Output:
-        1) Dictionary holding xr, yr, and the three co2, ch4, and h fluxes
+        1) Dictionary holding arrays of xr, yr, and the three co2, ch4, and h fluxes
     """
     import numpy as np
 
-    # List to hold the footprint values matched to the satellite coordinates
-    matched_ffp = {'xr':[],'yr':[],'co2':[],'ch4':[],'h':[]}
-
-    # Blacking out ffp xr and yr that our outside of footprint (original = xr,yr are full and fr is NaN'd out)
-    N = len(ffp['co2'])
-    M = len(ffp['co2'][0])
-    holding_x = np.ones((N,M))*np.nan
-    holding_y = np.ones((N,M))*np.nan
-
-    # Finding x and y values that define the flux footprint, giving them numbers, while rest are NaN.
-    for i in range(N):
-        inside_ffp = np.where(~np.isnan(ffp['co2'][i]))[0]
-        for valid in inside_ffp:
-            holding_x[i][valid] = ffp['xr'][i][valid]
-            holding_y[i][valid] = ffp['yr'][i][valid]
-            
-
-    for i in range(len(landsat['lonData'])):
-        # Variable that holds each pixel's: [0] left bound, [1]right bound, [2] upper bound, [3] lower bound
-        pixel = []
-        pixel.append(landsat['lonData'][i] - 15)
-        pixel.append(landsat['lonData'][i] + 15)
-        pixel.append(landsat['latData'][i] + 15)
-        pixel.append(landsat['latData'][i] - 15)
-        
-        ffp_bin = {'xr':[],'yr':[],'co2':[],'ch4':[],'h':[]} # List holding all the ffp points that falls within satellite pixel
-        
-        for j in range(101):
-            for j2 in range(101):
-                if ~np.isnan(holding_x[j][j2]) and ~np.isnan(holding_y[j][j2]):
-                    ffp_xr = ffp['xr'][j][j2]
-                    ffp_yr = ffp['yr'][j][j2]
-                    
-                    if ffp_xr > pixel[0] and ffp_xr < pixel[1] and  ffp_yr < pixel[2] and ffp_yr > pixel[3]:
-                        
-                        ffp_bin['co2'].append(ffp['co2'][j][j2])
-                        ffp_bin['ch4'].append(ffp['ch4'][j][j2])
-                        ffp_bin['h'].append(ffp['h'][j][j2])
-                        ffp_bin['xr'].append(ffp_xr)
-                        ffp_bin['yr'].append(ffp_yr)
-                        
-        if i % 50 == 0:
-            print(f'Matching ffp resolution to landsat resolution progress: {i}/{len(landsat["lonData"])}')
-                
-        matched_ffp['co2'].append(np.nanmean(ffp_bin['co2']))
-        matched_ffp['ch4'].append(np.nanmean(ffp_bin['ch4']))
-        matched_ffp['h'].append(np.nanmean(ffp_bin['h']))
-        matched_ffp['xr'].append(landsat['lonData'][i])
-        matched_ffp['yr'].append(landsat['latData'][i])
+    lonData = np.asarray(landsat['lonData'], dtype=float)
+    latData = np.asarray(landsat['latData'], dtype=float)
+
+    x, y = ffp.axes()
+    if method == 'area':
+        from regrid import RegridOperator, regrid_ffp
+        if cache is not None:
+            from disk_cache import array_key
+            key = array_key('regrid_operator', x, y, lonData, latData)
+            operator = cache.get_or_compute(key, lambda: RegridOperator.build(lonData, latData, x, y))
+        else:
+            operator = RegridOperator.build(lonData, latData, x, y)
+        return regrid_ffp(operator, ffp, lonData, latData)
+    elif method != 'centre':
+        raise ValueError(f'Unknown method "{method}", expected "centre" or "area"')
+
+    col_order = np.argsort(x, kind='stable')
+    row_order = np.argsort(y, kind='stable')
+    if cache is not None:
+        from disk_cache import array_key
+        key = array_key('pixel_bins', x, y, lonData, latData)
+        bins = cache.get_or_compute(key, lambda: pixel_bins(lonData, latData, x[col_order], y[row_order]))
+    else:
+        bins = pixel_bins(lonData, latData, x[col_order], y[row_order])
 
+    # Blacking out ffp cells that are outside of footprint (original = xr,yr are full and fr is NaN'd out)
+    inside_ffp = (~np.isnan(ffp.co2) & ~np.isnan(ffp.xr) & ~np.isnan(ffp.yr))[row_order][:,col_order]
+
+    matched_ffp = {'xr':lonData.copy(),'yr':latData.copy()}
+    for gas in ffp.gases:
+        flux = getattr(ffp, gas)[row_order][:,col_order]
+        matched_ffp[gas] = binned_mean(flux, inside_ffp, bins)
 
     return matched_ffp
-        
\ No newline at end of file
+
+
+def pixel_bins(lonData, latData, x, y):
+    """
+    Range of FARF rows and columns whose cell centres fall strictly inside each 30m/px landsat pixel.
+        Input:
+            1) lonData, latData = pixel centres (m from tower)
+            2) x, y = ascending FARF column (x) and row (y) axes
+        Output:
+            (N x 4) int array of [first row, end row, first column, end column] per pixel (end exclusive)
+    """
+    import numpy as np
+
+    lonData = np.asarray(lonData, dtype=float)
+    latData = np.asarray(latData, dtype=float)
+    return np.column_stack([np.searchsorted(y, latData - 15, side='right'),
+                            np.searchsorted(y, latData + 15, side='left'),
+                            np.searchsorted(x, lonData - 15, side='right'),
+                            np.searchsorted(x, lonData + 15, side='left')])
+
+
+def binned_mean(flux, inside_ffp, bins):
+    """
+    NaN-aware mean of FARF flux over each pixel's block of cells, using summed-area tables so the
+    cost is one pass over the FARF grid plus O(1) per pixel.
+        Input:
+            1) flux = 2D FARF flux array (rows/columns in the ascending axis order used for bins)
+            2) inside_ffp = 2D boolean mask of cells inside the flux footprint
+            3) bins = output of pixel_bins
+        Output:
+            array of mean flux per pixel (NaN where the pixel holds no footprint data)
+    """
+    import numpy as np
+
+    use = inside_ffp & ~np.isnan(flux)
+
+    def summed_area(values):
+        table = np.zeros((values.shape[0]+1, values.shape[1]+1), dtype=values.dtype)
+        np.cumsum(np.cumsum(values, axis=0), axis=1, out=table[1:,1:])
+        return table
+
+    def block_total(table):
+        r0, r1, c0, c1 = bins[:,0], bins[:,1], bins[:,2], bins[:,3]
+        r1 = np.maximum(r0, r1)
+        c1 = np.maximum(c0, c1)
+        return table[r1,c1] - table[r0,c1] - table[r1,c0] + table[r0,c0]
+
+    total = block_total(summed_area(np.where(use, flux, 0.)))
+    count = block_total(summed_area(use.astype(np.int64)))
+
+    mean = np.full(len(bins), np.nan)
+    np.divide(total, count, out=mean, where=count > 0)
+    return mean
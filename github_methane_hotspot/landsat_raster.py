@@ -0,0 +1,238 @@
+"""
+Grid-native Landsat data: the Google Earth Engine export (one row per pixel per scene) snapped to a regular
+lon/lat raster and kept as a (scene x row x col) cube per index.
+
+    cube = LandsatCube.from_export(pd.read_csv('Hogg_spatial_indices_2021_May_Aug.csv', header=1))
+    cube.save('Hogg_landsat.npz')
+
+Pixel positions are stored once (as an affine transform) instead of a lon/lat per pixel per scene, and the
+footprint mask, FARF -> pixel bins and sector labels are computed once per raster (match_cube) and reused for
+every scene, so extracting a scene (cube_landsat) is array indexing.
+"""
+import numpy as np
+
+
+# sector_plot index names and the export columns they come from
+INDEX_COLUMNS = {'MNDWI2': 'MNDWI_SW2', 'MNDWI': 'MNDWI_SW1', 'NDWI': 'NDWI', 'NDVI': 'NDVI', 'temp': 'CELSIUS'}
+
+
+class LandsatCube:
+    """
+    Landsat indices of many scenes on one raster.
+        dates = (scenes,) array of yyyymmdd strings, sorted
+        data = {index: (scenes, rows, cols) array}, NaN where a scene has no value
+        present = (scenes, rows, cols) boolean array, True where the export had a row for the pixel
+        transform = (lon0, dlon, lat0, dlat): centre of pixel [row, col] is
+                    (lon0 + col*dlon, lat0 - row*dlat)
+    """
+    __slots__ = ('dates', 'data', 'present', 'transform', 'shape')
+
+    def __init__(self, dates, data, present, transform):
+        self.dates = np.asarray(dates).astype(str)
+        self.data = data
+        self.present = np.asarray(present, dtype=bool)
+        self.transform = tuple(float(value) for value in transform)
+        self.shape = self.present.shape[1:]
+
+        for index, values in data.items():
+            if values.shape != self.present.shape:
+                raise ValueError(f'Cube "{index}" has shape {values.shape}, expected {self.present.shape}')
+
+    @classmethod
+    def from_export(cls, dataStruct, index_columns=INDEX_COLUMNS, tolerance=0.25, dtype=np.float32):
+        """
+        Snaps a Google Earth Engine export to a raster cube.
+            Input:
+                1) dataStruct = export DataFrame (pd.read_csv(filename, header=1)) or dict of columns with
+                   'id', 'longitude', 'latitude' and the index columns
+                2) index_columns = {cube index name: export column}
+                3) tolerance = largest allowed distance (in pixels) between a pixel and its raster cell centre
+                4) dtype = dtype of the cubes (float32 halves memory, float64 keeps exact export values)
+            Output:
+                LandsatCube
+        """
+        from get_spatial import scene_dates
+
+        lon = np.asarray(dataStruct['longitude'], dtype=float)
+        lat = np.asarray(dataStruct['latitude'], dtype=float)
+        dates, scene = np.unique(scene_dates(dataStruct['id']), return_inverse=True)
+
+        dlon = _grid_step(lon)
+        dlat = _grid_step(lat)
+        lon0 = np.min(lon)
+        lat0 = np.max(lat)
+        col_f = (lon - lon0)/dlon
+        row_f = (lat0 - lat)/dlat
+        col = np.rint(col_f).astype(int)
+        row = np.rint(row_f).astype(int)
+
+        off_grid = max(np.max(np.abs(col_f - col), initial=0), np.max(np.abs(row_f - row), initial=0))
+        if off_grid > tolerance:
+            raise ValueError(f'Pixels are up to {off_grid:.2f} pixels away from a regular lon/lat grid '
+                             f'(tolerance {tolerance})')
+
+        shape = (len(dates), row.max()+1, col.max()+1)
+        present = np.zeros(shape, dtype=bool)
+        present[scene, row, col] = True
+        data = {}
+        for index, column in index_columns.items():
+            data[index] = np.full(shape, np.nan, dtype=dtype)
+            data[index][scene, row, col] = np.asarray(dataStruct[column], dtype=float)
+
+        return cls(dates, data, present, (lon0, dlon, lat0, dlat))
+
+    def lonlat(self):
+        """
+        (rows, cols) arrays of pixel centre longitude and latitude.
+        """
+        lon0, dlon, lat0, dlat = self.transform
+        rows, cols = np.indices(self.shape)
+        return lon0 + cols*dlon, lat0 - rows*dlat
+
+    def pixel_m(self, coordinates):
+        """
+        (rows, cols) arrays of pixel centres in metres east/north of a flux tower (coordinates or site name).
+        """
+        from projection import lonlat_to_m
+        from site_registry import tower_coordinates
+
+        lon, lat = self.lonlat()
+        return lonlat_to_m(lon, lat, tower_coordinates(coordinates))
+
+    def scene(self, date):
+        """
+        Position of a scene date (int or yyyymmdd string) in the cube.
+        """
+        position = np.flatnonzero(self.dates == str(date))
+        if len(position) == 0:
+            raise KeyError(f'No scene on {date}')
+        return position[0]
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def keys(self):
+        return self.data.keys()
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.data.values()) + self.present.nbytes
+
+    def save(self, path):
+        """
+        Saves the cube as a compressed .npz file.
+        """
+        arrays = {'index_'+index: values for index, values in self.data.items()}
+        np.savez_compressed(path, dates=self.dates, present=self.present, transform=np.array(self.transform),
+                            **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as archive:
+            data = {key[6:]: archive[key] for key in archive.files if key.startswith('index_')}
+            return cls(archive['dates'], data, archive['present'], archive['transform'])
+
+    def __repr__(self):
+        return f'LandsatCube(scenes={len(self.dates)}, shape={self.shape}, indices={list(self.data)})'
+
+
+def _grid_step(coord):
+    # Spacing of the coordinate lattice: typical step between neighbouring distinct values (steps of more than
+    # 1.5 pixels, where rows/columns are missing, and float noise are ignored)
+    steps = np.diff(np.unique(coord))
+    steps = steps[steps > 1e-9]
+    if len(steps) == 0:
+        return 1.
+    return float(np.median(steps[steps < 1.5*steps.min()]))
+
+
+# ---------------------------------------------------------------------------------------------------------
+
+def match_cube(cube, ffp, coordinates, cache=None, method='centre'):
+    """
+    Footprint pixels, matched FARF fluxes and sector membership of a raster. They only depend on the raster
+    and the FARF period, so they are computed once and shared by every scene of the cube.
+        Input:
+            1) cube = LandsatCube
+            2) ffp = FARFGrid
+            3) coordinates = flux tower [lon,lat] or site name
+            4) cache = optional DiskCache (see disk_cache.py)
+            5) method = FARF -> pixel matching, 'centre' or 'area' (see ffp_matched_to_landsat)
+        Output:
+            dict:
+                rows, cols = raster indices of the footprint pixels (high to low latitude)
+                lonData, latData = their centres in m from the tower
+                matched_ffp = dict of xr, yr, co2, ch4, h per footprint pixel (see ffp_matched_to_landsat)
+                membership = (pixels, 8) boolean sector membership (see sectors.py)
+    """
+    from landsat_footprint import footprint_pixels, ffp_matched_to_landsat
+    from sectors import sector_membership
+
+    east, north = cube.pixel_m(coordinates)
+    inside = footprint_pixels(east.ravel(), north.ravel(), ffp, cache)
+    rows, cols = np.unravel_index(inside, cube.shape)
+
+    lonData = east[rows, cols]
+    latData = north[rows, cols]
+    matched_ffp = ffp_matched_to_landsat({'lonData': lonData, 'latData': latData}, ffp, cache, method)
+    membership = sector_membership(matched_ffp['xr'], matched_ffp['yr']) if len(rows) else np.zeros((0, 8), bool)
+
+    return {'rows': rows, 'cols': cols, 'lonData': lonData, 'latData': latData, 'matched_ffp': matched_ffp,
+            'membership': membership}
+
+
+def cube_landsat(cube, match, date):
+    """
+    Landsat dict of one scene (as built by sector_plot), restricted to footprint pixels present in the scene.
+        Input:
+            1) cube = LandsatCube
+            2) match = output of match_cube
+            3) date = scene date
+        Output:
+            1) landsat = dict of index arrays, lonData and latData
+            2) keep = positions of these pixels in the match arrays (to select matched_ffp / membership)
+    """
+    scene = cube.scene(date)
+    keep = np.flatnonzero(cube.present[scene, match['rows'], match['cols']])
+    rows, cols = match['rows'][keep], match['cols'][keep]
+
+    landsat = {index: cube.data[index][scene, rows, cols].astype(float) for index in cube.data}
+    landsat['lonData'] = match['lonData'][keep]
+    landsat['latData'] = match['latData'][keep]
+    return landsat, keep
+
+
+def match_cube_periods(cube, farf_cube, coordinates, cache=None, method='centre'):
+    """
+    match_cube for every period of a FARFCube (farf_grid.py). The footprint pixels of each period are found on
+    the shared pixel positions, and all periods are matched to the union of their pixels at once
+    (match_periods in regrid.py).
+        Input:
+            1) cube = LandsatCube
+            2) farf_cube = FARFCube
+            3) coordinates = flux tower [lon,lat] or site name
+            4) cache = optional DiskCache (see disk_cache.py)
+            5) method = 'centre' or 'area' (see ffp_matched_to_landsat)
+        Output:
+            {period: match dict (see match_cube)}
+    """
+    from landsat_footprint import footprint_pixels
+    from regrid import match_periods
+    from sectors import sector_membership
+
+    east, north = cube.pixel_m(coordinates)
+    east, north = east.ravel(), north.ravel()
+    inside = {period: footprint_pixels(east, north, farf_cube.grid(period), cache) for period in farf_cube.periods}
+    union = np.unique(np.concatenate([pixels for pixels in inside.values()] + [np.zeros(0, dtype=int)]))
+    matched = match_periods(farf_cube, east[union], north[union], method, cache)
+
+    matches = {}
+    for period, pixels in inside.items():
+        position = np.searchsorted(union, pixels)
+        rows, cols = np.unravel_index(pixels, cube.shape)
+        matched_ffp = {key: values[position] for key, values in matched[period].items()}
+        membership = (sector_membership(matched_ffp['xr'], matched_ffp['yr']) if len(pixels)
+                      else np.zeros((0, 8), bool))
+        matches[period] = {'rows': rows, 'cols': cols, 'lonData': east[pixels], 'latData': north[pixels],
+                           'matched_ffp': matched_ffp, 'membership': membership}
+    return matches
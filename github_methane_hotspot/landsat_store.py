@@ -0,0 +1,164 @@
+"""
+Partitioned store of Google Earth Engine Landsat exports, one Parquet partition per site and scene date
+(hive style folders, e.g. scenes/site=Hogg/date=20210523/part-<time>-<id>.parquet), so a scene is read without
+parsing the whole multi-year export csv.
+
+Rows keep the export's long format (id, longitude, latitude and the index columns), so a scene read back can be
+given to sector_analysis as landsat_data or turned into a LandsatCube (landsat_raster.py):
+
+    store = LandsatStore('landsat_store')
+    data = store.read('Hogg', dates=[20210523, 20210608])
+    cube = store.cube('Hogg')
+
+Scenes are written by gee_stream.py, with their QA summaries (scene_qa.py) in qa/site=<site>/qa.parquet.
+Requires pyarrow.
+"""
+import os
+import json
+import time
+from uuid import uuid4
+
+
+STORE_VERSION = 1
+EXPORT_COLUMNS = ('id', 'longitude', 'latitude', 'CELSIUS', 'NDVI', 'NDWI', 'MNDWI_SW1', 'MNDWI_SW2')
+
+
+class LandsatStore:
+    """
+    Partitioned Parquet store of Landsat export rows.
+        store = LandsatStore('landsat_store')
+        store.dates('Hogg')  ->  ['20210523', ...]
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+        manifest = os.path.join(root, '_store.json')
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                version = json.load(f)['version']
+            if version > STORE_VERSION:
+                raise ValueError(f'Landsat store {root} has format version {version}, this code reads up to {STORE_VERSION}')
+        else:
+            with open(manifest, 'w') as f:
+                json.dump({'version': STORE_VERSION, 'kind': 'landsat'}, f)
+
+    def partition_dir(self, site, date):
+        return os.path.join(self.root, 'scenes', f'site={site}', f'date={int(date)}')
+
+    def clear_scene(self, site, date):
+        """
+        Deletes the rows of one scene.
+        """
+        import shutil
+        folder = self.partition_dir(site, date)
+        if os.path.isdir(folder):
+            shutil.rmtree(folder)
+
+    def write_part(self, site, date, frame):
+        """
+        Adds rows (DataFrame in the export format) to a scene. A scene can be written in several parts.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        folder = self.partition_dir(site, date)
+        os.makedirs(folder, exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({'store_version': str(STORE_VERSION)})
+
+        # Part names are unique per writer (so concurrent writers never replace each other's parts) and sort in
+        # writing order. Written under a hidden temporary name and swapped in, so a part is never half written.
+        name = f'part-{time.time_ns()}-{uuid4().hex[:12]}'
+        tmp = os.path.join(folder, f'.{name}.tmp')
+        pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(folder, f'{name}.parquet'))
+
+    def sites(self):
+        folder = os.path.join(self.root, 'scenes')
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name[5:] for name in os.listdir(folder) if name.startswith('site='))
+
+    def dates(self, site):
+        """
+        Sorted scene dates (yyyymmdd strings) of a site.
+        """
+        folder = os.path.join(self.root, 'scenes', f'site={site}')
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name[5:] for name in os.listdir(folder) if name.startswith('date='))
+
+    def read(self, site, dates=None, columns=None):
+        """
+        Export rows of some scenes of a site, as the DataFrame pd.read_csv(export, header=1) would give.
+            Input:
+                1) site = site name
+                2) dates = one date, a list of dates, or a (first, last) tuple range. None reads all.
+                3) columns = columns to read (default all)
+        """
+        import numpy as np
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        available = self.dates(site)
+        if dates is None:
+            selected = available
+        elif isinstance(dates, tuple):
+            selected = [date for date in available if int(dates[0]) <= int(date) <= int(dates[1])]
+        else:
+            wanted = {str(int(date)) for date in np.atleast_1d(dates)}
+            selected = [date for date in available if date in wanted]
+
+        frames = []
+        for date in selected:
+            folder = self.partition_dir(site, date)
+            for name in sorted(os.listdir(folder)):
+                if name.endswith('.parquet'):
+                    frames.append(pq.read_table(os.path.join(folder, name), columns=columns).to_pandas())
+        if not frames:
+            return pd.DataFrame(columns=list(columns or EXPORT_COLUMNS))
+        return pd.concat(frames, ignore_index=True)
+
+    def qa_path(self, site):
+        return os.path.join(self.root, 'qa', f'site={site}', 'qa.parquet')
+
+    def write_qa(self, site, table):
+        """
+        Stores scene QA summaries (scene_qa.SceneQA.table) of a site. Dates already stored are replaced,
+        other dates are kept.
+        """
+        import pandas as pd
+
+        table = table.assign(date=table['date'].astype(str))
+        previous = self.read_qa(site)
+        if previous is not None:
+            table = pd.concat([previous[~previous['date'].isin(table['date'])], table], ignore_index=True)
+        table = table.sort_values('date', ignore_index=True)
+
+        path = self.qa_path(site)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = os.path.join(os.path.dirname(path), f'.qa-{os.getpid()}-{uuid4().hex}.tmp')
+        table.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def read_qa(self, site):
+        """
+        Scene QA table of a site (one row per date), or None if no QA was stored.
+        """
+        import pandas as pd
+
+        path = self.qa_path(site)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)
+
+    def cube(self, site, dates=None, **kwargs):
+        """
+        LandsatCube (landsat_raster.py) of some scenes of a site. kwargs are passed to LandsatCube.from_export.
+        """
+        from landsat_raster import LandsatCube
+        return LandsatCube.from_export(self.read(site, dates), **kwargs)
+
+    def __repr__(self):
+        return f'LandsatStore({self.root!r})'
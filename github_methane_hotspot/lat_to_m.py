@@ -1,9 +1,11 @@
 def lat_to_m(degree, coordinates):
     """
-    degree is the single point's latitude of a spatial map
+    degree is the single point's latitude of a spatial map (or an array of latitudes)
     coordinates are the flux tower coordiantes listed in [lon, lat] format
     e.g. coordinates = [-122.9849,49.1293]
+    See projection.py for the latitude dependent metres per degree.
     """
+    from projection import lonlat_to_m
     Point = coordinates
-    metre = (degree-Point[1])/(1/111000)
-    return metre
\ No newline at end of file
+    metre = lonlat_to_m(Point[0], degree, Point)[1]
+    return metre
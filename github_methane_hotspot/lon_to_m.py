@@ -1,9 +1,11 @@
 def lon_to_m(degree, coordinates):
     """
-    degree is the single point's longitude of a spatial map
+    degree is the single point's longitude of a spatial map (or an array of longitudes)
     coordinates are the flux tower coordiantes listed in [lon, lat] format
     e.g. coordinates = [-122.9849,49.1293]
+    See projection.py for the latitude dependent metres per degree.
     """
+    from projection import lonlat_to_m
     Point = coordinates
-    metre = (degree-Point[0])/(1/85000)
-    return metre
\ No newline at end of file
+    metre = lonlat_to_m(degree, Point[1], Point)[0]
+    return metre
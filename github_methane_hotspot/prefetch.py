@@ -0,0 +1,232 @@
+"""
+Prefetching loader for batch runs over many (site, FARF period, Landsat date) jobs.
+
+While one job's matching and statistics run, the inputs of the next jobs (the site's Google Earth Engine export
+and the five FARF csv files of the period) are read and parsed in a background thread pool. Inputs shared by
+several jobs (the same export for every date of a site, the same FARF files for every date of a period) are
+read once and released after the last job using them.
+
+The number of jobs read ahead is limited by "depth" and by a memory budget: a job is only prefetched if the
+inputs held in memory (estimated from the file sizes) stay below the budget. The inputs of the current job are
+always loaded, even if they alone exceed the budget.
+"""
+import os
+
+
+def job_inputs(job, roots):
+    """
+    Input files of one job.
+        Input:
+            1) job = dict with 'site', 'ffp_filename', 'date' and optionally 'landsat_filename'
+               (default: the site's export in sites.csv)
+            2) roots = DataRoots (see data_io.py)
+        Output:
+            dict of {key: path}, key = ('landsat', path) or ('farf', farf_prefix, ffp_filename)
+    """
+    from site_registry import resolve_site
+
+    site = resolve_site(job['site'])
+    landsat_filename = job.get('landsat_filename') or site.landsat_export
+    return {'landsat': ('landsat', roots.landsat_path(landsat_filename)),
+            'ffp': ('farf', site.farf_prefix, job['ffp_filename'])}
+
+
+def _load(key, roots):
+    from data_io import read_landsat_export, read_farf_files
+
+    if key[0] == 'landsat':
+        return read_landsat_export(key[1], roots)
+    return read_farf_files(key[1], key[2], roots)
+
+
+def _estimated_bytes(key, roots):
+    # Parsed csv data takes roughly as much memory as the csv text
+    if key[0] == 'landsat':
+        paths = [key[1]]
+    else:
+        paths = [roots.farf_path(key[1], key[2], file_key) for file_key in ('x', 'y', 'co2', 'ch4', 'h')]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+class Prefetcher:
+    """
+    Iterates over jobs, yielding (job, inputs) with inputs = {'landsat_data': DataFrame, 'ffp': FARFGrid},
+    while the next jobs' inputs load in the background. If a job's inputs can not be resolved (unknown site,
+    no Landsat export) or read, the error is raised when the job is reached, or yielded in place of inputs when
+    raise_errors is False.
+        for job, inputs in Prefetcher(jobs, depth=3, memory_budget=4e9):
+            Alldata = sector_analysis(..., **inputs)
+    """
+    def __init__(self, jobs, roots=None, depth=2, max_workers=4, memory_budget=2e9, raise_errors=True):
+        from data_io import resolve_roots
+
+        self.jobs = list(jobs)
+        self.roots = resolve_roots(roots)
+        self.depth = depth
+        self.max_workers = max_workers
+        self.memory_budget = memory_budget
+        self.raise_errors = raise_errors
+        self.peak_bytes = 0 # largest estimated memory held by loaded/loading inputs
+
+    def __iter__(self):
+        from collections import Counter
+        from concurrent.futures import ThreadPoolExecutor
+
+        def resolve(job):
+            try:
+                return job_inputs(job, self.roots)
+            except Exception as error:
+                return error
+
+        # A job whose inputs can not be resolved holds its error instead of keys, and loads nothing
+        keys = [resolve(job) for job in self.jobs]
+        uses = Counter(key for job_keys in keys if not isinstance(job_keys, Exception) for key in job_keys.values())
+        futures = {}
+        sizes = {}
+
+        def held():
+            return sum(sizes[key] for key in futures)
+
+        def schedule(i, force=False):
+            if isinstance(keys[i], Exception):
+                return True
+            new = [key for key in keys[i].values() if key not in futures]
+            for key in new:
+                sizes.setdefault(key, _estimated_bytes(key, self.roots))
+            if not force and held() + sum(sizes[key] for key in new) > self.memory_budget:
+                return False
+            for key in new:
+                futures[key] = pool.submit(_load, key, self.roots)
+            self.peak_bytes = max(self.peak_bytes, held())
+            return True
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            scheduled = 0
+            for i, job in enumerate(self.jobs):
+                if scheduled <= i:
+                    schedule(i, force=True)
+                    scheduled = i + 1
+                # Reading ahead, in job order, while the budget allows
+                while scheduled < min(i + 1 + self.depth, len(self.jobs)) and schedule(scheduled):
+                    scheduled += 1
+
+                try:
+                    if isinstance(keys[i], Exception):
+                        raise keys[i]
+                    inputs = {name: futures[key].result() for name, key in keys[i].items()}
+                    inputs = {'landsat_data': inputs['landsat'], 'ffp': inputs['ffp']}
+                except Exception as error:
+                    if self.raise_errors:
+                        raise
+                    inputs = error
+                yield job, inputs
+
+                # Releasing inputs no later job needs
+                if isinstance(keys[i], Exception):
+                    continue
+                for key in keys[i].values():
+                    uses[key] -= 1
+                    if uses[key] == 0:
+                        del futures[key]
+
+
+def job_name(job):
+    """
+    Key of a job in run_batch's results and errors: (site name, ffp_filename, date). A site given as a Site or
+    as tower coordinates is replaced by its registry name (a tuple of the coordinates if it is not registered).
+    """
+    from site_registry import resolve_site
+
+    site = job['site']
+    if not isinstance(site, str):
+        try:
+            site = resolve_site(site).name
+        except KeyError:
+            site = tuple(site)
+    return (site, job['ffp_filename'], job['date'])
+
+
+def _qa_filter(jobs, qa_store, min_valid_fraction, min_valid_rows, flag_only):
+    """
+    Splits jobs by the QA summaries of their scenes: (jobs to run, {name: reason} of flagged jobs,
+    {name: LowQualityScene} of skipped jobs). Jobs whose QA can not be looked up (e.g. unknown site) are run,
+    so their error goes through run_batch's per-job error handling.
+    """
+    from scene_qa import LowQualityScene, failing_scenes
+
+    failing = {}
+    run, flags, skipped = [], {}, {}
+    for job in jobs:
+        name = job_name(job)
+        site = name[0]
+        try:
+            if site not in failing:
+                table = qa_store.read_qa(site)
+                failing[site] = {} if table is None else failing_scenes(table, min_valid_fraction, min_valid_rows)
+            reason = failing[site].get(str(int(job['date'])))
+        except Exception:
+            reason = None
+        if reason is None:
+            run.append(job)
+        elif flag_only:
+            flags[name] = reason
+            run.append(job)
+        else:
+            skipped[name] = LowQualityScene(f'Scene {job["date"]} of {site}: {reason}')
+    return run, flags, skipped
+
+
+def run_batch(jobs, roots=None, depth=2, max_workers=4, memory_budget=2e9, geometry_cache=None, n_permutations=0,
+              store=None, skip_errors=False, qa_store=None, min_valid_fraction=0.5, min_valid_rows=8,
+              flag_only=False, verbosity=0):
+    """
+    Runs sector_analysis for every job with prefetched inputs.
+        Input:
+            1) jobs = list of dicts with 'site', 'ffp_filename', 'date' (and optionally 'landsat_filename')
+            2) roots = DataRoots or dict of input folders (see data_io.py)
+            3) depth, max_workers, memory_budget = prefetching settings (see Prefetcher)
+            4) geometry_cache, n_permutations = passed to sector_analysis
+            5) store = optional ResultsStore (results_store.py). Results are appended to it instead of
+               being kept in memory.
+            6) skip_errors = if True, a failing job is reported and skipped instead of stopping the batch
+            7) qa_store = optional LandsatStore (landsat_store.py) holding scene QA summaries (scene_qa.py). Jobs
+               whose scene is below min_valid_fraction / min_valid_rows (see scene_qa.failing_scenes) are
+               skipped before their inputs are read. Scenes without a QA summary are run.
+            8) flag_only = if True, low quality scenes are run anyway, with Alldata['scene_qa'] = the reason
+            9) verbosity = 1 prints every skipped job as it fails (they are all returned in errors)
+        Output:
+            1) results = dict of {(site name, ffp_filename, date): Alldata} (empty if store is given), see job_name
+            2) errors = dict of {(site name, ffp_filename, date): exception}. Skipped scenes are
+               scene_qa.LowQualityScene errors.
+    """
+    from sector_analysis import sector_analysis
+
+    errors = {}
+    flags = {}
+    if qa_store is not None:
+        jobs, flags, errors = _qa_filter(jobs, qa_store, min_valid_fraction, min_valid_rows, flag_only)
+
+    loader = Prefetcher(jobs, roots, depth, max_workers, memory_budget, raise_errors=not skip_errors)
+    results = {}
+    for job, inputs in loader:
+        name = job_name(job)
+        try:
+            if isinstance(inputs, Exception):
+                raise inputs
+            Alldata = sector_analysis(job['date'], job.get('landsat_filename'), job['ffp_filename'], job['site'],
+                                      geometry_cache, n_permutations, loader.roots, **inputs)
+        except Exception as error:
+            if not skip_errors:
+                raise
+            if verbosity > 0:
+                print(f'Skipping {name}: {error!r}')
+            errors[name] = error
+            continue
+        if name in flags:
+            Alldata['scene_qa'] = flags[name]
+
+        if store is not None:
+            store.append(Alldata, Alldata['site'], job['ffp_filename'], job['date'])
+        else:
+            results[name] = Alldata
+    return results, errors
@@ -0,0 +1,62 @@
+"""
+Tower-relative projection of longitude/latitude (degrees) into local east/north distances (metres).
+
+Uses a local equirectangular (tangent plane) projection centred on the flux tower. The metres per degree
+are taken from the WGS84 meridional and prime-vertical radii of curvature at the tower latitude, instead of
+fixed factors, so it holds at any site latitude (e.g. ~71.1 km per degree of longitude at 50.4N, ~87.8 km
+at 38N). Over the few hundred metres of a flux footprint the error of the flat projection is a few cm.
+"""
+import numpy as np
+from functools import lru_cache
+
+# WGS84 ellipsoid
+_SEMI_MAJOR_AXIS = 6378137.0 # [m]
+_ECCENTRICITY_SQ = 6.69437999014e-3
+
+
+@lru_cache(maxsize=None)
+def _projection_constants(lon0, lat0):
+    phi = np.radians(lat0)
+    w = np.sqrt(1 - _ECCENTRICITY_SQ*np.sin(phi)**2)
+    meridional_radius = _SEMI_MAJOR_AXIS*(1 - _ECCENTRICITY_SQ)/w**3
+    prime_vertical_radius = _SEMI_MAJOR_AXIS/w
+    m_per_deg_lat = np.pi/180*meridional_radius
+    m_per_deg_lon = np.pi/180*prime_vertical_radius*np.cos(phi)
+    return lon0, lat0, m_per_deg_lon, m_per_deg_lat
+
+
+def projection_constants(coordinates):
+    """
+    Per-site projection constants (cached, so they are only computed once per tower).
+        Input:
+            1) coordinates = flux tower coordinates in [lon, lat] format. (e.g: [-100.534, 50.371])
+        Output:
+            (lon0, lat0, metres per degree longitude, metres per degree latitude)
+    """
+    return _projection_constants(float(coordinates[0]), float(coordinates[1]))
+
+
+def lonlat_to_m(lon, lat, coordinates):
+    """
+    Converts longitude/latitude to metres east/north of the flux tower in one vectorized call.
+        Input:
+            1) lon, lat = longitude and latitude in degrees (scalars or arrays)
+            2) coordinates = flux tower coordinates in [lon, lat] format
+        Output:
+            1) east = metres east of tower
+            2) north = metres north of tower
+    """
+    lon0, lat0, m_per_deg_lon, m_per_deg_lat = projection_constants(coordinates)
+    east = (np.asarray(lon, dtype=float) - lon0)*m_per_deg_lon
+    north = (np.asarray(lat, dtype=float) - lat0)*m_per_deg_lat
+    return east, north
+
+
+def m_to_lonlat(east, north, coordinates):
+    """
+    Inverse of lonlat_to_m: metres east/north of the flux tower back to longitude/latitude in degrees.
+    """
+    lon0, lat0, m_per_deg_lon, m_per_deg_lat = projection_constants(coordinates)
+    lon = lon0 + np.asarray(east, dtype=float)/m_per_deg_lon
+    lat = lat0 + np.asarray(north, dtype=float)/m_per_deg_lat
+    return lon, lat
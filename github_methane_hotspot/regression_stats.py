@@ -0,0 +1,78 @@
+"""
+Vectorized linear regression and Pearson correlation of many spatial indices against a flux.
+
+Replaces per-index np.polyfit / scipy.stats.pearsonr calls: slope, intercept, r, p and n of every column are
+computed at once with NaN-aware masking (a pixel is used for a column only if both the index and the flux are
+non-NaN). Leading dimensions broadcast, so several gases or date pairs (padded with NaN, see stack_ragged) can
+be screened in one call.
+"""
+import numpy as np
+
+
+def regress_columns(X, y):
+    """
+    Least-squares fit y = slope*X + intercept and Pearson r/p for every column of X.
+        Input:
+            1) X = (..., pixels, indices) array of spatial index values
+            2) y = (..., pixels) array of flux values (e.g. matched_ffp['ch4'])
+        Output:
+            dict of (..., indices) arrays:
+                slope, intercept = regression coefficients (same as np.polyfit(x, y, 1))
+                r, p = Pearson correlation coefficient and two-sided p-value (same as scipy.stats.pearsonr)
+                n = number of pixels used
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if X.ndim == 1:
+        X = X[:,None]
+    y = y[...,:,None]
+
+    valid = ~np.isnan(X) & ~np.isnan(y)
+    n = valid.sum(axis=-2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(valid, X, 0).sum(axis=-2)/n
+        mean_y = np.where(valid, y, 0).sum(axis=-2)/n
+        dx = np.where(valid, X - mean_x[...,None,:], 0)
+        dy = np.where(valid, y - mean_y[...,None,:], 0)
+        sxx = (dx*dx).sum(axis=-2)
+        syy = (dy*dy).sum(axis=-2)
+        sxy = (dx*dy).sum(axis=-2)
+
+        slope = sxy/sxx
+        intercept = mean_y - slope*mean_x
+        r = np.clip(sxy/np.sqrt(sxx*syy), -1, 1)
+
+    return {'slope': slope, 'intercept': intercept, 'r': r, 'p': pearson_p(r, n), 'n': n}
+
+
+def pearson_p(r, n):
+    """
+    Two-sided p-value of Pearson r for n samples (t-test with n-2 degrees of freedom), vectorized.
+    1.0 where n <= 2 (a line through two points says nothing about the correlation), as scipy.stats.pearsonr.
+    """
+    from scipy.special import betainc
+
+    r = np.asarray(r, dtype=float)
+    df = np.asarray(n, dtype=float) - 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = betainc(df/2, 0.5, np.clip(1 - r**2, 0, 1))
+    return np.where(df > 0, p, np.where(np.isnan(r), np.nan, 1.0))
+
+
+def stack_ragged(arrays, fill=np.nan):
+    """
+    Stacks arrays with different numbers of pixels (first axis) into one array padded with NaN, so that
+    regressions of many date pairs can be run with a single regress_columns call.
+        Input:
+            1) arrays = list of (pixels, ...) arrays with matching trailing shapes
+        Output:
+            (len(arrays), max pixels, ...) array
+    """
+    arrays = [np.asarray(a, dtype=float) for a in arrays]
+    n_max = max((len(a) for a in arrays), default=0)
+    trailing = arrays[0].shape[1:] if arrays else ()
+    out = np.full((len(arrays), n_max) + trailing, fill)
+    for i, a in enumerate(arrays):
+        out[i, :len(a)] = a
+    return out
@@ -0,0 +1,220 @@
+"""
+Exact area-weighted regridding of FARF model output onto Landsat pixels.
+
+ffp_matched_to_landsat (method='centre') averages the FARF cells whose centres fall strictly inside each 30m/px
+Landsat pixel, with equal weights, so cells straddling a pixel edge are dropped. Here every FARF cell is weighted
+by the area it shares with the pixel. The overlaps only depend on the FARF axes and the pixel centres, so they
+are computed once as a sparse (pixels x cells) matrix (RegridOperator) and applied to any number of flux fields
+(co2, ch4, h, of one or many FARF periods on the same grid) with one sparse matrix product:
+
+    operator = RegridOperator.build(lonData, latData, x, y)
+    matched = operator.apply(fields)    # fields = (cells, k) stack, NaN outside the footprint
+
+NaN cells are left out: each pixel value is the overlap-weighted mean of the cells with data.
+"""
+import numpy as np
+
+
+def cell_edges(centres):
+    """
+    Cell edges of an ascending axis of cell centres: midpoints between centres, and half a step beyond the
+    first and last centres.
+    """
+    centres = np.asarray(centres, dtype=float)
+    if len(centres) == 1:
+        return np.array([centres[0] - 0.5, centres[0] + 0.5])
+    middle = (centres[1:] + centres[:-1])/2
+    return np.concatenate([[2*centres[0] - middle[0]], middle, [2*centres[-1] - middle[-1]]])
+
+
+def interval_overlaps(lo, hi, edges):
+    """
+    Overlap lengths of intervals [lo, hi] with the cells between consecutive edges.
+        Output:
+            1) first = index of the first cell overlapping each interval
+            2) overlap = (intervals, k) overlap length with cells first ... first+k-1 (0 past the last overlap)
+    """
+    n_cells = len(edges) - 1
+    first = np.clip(np.searchsorted(edges, lo, side='right') - 1, 0, max(n_cells - 1, 0))
+    last = np.clip(np.searchsorted(edges, hi, side='left') - 1, 0, max(n_cells - 1, 0))
+    k = int(np.max(last - first, initial=0)) + 1
+
+    cells = first[:, None] + np.arange(k)[None, :]
+    valid = cells < n_cells
+    cells = np.minimum(cells, n_cells - 1)
+    overlap = np.minimum(hi[:, None], edges[cells + 1]) - np.maximum(lo[:, None], edges[cells])
+    return first, np.where(valid, np.maximum(overlap, 0), 0)
+
+
+class RegridOperator:
+    """
+    Sparse (pixels x FARF cells) matrix of overlap areas [m2] between Landsat pixels and FARF cells.
+        matrix = scipy.sparse CSR matrix, columns in the FARF arrays' flattened (row, col) order
+        shape = FARF grid shape
+    """
+    __slots__ = ('matrix', 'shape')
+
+    def __init__(self, matrix, shape):
+        self.matrix = matrix.tocsr()
+        self.shape = tuple(shape)
+
+    @classmethod
+    def build(cls, lonData, latData, x, y, pixel_size=30.):
+        """
+        Overlaps of square pixels (centres lonData, latData in m from the tower, side pixel_size) with the FARF
+        cells of axes x (columns) and y (rows). The axes may be in any order (as written by the FARF model).
+        """
+        from scipy import sparse
+
+        lonData = np.asarray(lonData, dtype=float).ravel()
+        latData = np.asarray(latData, dtype=float).ravel()
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        col_order = np.argsort(x, kind='stable')
+        row_order = np.argsort(y, kind='stable')
+
+        half = pixel_size/2
+        first_col, x_overlap = interval_overlaps(lonData - half, lonData + half, cell_edges(x[col_order]))
+        first_row, y_overlap = interval_overlaps(latData - half, latData + half, cell_edges(y[row_order]))
+
+        # Pixel p overlaps cell (row, col) by y_overlap * x_overlap: outer product per pixel
+        n_pixels, k_rows = y_overlap.shape
+        k_cols = x_overlap.shape[1]
+        area = y_overlap[:, :, None]*x_overlap[:, None, :]
+        rows = row_order[np.minimum(first_row[:, None] + np.arange(k_rows), len(y) - 1)]
+        cols = col_order[np.minimum(first_col[:, None] + np.arange(k_cols), len(x) - 1)]
+        cells = rows[:, :, None]*len(x) + cols[:, None, :]
+        pixels = np.broadcast_to(np.arange(n_pixels)[:, None, None], area.shape)
+
+        nonzero = area > 0
+        matrix = sparse.csr_matrix((area[nonzero], (pixels[nonzero], cells[nonzero])),
+                                   shape=(n_pixels, len(y)*len(x)))
+        return cls(matrix, (len(y), len(x)))
+
+    @property
+    def n_pixels(self):
+        return self.matrix.shape[0]
+
+    def apply(self, fields, min_coverage=0.):
+        """
+        Overlap-weighted means of FARF fields per pixel.
+            Input:
+                1) fields = FARF array of the grid shape, or (cells, k) stack of k flattened fields
+                2) min_coverage = smallest fraction of the pixel's overlap that must hold data (0 keeps any
+                   pixel with at least one cell with data)
+            Output:
+                (pixels,) or (pixels, k) array, NaN where a pixel has no data (or less than min_coverage)
+        """
+        fields = np.asarray(fields, dtype=float)
+        single = fields.shape == self.shape
+        stack = fields.reshape(-1, 1) if single else fields.reshape(self.matrix.shape[1], -1)
+
+        valid = ~np.isnan(stack)
+        total = self.matrix @ np.where(valid, stack, 0.)
+        weight = self.matrix @ valid.astype(float)
+        mean = np.full(total.shape, np.nan)
+        np.divide(total, weight, out=mean, where=weight > 0)
+        if min_coverage > 0:
+            overlap = np.asarray(self.matrix.sum(axis=1))
+            mean[weight < min_coverage*overlap] = np.nan
+        return mean[:, 0] if single else mean
+
+    def __repr__(self):
+        return f'RegridOperator(pixels={self.n_pixels}, farf_shape={self.shape}, nnz={self.matrix.nnz})'
+
+
+def farf_fields(ffp, gases=None):
+    """
+    (cells, gases) stack of the FARF fluxes, NaN outside the footprint (cells where co2, xr or yr is NaN, as in
+    ffp_matched_to_landsat).
+    """
+    if gases is None:
+        gases = ffp.gases
+    outside = np.isnan(ffp.co2) | np.isnan(ffp.xr) | np.isnan(ffp.yr)
+    return np.column_stack([np.where(outside, np.nan, getattr(ffp, gas)).ravel() for gas in gases])
+
+
+def regrid_ffp(operator, ffps, lonData, latData, gases=None, min_coverage=0.):
+    """
+    matched_ffp dicts of one or many FARF periods on the same grid, with one sparse product.
+        Input:
+            1) operator = RegridOperator of the FARF grid and the pixels
+            2) ffps = FARFGrid or list of FARFGrids
+            3) lonData, latData = pixel centres (m from tower), stored as xr, yr
+            4) gases = default ('co2', 'ch4', 'h')
+            5) min_coverage = see RegridOperator.apply
+        Output:
+            matched_ffp dict (xr, yr, co2, ch4, h per pixel), or list of them for a list of FARFGrids
+    """
+    single = not isinstance(ffps, (list, tuple))
+    ffps = [ffps] if single else list(ffps)
+    if gases is None:
+        gases = ffps[0].gases
+
+    means = operator.apply(np.column_stack([farf_fields(ffp, gases) for ffp in ffps]), min_coverage)
+    matched = []
+    for ii in range(len(ffps)):
+        matched_ffp = {'xr': np.array(lonData, dtype=float), 'yr': np.array(latData, dtype=float)}
+        for jj, gas in enumerate(gases):
+            matched_ffp[gas] = means[:, ii*len(gases) + jj]
+        matched.append(matched_ffp)
+    return matched[0] if single else matched
+
+
+def match_periods(farf_cube, lonData, latData, method='centre', cache=None):
+    """
+    matched_ffp of every period of a FARFCube (farf_grid.py) for the same pixels, with the pixel geometry
+    (overlap operator or cell bins) computed once for all periods.
+        Input:
+            1) farf_cube = FARFCube
+            2) lonData, latData = pixel centres (m from tower)
+            3) method = 'centre' (cells with centres inside the pixel, the ffp_matched_to_landsat default) or
+               'area' (overlap-weighted, one sparse product for all periods and gases)
+            4) cache = optional DiskCache for the operator / bins
+        Output:
+            {period: matched_ffp dict}
+    """
+    lonData = np.asarray(lonData, dtype=float)
+    latData = np.asarray(latData, dtype=float)
+    n_periods, n_gases = farf_cube.data.shape[:2]
+
+    # Cells outside each period's footprint are NaN for every gas (as in ffp_matched_to_landsat)
+    co2 = farf_cube.data[:, farf_cube.gases.index('co2')]
+    outside = farf_cube.outside | np.isnan(co2)
+    fields = np.where(outside[:, None], np.nan, farf_cube.data)
+
+    if method == 'area':
+        def build():
+            return RegridOperator.build(lonData, latData, farf_cube.x, farf_cube.y)
+        if cache is not None:
+            from disk_cache import array_key
+            operator = cache.get_or_compute(array_key('regrid_operator', farf_cube.x, farf_cube.y, lonData, latData),
+                                            build)
+        else:
+            operator = build()
+        means = operator.apply(fields.reshape(n_periods*n_gases, -1).T).T.reshape(n_periods, n_gases, -1)
+    elif method == 'centre':
+        from landsat_footprint import pixel_bins, binned_mean
+        col_order = np.argsort(farf_cube.x, kind='stable')
+        row_order = np.argsort(farf_cube.y, kind='stable')
+        if cache is not None:
+            from disk_cache import array_key
+            key = array_key('pixel_bins', farf_cube.x, farf_cube.y, lonData, latData)
+            bins = cache.get_or_compute(key, lambda: pixel_bins(lonData, latData, farf_cube.x[col_order],
+                                                                farf_cube.y[row_order]))
+        else:
+            bins = pixel_bins(lonData, latData, farf_cube.x[col_order], farf_cube.y[row_order])
+        fields = fields[:, :, row_order][:, :, :, col_order]
+        inside = ~outside[:, row_order][:, :, col_order]
+        means = np.array([[binned_mean(fields[ii, jj], inside[ii], bins) for jj in range(n_gases)]
+                          for ii in range(n_periods)])
+    else:
+        raise ValueError(f'Unknown method "{method}", expected "centre" or "area"')
+
+    matched = {}
+    for ii, period in enumerate(farf_cube.periods):
+        matched_ffp = {'xr': lonData.copy(), 'yr': latData.copy()}
+        for jj, gas in enumerate(farf_cube.gases):
+            matched_ffp[gas] = means[ii, jj]
+        matched[period] = matched_ffp
+    return matched
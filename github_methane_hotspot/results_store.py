@@ -0,0 +1,202 @@
+"""
+Results store for sector_plot runs, replacing the per-run pickles (e.g. Hogg_FFP={period}.p).
+
+Results are kept in Parquet datasets under one root folder, one dataset per table, partitioned by
+site / FARF period / Landsat date (hive style folders, e.g. pixels/site=Hogg/farf=july2022/date=20220717/):
+    - pixels: one row per matched pixel (landsat pixel position, all indices, matched xr/yr/co2/ch4/h)
+    - sectors: one row per sector (sector averages of ch4 and of every index)
+    - regressions: one row per index and regression kind ('sector' and 'pixel', with the spatially
+      corrected p-values of significance.py for the pixel kind)
+
+Appending a run writes its partition of every table (replacing an earlier run of the same site/period/date),
+and a season of results is read back with one filtered columnar read (query) instead of unpickling every run.
+Every file records the store format version, checked when the store is opened.
+
+Requires pyarrow.
+"""
+import os
+import json
+from uuid import uuid4
+import numpy as np
+
+
+STORE_VERSION = 1
+TABLES = ('pixels', 'sectors', 'regressions')
+INDICES = ('MNDWI2','MNDWI','NDWI','NDVI','temp')
+
+
+class ResultsStore:
+    """
+    Partitioned Parquet store of sector_plot results.
+        store = ResultsStore('results')
+        store.append(Alldata, 'Hogg', 'july2022.csv', 20220717)
+        regressions = store.query('regressions', site='Hogg', where={'kind': 'sector'})
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+        manifest = os.path.join(root, '_store.json')
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                version = json.load(f)['version']
+            if version > STORE_VERSION:
+                raise ValueError(f'Results store {root} has format version {version}, this code reads up to {STORE_VERSION}')
+        else:
+            with open(manifest, 'w') as f:
+                json.dump({'version': STORE_VERSION, 'tables': list(TABLES)}, f)
+
+    def partition_dir(self, table, site, farf_period, date):
+        return os.path.join(self.root, table, f'site={site}', f'farf={farf_period}', f'date={int(date)}')
+
+    def append(self, Alldata, site, farf_period, date):
+        """
+        Adds one sector_plot run to the store.
+            Input:
+                1) Alldata = last output of sector_plot
+                2) site {string} = site name (e.g. 'Hogg')
+                3) farf_period {string} = FARF period, e.g. the ffp_filename given to sector_plot ('.csv' is dropped)
+                4) date {int} = Landsat date (e.g. 20220717)
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        farf_period = _period_name(farf_period)
+        tables = {'pixels': pixel_columns(Alldata), 'sectors': sector_columns(Alldata),
+                  'regressions': regression_columns(Alldata)}
+
+        for table, columns in tables.items():
+            folder = self.partition_dir(table, site, farf_period, date)
+            os.makedirs(folder, exist_ok=True)
+            data = pa.table(columns).replace_schema_metadata({'store_version': str(STORE_VERSION)})
+
+            # Written under a hidden temporary name (skipped by dataset discovery, unique per writer) and
+            # swapped in, so a query never reads a half written partition
+            tmp = os.path.join(folder, f'.part-{os.getpid()}-{uuid4().hex}.tmp')
+            pq.write_table(data, tmp)
+            os.replace(tmp, os.path.join(folder, 'part.parquet'))
+
+    def remove(self, site, farf_period, date):
+        """
+        Deletes one run from every table.
+        """
+        import shutil
+        for table in TABLES:
+            folder = self.partition_dir(table, site, _period_name(farf_period), date)
+            if os.path.isdir(folder):
+                shutil.rmtree(folder)
+
+    def dataset(self, table):
+        """
+        pyarrow dataset of one table, with site, farf and date partition columns.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if table not in TABLES:
+            raise KeyError(f'Unknown table "{table}", expected one of {TABLES}')
+        partitioning = ds.partitioning(pa.schema([('site', pa.string()), ('farf', pa.string()), ('date', pa.int64())]),
+                                       flavor='hive')
+        path = os.path.join(self.root, table)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f'No "{table}" results in {self.root}')
+        return ds.dataset(path, format='parquet', partitioning=partitioning)
+
+    def query(self, table, site=None, farf_period=None, dates=None, columns=None, where=None):
+        """
+        Reads results of many runs at once, as a pandas DataFrame.
+            Input:
+                1) table = 'pixels', 'sectors' or 'regressions'
+                2) site, farf_period = one value or a list of values. None reads all.
+                3) dates = one date, a list of dates, or a (first, last) tuple range. None reads all.
+                4) columns = columns to read (default all)
+                5) where = dict of {column: value or list of values} filters on other columns
+            Output:
+                DataFrame with site, farf and date columns added. Only matching partitions are read.
+        """
+        import pyarrow.dataset as ds
+
+        conditions = []
+        if site is not None:
+            conditions.append(_isin('site', site))
+        if farf_period is not None:
+            periods = [farf_period] if isinstance(farf_period, str) else farf_period
+            conditions.append(_isin('farf', [_period_name(period) for period in periods]))
+        if dates is not None:
+            if isinstance(dates, tuple):
+                conditions.append((ds.field('date') >= int(dates[0])) & (ds.field('date') <= int(dates[1])))
+            else:
+                conditions.append(_isin('date', np.atleast_1d(dates).astype(int).tolist()))
+        for column, value in (where or {}).items():
+            conditions.append(_isin(column, value))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return self.dataset(table).to_table(columns=columns, filter=expression).to_pandas()
+
+    def runs(self):
+        """
+        DataFrame of the stored runs (site, farf, date).
+        """
+        return self.query('regressions', columns=['site', 'farf', 'date']).drop_duplicates().reset_index(drop=True)
+
+
+def _isin(column, values):
+    import pyarrow.dataset as ds
+    if isinstance(values, (str, int, float, np.integer, np.floating)):
+        return ds.field(column) == values
+    return ds.field(column).isin(list(values))
+
+
+def _period_name(farf_period):
+    return farf_period[:-4] if farf_period.endswith('.csv') else farf_period
+
+
+# ---------------------------------------------------------------------------------------------------------
+
+def pixel_columns(Alldata):
+    """
+    Columns of the pixels table: landsat pixel position (m from tower), indices, and the matched FARF fluxes.
+    """
+    landsat, matched_ffp = Alldata['landsat'], Alldata['matched_ffp']
+    columns = {'pixel': np.arange(len(landsat['lonData'])),
+               'x': np.asarray(landsat['lonData'], dtype=float), 'y': np.asarray(landsat['latData'], dtype=float)}
+    for index in INDICES:
+        columns[index] = np.asarray(landsat[index], dtype=float)
+    for key in ('xr', 'yr', 'co2', 'ch4', 'h'):
+        columns['ffp_'+key] = np.asarray(matched_ffp[key], dtype=float)
+    return columns
+
+
+def sector_columns(Alldata):
+    """
+    Columns of the sectors table: ch4 and index averages of every sector.
+    """
+    ffp_average = np.asarray(Alldata['sector_fpp_average'], dtype=float)
+    columns = {'sector': np.arange(len(ffp_average)), 'ffp_ch4': ffp_average}
+    for index in INDICES:
+        columns[index] = np.asarray(Alldata['sector_landsat_average'][index], dtype=float)
+    return columns
+
+
+def regression_columns(Alldata):
+    """
+    Columns of the regressions table: one row per (kind, index), with slope, intercept, r, p and n.
+    Pixel rows also hold Moran's I, n_eff, p_eff (and p_perm if computed) from significance.py.
+    """
+    regressions = Alldata['regressions']
+    indices = list(regressions['indices'])
+    kinds = [kind for kind in ('sector', 'pixel') if kind in regressions]
+    spatial = regressions.get('spatial', {})
+
+    columns = {'kind': np.repeat(kinds, len(indices)).tolist(), 'index': indices*len(kinds)}
+    for key in ('slope', 'intercept', 'r', 'p', 'n'):
+        columns[key] = np.concatenate([np.asarray(regressions[kind][key], dtype=float) for kind in kinds])
+    for key in ('moran_index', 'n_eff', 'p_eff', 'p_perm'):
+        values = np.full(len(columns['kind']), np.nan)
+        if key in spatial and 'pixel' in kinds:
+            start = kinds.index('pixel')*len(indices)
+            values[start:start+len(indices)] = spatial[key]
+        columns[key] = values
+    return columns
@@ -0,0 +1,129 @@
+"""
+Landsat scene quality summaries, computed when an export is ingested, so batch runs can drop unusable scenes
+(clouds that escaped the Earth Engine cloudFilter at roi scale) before reading FARF files, matching pixels and
+fitting regressions.
+
+For every scene date the summary holds, over the pixels within radius of the tower:
+    rows, region_rows = pixels of the scene, and of the region
+    valid_rows, valid_fraction = region pixels with every index present, and their fraction of region_rows
+    nan_<index>, min_<index>, max_<index> = NaN count and value range of each index in the region
+
+    qa = SceneQA('Hogg', radius=250.)
+    qa.update(export_rows)         # any number of chunks, in any order
+    table = qa.table()             # one row per date
+    failing_scenes(table, min_valid_fraction=0.5)  ->  {'20210523': 'valid fraction 0.12 < 0.5', ...}
+
+stream_export (gee_stream.py) computes the summaries while it streams and keeps them in the LandsatStore;
+prefetch.run_batch skips or flags the failing scenes.
+"""
+import numpy as np
+
+
+class LowQualityScene(ValueError):
+    """
+    Scene left out of a batch run by its QA summary.
+    """
+
+
+class SceneQA:
+    """
+    Accumulates scene QA summaries over chunks of export rows.
+        Input:
+            1) coordinates = flux tower [lon,lat] or site name
+            2) radius = radius [m] of the region around the tower that should hold the footprint. Default is 250 m.
+            3) indices = export columns checked. Default: the index columns used by sector_analysis.
+    """
+    def __init__(self, coordinates, radius=250., indices=None):
+        from site_registry import tower_coordinates
+        from landsat_raster import INDEX_COLUMNS
+
+        self.coordinates = tower_coordinates(coordinates)
+        self.radius = radius
+        self.indices = list(INDEX_COLUMNS.values()) if indices is None else list(indices)
+        self._scenes = {}
+
+    def update(self, rows, dates=None):
+        """
+        Adds export rows (DataFrame with id, longitude, latitude and the index columns).
+        dates = scene date of every row (default: get_spatial.scene_dates of the ids).
+        """
+        import pandas as pd
+        from projection import lonlat_to_m
+
+        if dates is None:
+            from get_spatial import scene_dates
+            dates = scene_dates(rows['id'])
+        dates = np.asarray(dates).astype(str)
+        east, north = lonlat_to_m(rows['longitude'].to_numpy(), rows['latitude'].to_numpy(), self.coordinates)
+        in_region = east**2 + north**2 <= self.radius**2
+
+        region = rows.loc[in_region, self.indices].apply(pd.to_numeric, errors='coerce')
+        groups = region.groupby(dates[in_region])
+        region_rows = groups.size()
+        valid_rows = region.notna().all(axis=1).groupby(dates[in_region]).sum()
+        nans = region.isna().groupby(dates[in_region]).sum()
+        minima = groups.min()
+        maxima = groups.max()
+
+        unique, counts = np.unique(dates, return_counts=True)
+        for date, count in zip(unique, counts):
+            scene = self._scenes.setdefault(date, self._empty())
+            scene['rows'] += int(count)
+            if date not in region_rows.index:
+                continue
+            scene['region_rows'] += int(region_rows[date])
+            scene['valid_rows'] += int(valid_rows[date])
+            for index in self.indices:
+                scene['nan_' + index] += int(nans.at[date, index])
+                scene['min_' + index] = np.fmin(scene['min_' + index], minima.at[date, index])
+                scene['max_' + index] = np.fmax(scene['max_' + index], maxima.at[date, index])
+
+    def _empty(self):
+        scene = {'rows': 0, 'region_rows': 0, 'valid_rows': 0}
+        for index in self.indices:
+            scene.update({'nan_' + index: 0, 'min_' + index: np.nan, 'max_' + index: np.nan})
+        return scene
+
+    def table(self):
+        """
+        DataFrame of the summaries, one row per date (column 'date', yyyymmdd string), sorted by date.
+        """
+        import pandas as pd
+
+        table = pd.DataFrame([dict(date=date, **scene) for date, scene in sorted(self._scenes.items())],
+                             columns=['date'] + list(self._empty()))
+        region_rows = table['region_rows'].to_numpy(dtype=float)
+        valid_fraction = np.zeros(len(table))
+        np.divide(table['valid_rows'].to_numpy(dtype=float), region_rows, out=valid_fraction, where=region_rows > 0)
+        table.insert(4, 'valid_fraction', valid_fraction)
+        table['radius'] = float(self.radius)
+        return table
+
+
+def export_qa(data, coordinates, radius=250., indices=None):
+    """
+    QA table of an export already in memory (e.g. read_landsat_export output).
+    """
+    qa = SceneQA(coordinates, radius, indices)
+    qa.update(data)
+    return qa.table()
+
+
+def failing_scenes(table, min_valid_fraction=0.5, min_valid_rows=8):
+    """
+    Scenes of a QA table below the thresholds.
+        Input:
+            1) table = QA table (SceneQA.table or LandsatStore.read_qa)
+            2) min_valid_fraction = smallest fraction of region pixels with every index present
+            3) min_valid_rows = fewest region pixels with every index present (the sector regressions need
+               pixels in several sectors)
+        Output:
+            {date: reason} of the failing scenes
+    """
+    failing = {}
+    for date, fraction, valid in zip(table['date'], table['valid_fraction'], table['valid_rows']):
+        if valid < min_valid_rows:
+            failing[str(date)] = f'{valid} valid pixels < {min_valid_rows}'
+        elif fraction < min_valid_fraction:
+            failing[str(date)] = f'valid fraction {fraction:.2f} < {min_valid_fraction}'
+    return failing
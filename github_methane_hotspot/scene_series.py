@@ -0,0 +1,124 @@
+"""
+Time series of Landsat indices over regions (footprint, sectors, any pixel mask or label raster) for every scene
+of a LandsatCube (landsat_raster.py), in one reduction over the cube instead of one sector_plot call per date.
+
+    cube = LandsatCube.load('Hogg_landsat.npz')
+    series = sector_series(cube, read_farf('Hogg', 'july2022.csv'), 'Hogg')
+    series['mean']['NDVI'][:, 0]     # footprint-average NDVI of every scene
+    series['mean']['NDVI'][:, 1:]    # per sector
+
+Regions are a (pixels, regions) 0/1 weight matrix over raster pixels, so every index and scene is reduced with
+one matrix product. NaN (cloud, no data) pixels are left out of each scene's averages.
+"""
+import numpy as np
+
+
+def mask_regions(mask, name='mask'):
+    """
+    One region from a (rows, cols) boolean pixel mask.
+        Output: regions dict (pixels = flat raster indices, weights = (pixels, 1) array, names)
+    """
+    pixels = np.flatnonzero(np.asarray(mask, dtype=bool))
+    return {'pixels': pixels, 'weights': np.ones((len(pixels), 1)), 'names': [name]}
+
+
+def label_regions(labels, names=None):
+    """
+    One region per label of a (rows, cols) integer raster (e.g. cluster labels). Negative labels are left out.
+        Output: regions dict (see mask_regions)
+    """
+    labels = np.asarray(labels).ravel()
+    pixels = np.flatnonzero(labels >= 0)
+    n_regions = labels[pixels].max() + 1 if len(pixels) else 0
+    weights = np.zeros((len(pixels), n_regions))
+    weights[np.arange(len(pixels)), labels[pixels]] = 1
+    if names is None:
+        names = [f'label {label}' for label in range(n_regions)]
+    return {'pixels': pixels, 'weights': weights, 'names': list(names)}
+
+
+def sector_regions(cube, match):
+    """
+    Footprint and its 8 sectors from match_cube (landsat_raster.py). Pixels on a sector wall count in both
+    neighbouring sectors, as in sector_plot.
+        Output: regions dict (see mask_regions), names = ['footprint', 'sector 0', ..., 'sector 7']
+    """
+    pixels = np.ravel_multi_index((match['rows'], match['cols']), cube.shape)
+    membership = np.asarray(match['membership'], dtype=float)
+    weights = np.column_stack([np.ones(len(pixels)), membership])
+    names = ['footprint'] + [f'sector {sector}' for sector in range(membership.shape[1])]
+    return {'pixels': pixels, 'weights': weights, 'names': names}
+
+
+# ---------------------------------------------------------------------------------------------------------
+
+def region_series(cube, regions, indices=None, dates=None):
+    """
+    Scene x region averages of Landsat indices.
+        Input:
+            1) cube = LandsatCube
+            2) regions = output of mask_regions, label_regions or sector_regions
+            3) indices = index names (default: all indices of the cube)
+            4) dates = optional (first, last) date range, inclusive
+        Output:
+            dict:
+                dates = (scenes,) scene dates
+                names = region names
+                mean, std, count = {index: (scenes, regions) array}. Scenes without data in a region are NaN
+                                   (count 0).
+    """
+    if indices is None:
+        indices = list(cube.keys())
+    scenes = np.arange(len(cube.dates))
+    if dates is not None:
+        scene_dates = cube.dates.astype(int)
+        scenes = np.flatnonzero((scene_dates >= int(dates[0])) & (scene_dates <= int(dates[1])))
+
+    pixels = regions['pixels']
+    weights = regions['weights']
+
+    # (indices*scenes, pixels) values of the region pixels; one product gives every sum at once
+    values = np.concatenate([cube[index].reshape(len(cube.dates), -1)[scenes][:, pixels] for index in indices])
+    values = values.astype(float)
+    valid = ~np.isnan(values)
+    values[~valid] = 0
+    count = valid.astype(float) @ weights
+    total = values @ weights
+    squares = (values*values) @ weights
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total/count
+        std = np.sqrt(np.maximum(squares/count - mean*mean, 0))
+
+    n = len(scenes)
+    split = lambda stat: {index: stat[ii*n:(ii+1)*n] for ii, index in enumerate(indices)}
+    return {'dates': cube.dates[scenes], 'names': list(regions['names']), 'mean': split(mean), 'std': split(std),
+            'count': split(count.astype(int))}
+
+
+def pixel_series(cube, rows, cols, indices=None):
+    """
+    Per-pixel time series: {index: (scenes, pixels) array} of the pixels at raster indices rows, cols
+    (e.g. match_cube's footprint pixels). NaN where a scene has no value.
+    """
+    if indices is None:
+        indices = list(cube.keys())
+    return {index: cube[index][:, rows, cols] for index in indices}
+
+
+def sector_series(cube, ffp, coordinates, cache=None, indices=None, dates=None):
+    """
+    Footprint and per-sector time series of every scene of a cube, for one FARF period.
+        Input:
+            1) cube = LandsatCube
+            2) ffp = FARFGrid of the period
+            3) coordinates = flux tower [lon,lat] or site name
+            4) cache = optional DiskCache (see disk_cache.py)
+            5) indices, dates = see region_series
+        Output:
+            region_series output, regions = footprint, sector 0 ... sector 7
+    """
+    from landsat_raster import match_cube
+
+    match = match_cube(cube, ffp, coordinates, cache)
+    return region_series(cube, sector_regions(cube, match), indices, dates)
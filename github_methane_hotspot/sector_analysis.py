@@ -0,0 +1,143 @@
+def sector_analysis(date,landsat_filename,ffp_filename,coordinates,geometry_cache=None,n_permutations=0,roots=None,
+                    landsat_data=None,ffp=None,match=None):
+    """
+    Compute part of sector_plot: matches one Landsat 8 scene to the FARF model output, bins both into radial
+    sectors and regresses every index against CH4 flux, without making any figure. Only numpy (and scipy for
+    p-values) is imported; pandas is loaded to read the Landsat csv. Batch jobs that only need the numbers
+    should call this instead of sector_plot, which also imports matplotlib.
+
+    Inputs: same as sector_plot
+        1) date {int} = Landsat image date. (e.g.: 20180523)
+        2) landsat_filename {string} = full filename of Google Earth Engine's landsat map, or None for the
+            site's Landsat export listed in sites.csv
+        3) ffp_filename {string} = Suffix of Camilo output files (e.g. 'may2018.csv')
+        4) flux tower coordinates in form [lon,lat], or site name (e.g. 'Hogg')
+        5) geometry_cache = optional DiskCache (see disk_cache.py) or cache folder path
+        6) n_permutations {int} = number of toroidal shift permutations for the spatially aware pixel p-values
+        7) roots = folders of the Landsat exports and FARF files (see data_io.py)
+        8) landsat_data, ffp = already loaded Landsat export (DataFrame) and FARFGrid, e.g. from the prefetching
+            batch loader (prefetch.py). They are read from the roots when not given. landsat_data can also be a
+            LandsatCube (landsat_raster.py); pixels are then matched on raster indices.
+        9) match = for a LandsatCube, the match_cube output of the cube and ffp (landsat_raster.py). It is
+            computed when not given; pass it in when analysing several dates of one cube and FARF period:
+                match = match_cube(cube, ffp, 'Hogg')
+                for date in cube.dates:
+                    Alldata = sector_analysis(int(date), None, ffp_filename, 'Hogg', landsat_data=cube, ffp=ffp,
+                                              match=match)
+    Returns:
+        Alldata dict (see sector_plot), with 'site' = site name added
+    """
+    import numpy as np
+    from data_io import resolve_roots, read_landsat_export, read_farf_files
+    from get_spatial import get_spatial
+    from site_registry import resolve_site
+
+    # Getting site info (FARF filename prefix, Landsat export) from the site registry
+    site = resolve_site(coordinates)
+    coordinates = site.coordinates
+    this_site = site.farf_prefix
+    if landsat_filename is None:
+        landsat_filename = site.landsat_export
+
+    # Folders of the input files. Paths are resolved from them, the working directory is never changed.
+    roots = resolve_roots(roots)
+
+    # Importing Landsat 8 data. Original data gathered from Google Earth Engine
+    if landsat_data is None:
+        landsat_data = read_landsat_export(landsat_filename, roots)
+    data = landsat_data
+
+    # List of remote sensing indices to be used in this analysis
+    indices = ['MNDWI2','MNDWI','NDWI','NDVI','temp']
+
+    # Landsat ID suffix corresponding to analysis date. Refer to script description for list of dates.
+    ANALYSIS_DATE = date
+
+    # FFP datafile name created from Camilo Rey-Sanchez's matlab model. 
+    newFileName = ffp_filename # FFP filename from script input.
+
+    # fluxmap outputs from Camilo's are saved in the FARF root ("data" subfolder by default). FARFGrid holds
+    # x-coordinates (xr), y-coordinates (yr), and CO2, CH4, sensible heat (h) spatial data as 2D arrays.
+    if ffp is None:
+        ffp = read_farf_files(this_site, newFileName, roots)
+
+    # Optional on-disk cache of the footprint geometry, shared by every scene of this site and FARF period
+    if isinstance(geometry_cache, str):
+        from disk_cache import DiskCache
+        geometry_cache = DiskCache(geometry_cache)
+
+    from landsat_raster import LandsatCube
+    if isinstance(data, LandsatCube):
+        # Raster cube (see landsat_raster.py): footprint pixels and matched fluxes come from raster indices
+        from landsat_raster import match_cube, cube_landsat
+        if match is None:
+            match = match_cube(data, ffp, coordinates, geometry_cache)
+        landsat, keep = cube_landsat(data, match, ANALYSIS_DATE)
+        matched_ffp = {key: values[keep] for key, values in match['matched_ffp'].items()}
+        membership = match['membership'][keep]
+
+        scene = data.scene(ANALYSIS_DATE)
+        east, north = data.pixel_m(coordinates)
+        present = data.present[scene]
+        lonData, latData = east[present], north[present]
+        spatialData = {index: data[index][scene][present].astype(float) for index in indices}
+    else:
+        # Getting Landsat data for specified date from sub function: get_spatial.py
+        spatialData = {'MNDWI2':[],'MNDWI':[],'NDVI':[],'NDWI':[],'temp':[]}
+        lonData, latData, spatialData['MNDWI2'] = get_spatial(ANALYSIS_DATE, 'MNDWI_SW2',data,'daily',coordinates)
+        lonData, latData, spatialData['NDVI'] = get_spatial(ANALYSIS_DATE, 'NDVI',data,'daily',coordinates)
+        lonData, latData, spatialData['NDWI'] = get_spatial(ANALYSIS_DATE, 'NDWI',data,'daily',coordinates)
+        lonData, latData, spatialData['MNDWI'] = get_spatial(ANALYSIS_DATE, 'MNDWI_SW1',data,'daily',coordinates)
+        lonData, latData, spatialData['temp'] = get_spatial(ANALYSIS_DATE, 'CELSIUS',data,'daily',coordinates)
+
+        # Importing sub-function that finds the landsat pixels found in the flux footprint area
+        from landsat_footprint import footprint_pixels
+        # The footprint pixels are the same for every spatial index of this scene, so they are found once.
+        inside = footprint_pixels(lonData, latData, ffp, geometry_cache)
+
+        # Storing landsat data in dict called landsat
+        landsat = {index: spatialData[index][inside] for index in spatialData}
+        landsat['lonData'] = lonData[inside]
+        landsat['latData'] = latData[inside]
+
+        #Matching FFP resolution to landsat resolution
+        from landsat_footprint import ffp_matched_to_landsat
+        # Camilo's hotspot data has finer spatial resolution than landsat's 30 square metre resolution.
+        # This sub-function creates average hotspot values within each 30 square metre area. End result is
+        # a spatial map of methane/co2/H hotspot data corresponding to each landsat pixel (essentially matching
+        # dataset lengths).
+        matched_ffp = ffp_matched_to_landsat(landsat,ffp,geometry_cache) # dict keys are the same for "matched_ffp" as for "landsat"
+
+        # Sector membership of every pixel, 8 sectors of pi/4 clockwise from east (see sectors.py).
+        # Pixels on a sector wall belong to both neighbouring sectors.
+        from sectors import sector_membership
+        membership = sector_membership(matched_ffp['xr'], matched_ffp['yr'], 8)
+
+    from sectors import sector_means
+
+    # Getting average values within each sector. Empty sectors are NaN, and are skipped by the regressions.
+    sector_ffp_average = sector_means(matched_ffp['ch4'], membership)
+    landsat_averages = sector_means(np.column_stack([landsat[index] for index in indices]), membership)
+    sector_landsat_average = {index: landsat_averages[:,ii] for ii, index in enumerate(indices)}
+
+    # Regression and correlation of all indices at once (see regression_stats.py)
+    from regression_stats import regress_columns
+    sector_regression = regress_columns(np.column_stack([sector_landsat_average[index] for index in indices]),
+                                        sector_ffp_average)
+
+    # Pixel-by-pixel regression
+    pixel_regression = regress_columns(np.column_stack([landsat[idx] for idx in indices]), matched_ffp['ch4'])
+
+    # Neighbouring pixels are autocorrelated, so the pixel p-values overstate significance (see significance.py)
+    from significance import spatial_significance
+    spatial_stats = spatial_significance(landsat, matched_ffp, indices, 'ch4', n_perm=n_permutations, seed=date)
+
+    # Regression outputs are dicts of slope, intercept, r, p, n arrays, ordered as regressions['indices']
+    # 'spatial' holds the autocorrelation-corrected pixel p-values (Moran's I, n_eff, p_eff and optionally p_perm)
+    regressions = {'indices': indices, 'sector': sector_regression, 'pixel': pixel_regression,
+                   'spatial': spatial_stats}
+
+    Alldata = {'landsat':landsat, 'matched_ffp':matched_ffp, 'ffp':ffp, 'sector_landsat_average':sector_landsat_average,'sector_fpp_average':sector_ffp_average,'lonData':lonData,'latData':latData,'spatialData':spatialData,
+               'regressions':regressions, 'site':site.name}
+
+    return Alldata
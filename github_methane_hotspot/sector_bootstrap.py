@@ -0,0 +1,127 @@
+"""
+Bootstrap confidence intervals for the sector-binned correlations of sector_plot (fig2).
+
+With only 8 sector means per date, r and slope are very uncertain. The pixels of each sector are resampled
+with replacement (keeping every sector's pixel count), the sector means and the regression of every index are
+recomputed, and percentile intervals are taken over the replicates.
+
+All replicates are drawn at once: the resampled pixel counts come from one np.bincount, the sector means of
+every replicate from one matrix product, and the regressions from one regress_columns call (in chunks of
+replicates to bound memory).
+"""
+import numpy as np
+
+
+INDICES = ('MNDWI2','MNDWI','NDWI','NDVI','temp')
+
+
+def resample_counts(sector_of_pair, n_sectors, n_boot, rng):
+    """
+    How many times every (pixel, sector) pair is drawn in each bootstrap replicate, resampling within sectors.
+        Input:
+            1) sector_of_pair = sector of every (pixel, sector) pair, sorted by sector
+            2) n_sectors = number of sectors
+            3) n_boot = number of replicates
+            4) rng = numpy Generator
+        Output:
+            (n_boot, pairs) array of draw counts. Every sector keeps its number of pairs in every replicate.
+    """
+    n_pairs = len(sector_of_pair)
+    size = np.bincount(sector_of_pair, minlength=n_sectors)
+    start = np.concatenate([[0], np.cumsum(size)[:-1]])
+
+    # Each pair slot draws one pair of the same sector
+    draws = start[sector_of_pair] + (rng.random((n_boot, n_pairs))*size[sector_of_pair]).astype(int)
+    flat = (np.arange(n_boot)[:,None]*n_pairs + draws).ravel()
+    return np.bincount(flat, minlength=n_boot*n_pairs).reshape(n_boot, n_pairs)
+
+
+def bootstrap_sector_regression(landsat, matched_ffp, indices=INDICES, gas='ch4', n_boot=10000, ci=95,
+                                seed=None, chunk_size=2000, membership=None):
+    """
+    Bootstraps the sector-binned regression of each index against a flux.
+        Input:
+            1) landsat, matched_ffp = dicts from sector_plot (pixels in the same order)
+            2) indices = landsat indices to regress
+            3) gas = 'ch4', 'co2' or 'h'
+            4) n_boot = number of bootstrap replicates
+            5) ci = width of the percentile confidence interval (%)
+            6) seed = seed or numpy Generator, for reproducible results
+            7) chunk_size = replicates processed per array operation
+            8) membership = optional (pixels, sectors) array from sectors.sector_membership, computed if not given
+        Output:
+            dict:
+                indices = list of indices
+                r, slope, intercept = estimates from the sector means of the data, (indices,) arrays
+                r_ci, slope_ci, intercept_ci = (2, indices) arrays of lower and upper percentile bounds
+                r_boot, slope_boot = (n_boot, indices) arrays of replicates
+    """
+    from regression_stats import regress_columns
+    from sectors import sector_membership, sector_means
+
+    indices = list(indices)
+    rng = np.random.default_rng(seed)
+    if membership is None:
+        membership = sector_membership(matched_ffp['xr'], matched_ffp['yr'])
+    n_sectors = membership.shape[1]
+
+    values = np.column_stack([matched_ffp[gas]] + [landsat[index] for index in indices]) # (pixels, 1+indices)
+    means = sector_means(values, membership)
+    estimate = regress_columns(means[:,1:], means[:,0])
+
+    # One row per (pixel, sector) pair, sorted by sector, so pixels on a sector wall are resampled in both sectors
+    pixel, sector_of_pair = np.nonzero(membership.T)[::-1]
+    pair_values = values[pixel]
+    valid = ~np.isnan(pair_values)
+    pair_values = np.where(valid, pair_values, 0.)
+
+    # Sector indicator of every pair; sums over pairs of one sector become a matrix product
+    indicator = np.zeros((len(pixel), n_sectors))
+    indicator[np.arange(len(pixel)), sector_of_pair] = 1
+    weighted = indicator[:,:,None]*pair_values[:,None,:] # (pairs, sectors, 1+indices)
+    weighted_valid = indicator[:,:,None]*valid[:,None,:]
+
+    boot = {key: np.empty((n_boot, len(indices))) for key in ('r', 'slope', 'intercept')}
+    for first in range(0, n_boot, chunk_size):
+        last = min(first+chunk_size, n_boot)
+        counts = resample_counts(sector_of_pair, n_sectors, last-first, rng).astype(float)
+        sums = np.tensordot(counts, weighted, axes=(1, 0)) # (replicates, sectors, 1+indices)
+        n = np.tensordot(counts, weighted_valid, axes=(1, 0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            boot_means = np.where(n > 0, sums/n, np.nan)
+        regression = regress_columns(boot_means[:,:,1:], boot_means[:,:,0])
+        for key in boot:
+            boot[key][first:last] = regression[key]
+
+    bounds = [(100-ci)/2, 100-(100-ci)/2]
+    result = {'indices': indices}
+    for key in boot:
+        result[key] = estimate[key]
+        result[key+'_ci'] = np.nanpercentile(boot[key], bounds, axis=0)
+    result['r_boot'] = boot['r']
+    result['slope_boot'] = boot['slope']
+    return result
+
+
+def bootstrap_batch(pairs, indices=INDICES, gas='ch4', n_boot=10000, ci=95, seed=None, chunk_size=2000):
+    """
+    Bootstrap CIs for many Landsat/FARF date pairs.
+        Input:
+            1) pairs = dict of {name: Alldata} (sector_plot outputs), or of {name: (landsat, matched_ffp)}
+            2) seed = master seed. Each pair gets its own random stream spawned from it, so results are
+               reproducible for the same seed and pair order.
+            3) indices, gas, n_boot, ci, chunk_size = see bootstrap_sector_regression
+        Output:
+            dict of {name: bootstrap_sector_regression output}
+    """
+    streams = np.random.SeedSequence(seed).spawn(len(pairs))
+
+    results = {}
+    for stream, (name, pair) in zip(streams, pairs.items()):
+        if isinstance(pair, dict):
+            landsat, matched_ffp = pair['landsat'], pair['matched_ffp']
+        else:
+            landsat, matched_ffp = pair
+        results[name] = bootstrap_sector_regression(landsat, matched_ffp, indices, gas, n_boot, ci,
+                                                    np.random.default_rng(stream), chunk_size)
+    return results
@@ -1,4 +1,4 @@
-def sector_plot(date,landsat_filename,ffp_filename,coordinates):
+def sector_plot(date,landsat_filename,ffp_filename,coordinates,geometry_cache=None,n_permutations=0,roots=None):
     """
     EDITED: November 2nd 2021 
                 - Inverted y axis on methane regression plots.
@@ -37,14 +37,26 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
     
     Note:
     Camilo output files have to have this naming convention: BB_fluxMap_x_june_aug2017
-    Can change expected filenames on lines: 82-86.
+    FARF and Landsat paths are built from the folders in "roots" (see data_io.py).
 
     Inputs: 
         1) date {int} = Landsat image date. (e.g.: 20180523)
         2) landsat_filename {string} = full filename of Google Earth Engine's landsat map.
             (e.g: Hogg_spatial_indices_2021_May_Aug.csv)
         3) ffp_filename {string} = Suffix of Camilo output files (e.g. 'may2018.csv')
-        4) flux tower coordinates in form [lon,lat]
+        4) flux tower coordinates in form [lon,lat], or site name (e.g. 'Hogg'). The site has to be listed
+            in sites.csv (see site_registry.py), which sets its FARF filename prefix.
+            If landsat_filename is None, the site's Landsat export listed in sites.csv is used.
+        5) geometry_cache = optional DiskCache (see disk_cache.py) or cache folder path. Stores the footprint mask
+            and FARF -> landsat pixel bins, so running the same FARF period against many Landsat dates only
+            computes them once.
+        6) n_permutations {int} = number of toroidal shift permutations for the spatially aware pixel p-values
+            (see significance.py). Default 0 only applies the Moran's I effective sample size correction.
+        7) roots = data_io.DataRoots (or dict with 'landsat' and 'farf' folders). Default is the
+            $METHANE_LANDSAT_ROOT / $METHANE_FARF_ROOT folders, else the Google Drive Micromet_GEE folder for
+            Landsat exports and the "data" sub-folder for FARF files.
+    The numbers come from sector_analysis (sector_analysis.py), which needs no matplotlib.
+
     Returns:
         4 figures
             fig: discretized flux footprint map with sector overlay
@@ -59,86 +71,24 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
     >display(fig,fig2,fig3,fig4)
 
     """
-    import pandas as pd
     import numpy as np
     import matplotlib.pyplot as plt
-    from get_spatial import get_spatial
-    from scipy import stats
-    import os
-    
-    Root_path = os.getcwd()
+    from sector_analysis import sector_analysis
 
-    # Importing Landsat 8 data. Original data gathered from Google Earth Engine
-    os.chdir('/Volumes/GoogleDrive/My Drive/Micromet_GEE')
-    data = pd.read_csv(landsat_filename,delimiter = ',',header = 1)
-    
-    os.chdir(Root_path)
+    Alldata = sector_analysis(date,landsat_filename,ffp_filename,coordinates,geometry_cache,n_permutations,roots)
+
+    landsat = Alldata['landsat']
+    matched_ffp = Alldata['matched_ffp']
+    ffp = Alldata['ffp']
+    sector_ffp_average = Alldata['sector_fpp_average']
+    sector_landsat_average = Alldata['sector_landsat_average']
+    sector_regression = Alldata['regressions']['sector']
+    pixel_regression = Alldata['regressions']['pixel']
+    spatial_stats = Alldata['regressions']['spatial']
 
     # List of remote sensing indices to be used in this analysis
     indices = ['MNDWI2','MNDWI','NDWI','NDVI','temp']
 
-    # Landsat ID suffix corresponding to analysis date. Refer to script description for list of dates.
-    ANALYSIS_DATE = date
-
-    # Getting Landsat data for specified date from sub function: get_spatial.py
-    spatialData = {'MNDWI2':[],'MNDWI':[],'NDVI':[],'NDWI':[],'temp':[]}
-    lonData, latData, spatialData['MNDWI2'] = get_spatial(ANALYSIS_DATE, 'MNDWI_SW2',data,'daily',coordinates)
-    lonData, latData, spatialData['NDVI'] = get_spatial(ANALYSIS_DATE, 'NDVI',data,'daily',coordinates)
-    lonData, latData, spatialData['NDWI'] = get_spatial(ANALYSIS_DATE, 'NDWI',data,'daily',coordinates)
-    lonData, latData, spatialData['MNDWI'] = get_spatial(ANALYSIS_DATE, 'MNDWI_SW1',data,'daily',coordinates)
-    lonData, latData, spatialData['temp'] = get_spatial(ANALYSIS_DATE, 'CELSIUS',data,'daily',coordinates)
-
-    # FFP datafile name created from Camilo Rey-Sanchez's matlab model. 
-    newFileName = ffp_filename # FFP filename from script input.
-    
-    # Getting site name
-    if coordinates == [-100.20242,50.3623]:
-        this_site = 'Young'
-    elif coordinates == [-100.534,50.371]:
-        this_site = 'Hogg'
-    elif coordinates == [-122.9849,49.1293]:
-        this_site = 'BB1'
-    elif coordinates == [-121.7651,38.0498]:
-        this_site = 'US-Myb'
-
-    # fluxmap outputs from Camilo's are saved in "data" subfolder
-    os.chdir('data')
-    ffp = {}
-    ffp['xr'] = pd.read_csv(this_site+'_fluxMap_x_'+newFileName,header = -1) # x-coordinates
-    ffp['yr'] = pd.read_csv(this_site+'_fluxMap_y_'+newFileName,header = -1) # y-coordinates
-    ffp['co2'] = pd.read_csv(this_site+'_fluxMap_co2_'+newFileName,header = -1) # CO2 spatial data
-    ffp['ch4'] = pd.read_csv(this_site+'_fluxMap_ch4_'+newFileName,header = -1) # CH4 spatial data
-    ffp['h'] = pd.read_csv(this_site+'_fluxMap_h_'+newFileName,header = -1) # Sensible heat spatial data
-    os.chdir('..')
-    # cd ../
-
-    # Importing sub-function that cuts out the landsat pixels found in the flux footprint area
-    from landsat_footprint import landsat_footprint
-    # Storing landsat data in dict called landsat
-    landsat = {'MNDWI2':[],'MNDWI':[],'NDVI':[],'NDWI':[],'temp':[],'lonData':[],'latData':[]}
-
-    # Each iteration of landsat_footprint sub-function deals with only 1 spatial index. Do this for each index of interest
-    sat = landsat_footprint(lonData,latData,spatialData['MNDWI2'], ffp)
-    landsat['MNDWI2'] = sat['spatialData']
-    sat = landsat_footprint(lonData,latData,spatialData['MNDWI'], ffp)
-    landsat['MNDWI'] = sat['spatialData']
-    sat = landsat_footprint(lonData,latData,spatialData['NDWI'], ffp)
-    landsat['NDWI'] = sat['spatialData']
-    sat = landsat_footprint(lonData,latData,spatialData['NDVI'], ffp)
-    landsat['NDVI'] = sat['spatialData']
-    sat = landsat_footprint(lonData,latData,spatialData['temp'], ffp)
-    landsat['temp'] = sat['spatialData']
-    landsat['lonData'] = sat['lonData']
-    landsat['latData'] = sat['latData']
-
-    #Matching FFP resolution to landsat resolution
-    from landsat_footprint import ffp_matched_to_landsat
-    # Camilo's hotspot data has finer spatial resolution than landsat's 30 square metre resolution.
-    # This sub-function creates average hotspot values within each 30 square metre area. End result is
-    # a spatial map of methane/co2/H hotspot data corresponding to each landsat pixel (essentially matching
-    # dataset lengths).
-    matched_ffp = ffp_matched_to_landsat(landsat,ffp) # dict keys are the same for "matched_ffp" as for "landsat"
-
     # ----------------------------------RADIAL PLOT (fig)------------------------------------------------------------
     """
     Categorizing datapoints by radial bins. Spatial map will be split into 8 sectors separated by
@@ -150,9 +100,6 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
     theta = 0 # starting angle of first sector
 
     first = max(matched_ffp['xr'])+60 # This is max distance of a datapoint + some. Used to plot sector walls on figure.
-    u = np.array([0,0]) # Shell to hold ffp point's vector coordinates [x,y]
-    v1 = np.array([0,0]) # Shell to hold sector's side 1 coordinates
-    v2 = np.array([0,0]) # Shell to hold sector's side 2 coordinates
 
     # Plotting radial grid template
 
@@ -172,91 +119,7 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
     # Plotting hotspot datapoints
     plt.scatter(matched_ffp['xr'],matched_ffp['yr'],c=matched_ffp['ch4'])
 
-
-
-    # EMPTY Bin list for each sector. 8 sectors total, each list contains points for 1 sector. "sector_x"
-    # is all the x-coordinates, "sector_y" is all the y-coordinates.
-    sector_x = [[],[],[],[],[],[],[],[]]
-    sector_y = [[],[],[],[],[],[],[],[]]
-    sector_ffp = [[],[],[],[],[],[],[],[]]
-    sector_landsat = {'NDVI': [[],[],[],[],[],[],[],[]],
-                    'NDWI':[[],[],[],[],[],[],[],[]],
-                    'MNDWI':[[],[],[],[],[],[],[],[]],
-                    'temp':[[],[],[],[],[],[],[],[]],
-                    'MNDWI2':[[],[],[],[],[],[],[],[]]}
-
-    # Turning the bin lists into empty lists
-    for i in range(8):
-        sector_x[i].clear()
-        sector_y[i].clear()
-        sector_ffp[i].clear()
-
-    for sect in range(8):
-        # sector SIDE 1 vector
-        v1[0] = first*np.cos(theta) # x
-        v1[1] = -first*np.sin(theta) # y
-
-        theta += np.pi/4
-        
-        # sector SIDE 2 vector
-        v2[0] = first*np.cos(theta) # x
-        v2[1] = -first*np.sin(theta) # y
-        
-        
-        for i in range(len(matched_ffp['xr'])):
-        #   x-coordinate (ffp)
-            u[0] = matched_ffp['xr'][i]
-        #   y-coordinate (ffp)
-            u[1] = matched_ffp['yr'][i]
-
-            # Vector projection on sector SIDE 1: proj = (u dot v)/|v|2 * v
-            dot1 = u[0]*v1[0] + u[1]*v1[1]
-            vMag1 = (np.sqrt(v1[0]**2+v1[1]**2))**2
-            proj1 = (dot1/vMag1) * v1
-
-
-            # Checking ffp-vector angle from sector SIDE 1. Keep if theta < or = pi/4
-            len_proj = np.sqrt(proj1[0]**2+proj1[1]**2)
-            len_vector = np.sqrt(u[0]**2 + u[1]**2)
-            check = len_proj/len_vector
-            check_theta1 = np.arccos(check)
-
-            # -------- vvv SIDE 2: Looking for points between side 1 and side 2 vvv -----------
-            
-
-            # Vector projection on sector SIDE 2: proj = (u dot v)/|v|2 * v
-            dot2 = u[0]*v2[0] + u[1]*v2[1]
-            vMag2 = (np.sqrt(v2[0]**2+v2[1]**2))**2
-            proj2 = (dot2/vMag2) * v2
-
-            # Checking ffp-vector angle from sector SIDE 2. Keep if it's within theta = pi/4
-            len_proj = np.sqrt(proj2[0]**2+proj2[1]**2)
-            len_vector = np.sqrt(u[0]**2 + u[1]**2)
-            check = len_proj/len_vector
-            check_theta2 = np.arccos(check)
-
-            # dot > 0 condition is to filter for projections over 90˚
-            if dot1 > 0 and dot2>0 and check_theta1 <= np.pi/4 and check_theta2 <= np.pi/4:
-                # Storing each sector's ffp data
-                sector_x[sect].append(matched_ffp['xr'][i])
-                sector_y[sect].append(matched_ffp['yr'][i])
-                sector_ffp[sect].append(matched_ffp['ch4'][i])
-
-                # Storing each sector's landsat data
-                for index in indices:
-                    sector_landsat[index][sect].append(landsat[index][i])
-    
     # ------------------------------------ CORRELATION (fig2) ------------------------------------------------
-    # Getting average values within each sector
-    sector_ffp_average = []
-    sector_landsat_average = {'MNDWI2':[],'MNDWI':[],'NDVI':[],'NDWI':[],'temp':[]}
-    for sect in range(8):
-        if np.nanmean(sector_ffp[sect]) < 1000: # Skipping nan values (for stat purposes)
-            sector_ffp_average.append(np.nanmean(sector_ffp[sect]))
-        for index in indices:
-            if np.nanmean(sector_landsat[index][sect]) < 1000: # Skipping nan values (for stat purposes)
-                sector_landsat_average[index].append(np.nanmean(sector_landsat[index][sect]))
-
     fig2, ax = plt.subplots(1,5,figsize = (35,5))
     plot = 0 # subplot figure indexing
     for index in indices:
@@ -264,11 +127,11 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
         ax[plot].scatter(sector_landsat_average[index],sector_ffp_average)
         
     #     Regression
-        m, b = np.polyfit(sector_landsat_average[index],sector_ffp_average,1)
+        m, b = sector_regression['slope'][plot], sector_regression['intercept'][plot]
         yfit = m*np.array(sector_landsat_average[index])+b
         ax[plot].plot(sector_landsat_average[index],yfit,'orange')
         
-        r_val, p_val = stats.pearsonr(sector_landsat_average[index],sector_ffp_average)
+        r_val, p_val = sector_regression['r'][plot], sector_regression['p'][plot]
         corr = f'{index}\n \n r = {np.round(r_val,3)} \np = {np.round(p_val,3)}'
         
     #     Formatting Plot
@@ -298,6 +161,9 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
     # Non sector-binned correlation plotting
     fig4, ax3 = plt.subplots(1,5,figsize = (35,5))
     indices = ['MNDWI2','MNDWI','NDWI','NDVI','temp']
+
+    # Pixel-by-pixel regression of all indices, used by fig4 and fig5
+    pixel_stats = {idx: {key: pixel_regression[key][ii] for key in pixel_regression} for ii, idx in enumerate(indices)}
     plot = 0
     for idx in indices:
         ax3[plot].scatter(landsat[idx],matched_ffp['ch4'])
@@ -305,12 +171,15 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
         
         
     #     Regression
-        m, b = np.polyfit(landsat[idx],matched_ffp['ch4'],1)
+        m, b = pixel_stats[idx]['slope'], pixel_stats[idx]['intercept']
         yfit = m*np.array(landsat[idx])+b
         ax3[plot].plot(landsat[idx],yfit,'orange')
         
-        r_val, p_val = stats.pearsonr(landsat[idx],matched_ffp['ch4'])
+        r_val, p_val = pixel_stats[idx]['r'], pixel_stats[idx]['p']
         corr = f'{idx}\n \n r = {np.round(r_val,3)} \np = {np.round(p_val,20)}'
+        corr += f" \np (n_eff = {np.round(spatial_stats['n_eff'][plot],1)}) = {np.round(spatial_stats['p_eff'][plot],5)}"
+        if n_permutations > 0:
+            corr += f" \np (permutation) = {np.round(spatial_stats['p_perm'][plot],4)}"
         
     #     Plot formatting
         ax3[plot].set_title(idx,fontsize = 24)
@@ -346,10 +215,10 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
         ax5[ii][2].scatter(landsat[indices[ii]],matched_ffp['ch4'],s=5)
         
         #     Regression
-        m, b = np.polyfit(landsat[indices[ii]],matched_ffp['ch4'],1)
+        m, b = pixel_stats[indices[ii]]['slope'], pixel_stats[indices[ii]]['intercept']
         yfit = m*np.array(landsat[indices[ii]])+b
         ax5[ii][2].plot(landsat[indices[ii]],yfit,'orange')
-        r_val, p_val = stats.pearsonr(landsat[indices[ii]],matched_ffp['ch4'])
+        r_val, p_val = pixel_stats[indices[ii]]['r'], pixel_stats[indices[ii]]['p']
         corr = f'{indices[ii]}\n \n r = {np.round(r_val,3)} \np = {np.round(p_val,20)}'
         
         # Formatting
@@ -370,10 +239,7 @@ def sector_plot(date,landsat_filename,ffp_filename,coordinates):
         index_cbar = fig5.colorbar(plot2, ax=ax5[ii,1])
         farf_cbar = fig5.colorbar(plot1, ax=ax5[ii,0])
         
-    fig5.suptitle('Site: '+this_site+', L8: '+str(date)+', FARF: '+ffp_filename, fontsize = 24, fontweight = 'bold')
+    fig5.suptitle('Site: '+Alldata['site']+', L8: '+str(date)+', FARF: '+ffp_filename, fontsize = 24, fontweight = 'bold')
     fig5.tight_layout(rect=[0, 0.03, 1, 0.95])
 
-    
-    Alldata = {'landsat':landsat, 'matched_ffp':matched_ffp, 'ffp':ffp, 'sector_landsat_average':sector_landsat_average,'sector_fpp_average':sector_ffp_average,'lonData':lonData,'latData':latData,'spatialData':spatialData}
-
-    return fig4, fig2, fig3, fig, fig5, Alldata
\ No newline at end of file
+    return fig4, fig2, fig3, fig, fig5, Alldata
@@ -0,0 +1,81 @@
+"""
+Radial sector binning used by sector_plot (fig and fig2), vectorized over all pixels.
+
+The map is split into 8 sectors of pi/4 that start at the positive x-axis and go clockwise. A pixel belongs
+to a sector when its vector from the tower lies between the sector's two walls, walls included, so pixels
+on a wall are counted in both neighbouring sectors, and the tower pixel itself is in none. This reproduces
+the vector projection test of the original per-pixel loop (pixel coordinates and walls truncated to whole
+metres, as before), but for every pixel and sector in one array operation.
+"""
+import numpy as np
+
+
+def sector_walls(reach, n_sectors=8):
+    """
+    End points of the sector walls, as used by the original loop.
+        Input:
+            1) reach = length of the walls (m), larger than the furthest pixel
+            2) n_sectors = number of sectors
+        Output:
+            (n_sectors+1, 2) integer array of wall [x,y]. Sector i lies between walls i and i+1.
+    """
+    theta = 0.
+    # Angles are accumulated the same way as the original plotting + binning loops, which started
+    # binning after one full turn
+    for i in range(n_sectors):
+        theta += 2*np.pi/n_sectors
+    walls = np.zeros((n_sectors+1, 2), dtype=int)
+    for i in range(n_sectors+1):
+        walls[i] = [reach*np.cos(theta), -reach*np.sin(theta)] # int array, truncated like the original
+        theta += 2*np.pi/n_sectors
+    return walls
+
+
+def sector_membership(x, y, n_sectors=8, reach=None):
+    """
+    Which sector(s) every pixel falls in.
+        Input:
+            1) x, y = pixel coordinates (m from tower), e.g. matched_ffp['xr'], matched_ffp['yr']
+            2) n_sectors = number of sectors (default 8, i.e. pi/4 wide)
+            3) reach = length of the sector walls. Default is max(x)+60, as in sector_plot.
+        Output:
+            (pixels, n_sectors) boolean array
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if reach is None:
+        reach = np.max(x)+60
+    walls = sector_walls(reach, n_sectors).astype(float)
+    u = np.column_stack([np.trunc(x), np.trunc(y)])
+
+    # Vector projection of each pixel on each wall: proj = (u dot v)/|v|2 * v
+    dot = u[:,0:1]*walls[:,0] + u[:,1:2]*walls[:,1] # (pixels, walls)
+    vMag = np.sqrt(walls[:,0]**2 + walls[:,1]**2)**2
+    proj_x = (dot/vMag)*walls[:,0]
+    proj_y = (dot/vMag)*walls[:,1]
+    len_proj = np.sqrt(proj_x**2 + proj_y**2)
+    len_vector = np.sqrt(u[:,0]**2 + u[:,1]**2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        angle = np.arccos(len_proj/len_vector[:,None]) # angle between the pixel vector and each wall
+
+    width = 2*np.pi/n_sectors
+    near = (dot > 0) & (angle <= width) # NaN angle (tower pixel) is never near
+    return near[:,:-1] & near[:,1:]
+
+
+def sector_means(values, membership):
+    """
+    NaN-aware mean of the pixel values in each sector.
+        Input:
+            1) values = (pixels,) or (pixels, k) array
+            2) membership = (pixels, sectors) boolean array from sector_membership
+        Output:
+            (sectors,) or (sectors, k) array. NaN for sectors without valid pixels.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    weights = membership.astype(float)
+    sums = weights.T @ np.where(valid, values, 0.)
+    counts = weights.T @ valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums/counts, np.nan)
@@ -0,0 +1,271 @@
+"""
+Significance tests for index vs flux correlations that account for spatial autocorrelation.
+
+Neighbouring 30m landsat pixels (and the FARF bins matched to them) are not independent, so the p-values of
+scipy.stats.pearsonr / regress_columns overstate significance. This module offers:
+    - Toroidal-shift and block permutation tests on the matched pixel grid. All permutations are drawn and
+      evaluated as single array operations (in chunks), so thousands of shuffles take seconds.
+    - Moran's I of each map, and the effective sample size n_eff = n*(1 - I_x*I_y)/(1 + I_x*I_y) used to
+      correct the t-test of r.
+
+Pixels are placed on a raster with to_grid (pixel rows/columns recovered from the pixel coordinates).
+"""
+import numpy as np
+
+
+def to_grid(x, y, values, spacing=None):
+    """
+    Places scattered pixels (e.g. landsat['lonData'], landsat['latData']) on a regular raster.
+        Input:
+            1) x, y = pixel centre coordinates (m from tower)
+            2) values = (pixels,) or (pixels, k) array of values to rasterize
+            3) spacing = pixel size [m], one value or (dx, dy). Default is inferred from the coordinates for each
+               axis (GEE exports are on a lon/lat lattice, e.g. ~19.6m x 30m at 49N).
+        Output:
+            1) grid = (rows, cols) or (k, rows, cols) array, NaN where there is no pixel
+            2) rows, cols = raster index of every input pixel
+        Pixels that snap to the same raster cell (coordinates off the spacing lattice) are averaged, NaN values
+        left out, so no pixel is silently dropped.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    values = np.asarray(values, dtype=float)
+
+    if spacing is None:
+        spacing = grid_spacing(x, y)
+    dx, dy = np.broadcast_to(np.asarray(spacing, dtype=float), (2,))
+
+    cols = np.rint((x - np.nanmin(x))/dx).astype(int)
+    rows = np.rint((np.nanmax(y) - y)/dy).astype(int) # Row 0 is the northern edge
+    shape = (rows.max()+1, cols.max()+1)
+
+    # Mean of the pixels in every cell (one pixel per cell on a regular lattice)
+    cell = rows*shape[1] + cols
+    stack = values.reshape(len(cell), -1)
+    valid = ~np.isnan(stack)
+    grid = np.full((stack.shape[1], shape[0]*shape[1]), np.nan)
+    for kk in range(stack.shape[1]):
+        total = np.bincount(cell, weights=np.where(valid[:, kk], stack[:, kk], 0.), minlength=grid.shape[1])
+        count = np.bincount(cell, weights=valid[:, kk], minlength=grid.shape[1])
+        np.divide(total, count, out=grid[kk], where=count > 0)
+    grid = grid.reshape((stack.shape[1],) + shape)
+    return (grid[0] if values.ndim == 1 else grid), rows, cols
+
+
+def grid_spacing(x, y):
+    """
+    Pixel spacing (dx, dy) of scattered pixel centres, for each axis the typical step between neighbouring
+    distinct values (as landsat_raster._grid_step: gaps of missing rows/columns are ignored). An axis with a
+    single value takes the other axis' step, or 30m.
+    """
+    spacing = []
+    for coord in (x, y):
+        steps = np.diff(np.unique(np.round(coord[np.isfinite(coord)], 6)))
+        steps = steps[steps > 1e-6]
+        spacing.append(float(np.median(steps[steps < 1.5*steps.min()])) if len(steps) else None)
+    dx, dy = spacing
+    if dx is None:
+        dx = dy if dy is not None else 30.
+    if dy is None:
+        dy = dx
+    return dx, dy
+
+
+# ---------------------------------------------------------------------------------------------------------
+
+def morans_i(grid, neighbours='rook'):
+    """
+    Moran's I of a raster with binary weights between adjacent non-NaN pixels.
+        Input:
+            1) grid = (rows, cols) array, NaN outside the footprint
+            2) neighbours = 'rook' (4 neighbours) or 'queen' (8 neighbours)
+        Output:
+            Moran's I (NaN if fewer than 3 pixels or no neighbouring pairs)
+    """
+    grid = np.asarray(grid, dtype=float)
+    valid = ~np.isnan(grid)
+    n = valid.sum()
+    if n < 3:
+        return np.nan
+    z = np.where(valid, grid - grid[valid].mean(), 0.)
+
+    offsets = [(0, 1), (1, 0)]
+    if neighbours == 'queen':
+        offsets += [(1, 1), (1, -1)]
+
+    cross = 0.
+    weights = 0
+    rows, cols = grid.shape
+    for dr, dc in offsets:
+        a = (slice(0, rows-dr), slice(max(0, -dc), cols-max(0, dc)))
+        b = (slice(dr, rows), slice(max(0, dc), cols-max(0, -dc)))
+        pair = valid[a] & valid[b]
+        cross += 2*(z[a]*z[b])[pair].sum() # each pair counted in both directions
+        weights += 2*pair.sum()
+
+    if weights == 0:
+        return np.nan
+    return n/weights*cross/(z**2).sum()
+
+
+def effective_sample_size(n, moran_x, moran_y):
+    """
+    Effective number of independent pixels for the correlation of two autocorrelated maps:
+    n_eff = n*(1 - I_x*I_y)/(1 + I_x*I_y), kept between 3 and n.
+    """
+    rho = np.asarray(moran_x, dtype=float)*np.asarray(moran_y, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n_eff = np.asarray(n, dtype=float)*(1 - rho)/(1 + rho)
+    n_eff = np.where(np.isnan(n_eff), n, n_eff)
+    return np.clip(n_eff, 3, n)
+
+
+# ---------------------------------------------------------------------------------------------------------
+
+def _batched_r(index_values, flux_values):
+    """
+    Pearson r along the last axis with pairwise NaN masking.
+        index_values = (m, n) array, flux_values = (B, n) array. Returns (B, m) array.
+    """
+    X = index_values[None,:,:]
+    Y = flux_values[:,None,:]
+    valid = ~np.isnan(X) & ~np.isnan(Y)
+    n = valid.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(valid, X, 0).sum(axis=-1)/n
+        mean_y = np.where(valid, Y, 0).sum(axis=-1)/n
+        dx = np.where(valid, X - mean_x[...,None], 0)
+        dy = np.where(valid, Y - mean_y[...,None], 0)
+        r = (dx*dy).sum(axis=-1)/np.sqrt((dx*dx).sum(axis=-1)*(dy*dy).sum(axis=-1))
+    return r
+
+
+def toroidal_shifts(shape, n_perm, rng):
+    """
+    Random non-zero (row, col) shifts of a raster of given shape for toroidal shift permutations.
+    """
+    rows, cols = shape
+    flat = rng.integers(1, rows*cols, size=n_perm) # 0 would be the unshifted map
+    return np.column_stack([flat//cols, flat%cols])
+
+
+def _toroidal_sources(rows, cols, shape, shifts):
+    # (B, n) source row/col of each pixel after shifting the flux raster by shifts
+    src_rows = (rows[None,:] - shifts[:,0:1])%shape[0]
+    src_cols = (cols[None,:] - shifts[:,1:2])%shape[1]
+    return src_rows, src_cols
+
+
+def _block_sources(rows, cols, shape, block_size, n_perm, rng):
+    # (B, n) source row/col of each pixel after shuffling square blocks of block_size pixels
+    n_block_rows = -(-shape[0]//block_size)
+    n_block_cols = -(-shape[1]//block_size)
+    n_blocks = n_block_rows*n_block_cols
+    perms = np.argsort(rng.random((n_perm, n_blocks)), axis=1) # one random block order per permutation
+
+    block = (rows//block_size)*n_block_cols + cols//block_size
+    source_block = perms[:, block]
+    src_rows = (source_block//n_block_cols)*block_size + rows%block_size
+    src_cols = (source_block%n_block_cols)*block_size + cols%block_size
+    return src_rows, src_cols
+
+
+def permutation_test(index_grids, flux_grid, n_perm=999, method='toroidal', block_size=3, seed=None,
+                     chunk_size=1000):
+    """
+    Permutation p-value of the correlation between each index raster and the flux raster, keeping the
+    spatial structure of the flux map (toroidal shifts or block shuffles) instead of shuffling pixels.
+        Input:
+            1) index_grids = (m, rows, cols) array of index rasters (or one (rows, cols) raster)
+            2) flux_grid = (rows, cols) flux raster (e.g. matched ch4), NaN outside the footprint
+            3) n_perm = number of permutations
+            4) method = 'toroidal' (random wrap-around shifts of the flux map) or 'block'
+               (shuffling block_size x block_size blocks of the flux map)
+            5) seed = seed or numpy Generator, for reproducible results
+            6) chunk_size = permutations evaluated per array operation (bounds memory use)
+        Output:
+            dict of (m,) arrays: r = observed r, p = two-sided permutation p-value, and
+            r_perm = (n_perm, m) array of permuted r values
+    """
+    index_grids = np.asarray(index_grids, dtype=float)
+    if index_grids.ndim == 2:
+        index_grids = index_grids[None]
+    flux_grid = np.asarray(flux_grid, dtype=float)
+    rng = np.random.default_rng(seed)
+    shape = flux_grid.shape
+
+    # Pixels where at least one index has data; the flux is sampled from the permuted raster at those pixels
+    rows, cols = np.nonzero(np.any(~np.isnan(index_grids), axis=0))
+    index_values = index_grids[:, rows, cols]
+
+    r_obs = _batched_r(index_values, flux_grid[rows, cols][None,:])[0]
+
+    if method == 'block':
+        # Padding so every block is complete; padded pixels are NaN and drop out of the correlation
+        padded_shape = (-(-shape[0]//block_size)*block_size, -(-shape[1]//block_size)*block_size)
+        padded = np.full(padded_shape, np.nan)
+        padded[:shape[0], :shape[1]] = flux_grid
+    elif method == 'toroidal':
+        shifts = toroidal_shifts(shape, n_perm, rng)
+    else:
+        raise ValueError(f"method must be 'toroidal' or 'block', got {method}")
+
+    r_perm = np.empty((n_perm, len(r_obs)))
+    for start in range(0, n_perm, chunk_size):
+        stop = min(start+chunk_size, n_perm)
+        if method == 'toroidal':
+            src_rows, src_cols = _toroidal_sources(rows, cols, shape, shifts[start:stop])
+            permuted = flux_grid[src_rows, src_cols]
+        else:
+            src_rows, src_cols = _block_sources(rows, cols, padded_shape, block_size, stop-start, rng)
+            permuted = padded[src_rows, src_cols]
+        r_perm[start:stop] = _batched_r(index_values, permuted)
+
+    exceed = (np.abs(r_perm) >= np.abs(r_obs)[None,:]) & ~np.isnan(r_perm)
+    n_valid = (~np.isnan(r_perm)).sum(axis=0)
+    p = (1 + exceed.sum(axis=0))/(1 + n_valid)
+
+    return {'r': r_obs, 'p': p, 'r_perm': r_perm}
+
+
+# ---------------------------------------------------------------------------------------------------------
+
+def spatial_significance(landsat, matched_ffp, indices=('MNDWI2','MNDWI','NDWI','NDVI','temp'), gas='ch4',
+                         n_perm=0, method='toroidal', block_size=3, seed=None):
+    """
+    Spatially aware significance of the pixel-by-pixel correlation of each index with a flux
+    (sector_plot's "landsat" and "matched_ffp" outputs).
+        Input:
+            1) landsat, matched_ffp = dicts from sector_plot (pixels in the same order)
+            2) indices = landsat indices to test
+            3) gas = 'ch4', 'co2' or 'h'
+            4) n_perm = number of permutations. 0 only computes the Moran's I effective sample size correction.
+            5) method, block_size, seed = see permutation_test
+        Output:
+            dict of arrays (ordered as indices):
+                r, n = correlation and number of pixels
+                p_naive = p-value treating pixels as independent
+                moran_index, moran_flux = Moran's I of the index maps and of the flux map
+                n_eff, p_eff = effective sample size and the corrected p-value
+                p_perm = permutation p-value (only if n_perm > 0)
+    """
+    from regression_stats import regress_columns, pearson_p
+
+    indices = list(indices)
+    values = np.column_stack([matched_ffp[gas]] + [landsat[index] for index in indices])
+    grids = to_grid(landsat['lonData'], landsat['latData'], values)[0]
+    flux_grid, index_grids = grids[0], grids[1:]
+
+    regression = regress_columns(values[:,1:], values[:,0])
+    moran_flux = morans_i(flux_grid)
+    moran_index = np.array([morans_i(grid) for grid in index_grids])
+    n_eff = effective_sample_size(regression['n'], moran_index, moran_flux)
+
+    result = {'indices': indices, 'r': regression['r'], 'n': regression['n'], 'p_naive': regression['p'],
+              'moran_index': moran_index, 'moran_flux': moran_flux,
+              'n_eff': n_eff, 'p_eff': pearson_p(regression['r'], n_eff)}
+
+    if n_perm > 0:
+        result['p_perm'] = permutation_test(index_grids, flux_grid, n_perm=n_perm, method=method,
+                                            block_size=block_size, seed=seed)['p']
+    return result
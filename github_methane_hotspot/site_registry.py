@@ -0,0 +1,118 @@
+"""
+Registry of flux tower sites, read from sites.csv (one row per site).
+
+Each site holds its tower coordinates, FFP measurement height (zm) and roughness length (z0), default
+boundary layer height (h), the prefix of its FARF model files, the filenames of its Google Earth Engine
+Landsat/Sentinel exports, and its projection constants (see projection.py). Add a row to sites.csv to run
+the analysis on a new site without code edits.
+
+The registry is read once and cached, and Site.key gives a stable name to cache per-site work under.
+"""
+import os
+from functools import lru_cache
+
+REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sites.csv')
+
+
+class Site:
+    """
+    One flux tower site of the registry. Empty entries in sites.csv are None.
+    """
+    __slots__ = ('name', 'coordinates', 'zm', 'z0', 'h', 'farf_prefix', 'landsat_export', 'sentinel_export',
+                 'projection')
+
+    def __init__(self, name, coordinates, zm=None, z0=None, h=None, farf_prefix=None,
+                 landsat_export=None, sentinel_export=None):
+        from projection import projection_constants
+
+        self.name = name
+        self.coordinates = [float(coordinates[0]), float(coordinates[1])] # [lon, lat]
+        self.zm = zm
+        self.z0 = z0
+        self.h = h
+        self.farf_prefix = farf_prefix if farf_prefix else name
+        self.landsat_export = landsat_export
+        self.sentinel_export = sentinel_export
+        self.projection = projection_constants(self.coordinates)
+
+    @property
+    def key(self):
+        return self.name
+
+    def __repr__(self):
+        return f'Site({self.name}, coordinates={self.coordinates})'
+
+
+@lru_cache(maxsize=None)
+def _read_registry(path):
+    import csv
+
+    def number(value):
+        return float(value) if value.strip() else None
+
+    def text(value):
+        return value.strip() or None
+
+    sites = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            site = Site(name=row['site'].strip(),
+                        coordinates=[float(row['longitude']), float(row['latitude'])],
+                        zm=number(row['zm']), z0=number(row['z0']), h=number(row['h']),
+                        farf_prefix=text(row['farf_prefix']),
+                        landsat_export=text(row['landsat_export']),
+                        sentinel_export=text(row['sentinel_export']))
+            sites[site.name] = site
+    return sites
+
+
+def load_registry(path=None):
+    """
+    Returns a dict of site name -> Site for the registry file (default: sites.csv next to this module).
+    """
+    return _read_registry(os.path.abspath(path or REGISTRY_FILE))
+
+
+def get_site(name, path=None):
+    """
+    Looks up a site by name (e.g. 'BB1', 'Hogg').
+    """
+    sites = load_registry(path)
+    if name not in sites:
+        raise KeyError(f'Site "{name}" is not in the site registry. Available sites: {list(sites)}')
+    return sites[name]
+
+
+def find_site(coordinates, path=None, tolerance=1e-6):
+    """
+    Looks up a site by its tower coordinates in [lon, lat] format. Returns None if no site matches.
+    """
+    for site in load_registry(path).values():
+        if abs(site.coordinates[0] - coordinates[0]) <= tolerance and \
+            abs(site.coordinates[1] - coordinates[1]) <= tolerance:
+            return site
+    return None
+
+
+def resolve_site(site, path=None):
+    """
+    Accepts a Site, a site name, or tower coordinates in [lon, lat] format and returns the registry Site.
+    """
+    if isinstance(site, Site):
+        return site
+    if isinstance(site, str):
+        return get_site(site, path)
+    found = find_site(site, path)
+    if found is None:
+        raise KeyError(f'No site in the site registry has tower coordinates {list(site)}. Add it to sites.csv.')
+    return found
+
+
+def tower_coordinates(site, path=None):
+    """
+    Tower coordinates [lon, lat] of a site name or Site. Coordinates passed in directly are returned as is,
+    so unregistered towers can still be used.
+    """
+    if isinstance(site, (Site, str)):
+        return resolve_site(site, path).coordinates
+    return site